@@ -0,0 +1,187 @@
+"""
+Requests per second per worker: sync handlers vs ASYNC_HANDLERS=1.
+
+Each mode runs in its own process, since the mode is fixed when
+function_app is imported, and is driven the way the Python worker drives
+it:
+  - sync: handlers run on a thread pool of PYTHON_THREADPOOL_THREAD_COUNT
+    threads (default min(32, cpus + 4), the worker's default)
+  - async: every handler is a coroutine on one event loop; blocking calls
+    go to the ASYNC_IO_THREADS executor
+--concurrency clients each send requests back to back for --duration
+seconds, over a mix of routes. Reports rps and p50/p95/p99 per mode and
+route, plus the async/sync rps ratio, as JSON.
+
+Needs SQL_CONN_STR (a local SQL Server with the db/ migrations applied);
+upload-urls also needs Blob, which defaults to Azurite. The listings route
+sends X-Cache-Bypass so every request reaches SQL.
+
+    python bench/async_mode.py --concurrency 64 --duration 20
+    python bench/async_mode.py --routes listings,upload-urls --out async.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+AZURITE_CONN_STR = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# name -> (method, route, route_params, params, headers, body); {listing} is filled in
+ROUTES = {
+    "listings": ("GET", "listings", {}, {"category": "toys", "limit": "12"}, {"X-Cache-Bypass": "1"}, None),
+    "basket": ("GET", "basket", {}, {}, {}, None),
+    "favorites": ("GET", "favorites", {}, {}, {}, None),
+    "upload-urls": ("POST", "listings/{listingId}/upload-urls", {"listingId": "{listing}"}, {}, {},
+                    {"files": [{"ext": "jpg"}, {"ext": "webp"}]}),
+}
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+
+def run_mode(args):
+    """Child process: load one mode and print its results as JSON."""
+    sys.path.insert(0, API_DIR)
+    import azure.functions as func
+    import function_app
+
+    handlers = {}
+    for fn in function_app.app.get_functions():
+        trigger = fn.get_trigger()
+        for m in getattr(trigger, "methods", None) or []:
+            handlers[(str(getattr(m, "value", m)).upper(), getattr(trigger, "route", None))] = fn.get_user_function()
+
+    names = args.routes.split(",")
+    specs = []
+    for name in names:
+        method, route, route_params, params, headers, body = ROUTES[name]
+        specs.append((name, handlers[(method, route)], method, route,
+                      {k: v.replace("{listing}", args.listing) for k, v in route_params.items()},
+                      params, headers, json.dumps(body).encode() if body is not None else b""))
+
+    def request(spec):
+        name, handler, method, route, route_params, params, headers, body = spec
+        return func.HttpRequest(method=method, url="http://localhost/api/" + route, headers=headers,
+                                params=params, route_params=route_params, body=body)
+
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    deadline = time.perf_counter() + args.duration
+
+    def record(spec, started, status):
+        latencies[spec[0]].append(time.perf_counter() - started)
+        if status >= 500:
+            errors[spec[0]] += 1
+
+    if args.mode == "async":
+        async def client(rng):
+            while time.perf_counter() < deadline:
+                spec = rng.choice(specs)
+                started = time.perf_counter()
+                resp = await spec[1](request(spec))
+                record(spec, started, resp.status_code)
+
+        async def main():
+            await asyncio.gather(*(client(random.Random(i)) for i in range(args.concurrency)))
+        asyncio.run(main())
+    else:
+        # What the worker does for sync functions: a bounded thread pool
+        threads = int(os.getenv("PYTHON_THREADPOOL_THREAD_COUNT") or min(32, (os.cpu_count() or 1) + 4))
+        pool = ThreadPoolExecutor(max_workers=threads)
+
+        def client(rng):
+            while time.perf_counter() < deadline:
+                spec = rng.choice(specs)
+                started = time.perf_counter()
+                resp = pool.submit(spec[1], request(spec)).result()
+                record(spec, started, resp.status_code)
+
+        clients = [threading.Thread(target=client, args=(random.Random(i),)) for i in range(args.concurrency)]
+        for t in clients:
+            t.start()
+        for t in clients:
+            t.join()
+        pool.shutdown()
+
+    out = {"routes": {}}
+    total = 0
+    for name in names:
+        lat = latencies[name]
+        total += len(lat)
+        out["routes"][name] = {
+            "requests": len(lat), "errors": errors[name], "rps": round(len(lat) / args.duration, 1),
+            "p50_ms": percentile(lat, 0.50), "p95_ms": percentile(lat, 0.95), "p99_ms": percentile(lat, 0.99),
+        }
+    out["rps"] = round(total / args.duration, 1)
+    out["pool"] = function_app._sql_pool().stats()
+    print(json.dumps(out))
+
+
+def any_listing_id():
+    sys.path.insert(0, API_DIR)
+    import function_app
+    with function_app._conn() as c:
+        cur = c.cursor()
+        cur.execute("SELECT TOP 1 listing_id FROM dbo.listing WHERE is_active = 1")
+        row = cur.fetchone()
+    return str(row[0]) if row else "00000000-0000-0000-0000-000000000000"
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--routes", default=",".join(ROUTES), help=f"comma-separated, from {', '.join(ROUTES)}")
+    ap.add_argument("--concurrency", type=int, default=64, help="clients sending requests back to back")
+    ap.add_argument("--duration", type=float, default=20, help="seconds per mode")
+    ap.add_argument("--out", help="also write the JSON report here")
+    ap.add_argument("--mode", choices=("sync", "async"), help=argparse.SUPPRESS)
+    ap.add_argument("--listing", default="", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    os.environ.setdefault("BLOB_CONN_STR", AZURITE_CONN_STR)
+    os.environ.setdefault("DEV_BUYER_ID", str(uuid.uuid4()))
+
+    unknown = [n for n in args.routes.split(",") if n not in ROUTES]
+    if unknown:
+        raise SystemExit(f"unknown routes: {', '.join(unknown)}")
+    if args.mode:
+        return run_mode(args)
+
+    listing = any_listing_id() if "upload-urls" in args.routes.split(",") else ""
+    report = {"concurrency": args.concurrency, "duration_s": args.duration, "cpus": os.cpu_count(), "modes": {}}
+    for mode in ("sync", "async"):
+        env = dict(os.environ, ASYNC_HANDLERS="1" if mode == "async" else "0")
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, "--listing", listing,
+                              "--routes", args.routes, "--concurrency", str(args.concurrency),
+                              "--duration", str(args.duration)],
+                             cwd=API_DIR, env=env, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise SystemExit(f"{mode} run failed:\n{out.stderr.strip()}")
+        report["modes"][mode] = json.loads(out.stdout.strip().splitlines()[-1])
+    sync_rps, async_rps = report["modes"]["sync"]["rps"], report["modes"]["async"]["rps"]
+    report["async_vs_sync_rps"] = round(async_rps / sync_rps, 2) if sync_rps else None
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""
+Concurrency stress check for checkout (POST /api/orders/confirm).
+
+Seeds a pool of one-off listings, gives many buyers overlapping baskets,
+runs all their checkouts in parallel and then verifies that:
+  - no listing was sold twice
+  - every sold listing is inactive and every claimed item has an order line
+  - each buyer's items were either bought by them or reported unavailable
+  - order totals match the sum of their lines
+
+Needs SQL_CONN_STR pointing at a database with the db/ migrations applied.
+Rows it creates are removed afterwards.
+
+    python bench/checkout_stress.py --listings 200 --buyers 64 --basket 8 --threads 32
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import function_app  # noqa: E402
+
+
+def seed(conn, run, n_listings, buyers, basket_size, rng):
+    cur = conn.cursor()
+    cur.fast_executemany = True
+    ids = [str(uuid.uuid4()) for _ in range(n_listings)]
+    cur.executemany("""
+      INSERT INTO dbo.listing (listing_id, title, category, price_cents, city, is_active)
+      VALUES (?, ?, 'toys', ?, 'Lisbon', 1)
+    """, [(lid, f"stress-{run}-{i}", rng.randint(0, 5000)) for i, lid in enumerate(ids)])
+
+    # Draw from a small hot set so baskets overlap heavily
+    hot = ids[: max(basket_size, n_listings // 4)]
+    baskets = {}
+    rows = []
+    for b in buyers:
+        picks = set(rng.sample(hot, min(len(hot), max(1, basket_size // 2))))
+        while len(picks) < basket_size:
+            picks.add(rng.choice(ids))
+        baskets[b] = picks
+        rows.extend((b, lid) for lid in picks)
+    cur.executemany("INSERT INTO dbo.basket_item (user_id, listing_id) VALUES (?, ?)", rows)
+    conn.commit()
+    return ids, baskets
+
+
+def checkout(buyer):
+    started = time.perf_counter()
+    with function_app._conn() as conn:
+        result = function_app._checkout(conn, buyer)
+    return buyer, result, time.perf_counter() - started
+
+
+def verify(conn, ids, baskets, results):
+    problems = []
+    cur = conn.cursor()
+    placeholders = ",".join("?" for _ in ids)
+
+    cur.execute(f"""
+      SELECT listing_id, COUNT(*) FROM dbo.order_item
+      WHERE listing_id IN ({placeholders})
+      GROUP BY listing_id HAVING COUNT(*) > 1
+    """, ids)
+    for lid, n in cur.fetchall():
+        problems.append(f"listing {lid} sold {n} times")
+
+    cur.execute(f"""
+      SELECT oi.listing_id, o.buyer_id, l.is_active
+      FROM dbo.order_item oi
+      JOIN dbo.[order] o ON o.order_id = oi.order_id
+      JOIN dbo.listing l ON l.listing_id = oi.listing_id
+      WHERE oi.listing_id IN ({placeholders})
+    """, ids)
+    sold_to = {}
+    for lid, buyer, active in cur.fetchall():
+        sold_to[str(lid).lower()] = str(buyer).lower()
+        if active:
+            problems.append(f"listing {lid} sold but still active")
+
+    for buyer, (order_id, total, count, unavailable) in results.items():
+        mine = {lid for lid, b in sold_to.items() if b == buyer.lower()}
+        unavailable = {u.lower() for u in unavailable}
+        basket = {lid.lower() for lid in baskets[buyer]}
+        if mine | unavailable != basket or mine & unavailable:
+            problems.append(f"buyer {buyer}: bought {len(mine)} + unavailable {len(unavailable)} "
+                            f"!= basket {len(basket)}")
+        if len(mine) != count:
+            problems.append(f"buyer {buyer}: item_count {count} but {len(mine)} order lines")
+        if order_id:
+            cur.execute("""
+              SELECT o.total_cents, SUM(oi.price_cents)
+              FROM dbo.[order] o JOIN dbo.order_item oi ON oi.order_id = o.order_id
+              WHERE o.order_id = ? GROUP BY o.total_cents
+            """, order_id)
+            row = cur.fetchone()
+            if not row or row[0] != row[1] or row[0] != total:
+                problems.append(f"order {order_id}: total mismatch {row} vs {total}")
+    return problems, len(sold_to)
+
+
+def cleanup(conn, ids, buyers):
+    cur = conn.cursor()
+    bp = ",".join("?" for _ in buyers)
+    cur.execute(f"""
+      DELETE oi FROM dbo.order_item oi JOIN dbo.[order] o ON o.order_id = oi.order_id
+      WHERE o.buyer_id IN ({bp})
+    """, buyers)
+    cur.execute(f"""
+      DELETE d FROM dbo.delivery d JOIN dbo.[order] o ON o.order_id = d.order_id
+      WHERE o.buyer_id IN ({bp})
+    """, buyers)
+    cur.execute(f"DELETE FROM dbo.[order] WHERE buyer_id IN ({bp})", buyers)
+    cur.execute(f"DELETE FROM dbo.basket_item WHERE user_id IN ({bp})", buyers)
+    for i in range(0, len(ids), 1000):
+        chunk = ids[i:i + 1000]
+        cur.execute(f"DELETE FROM dbo.listing WHERE listing_id IN ({','.join('?' for _ in chunk)})", chunk)
+    conn.commit()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--listings", type=int, default=200)
+    ap.add_argument("--buyers", type=int, default=64)
+    ap.add_argument("--basket", type=int, default=8)
+    ap.add_argument("--threads", type=int, default=32)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--keep", action="store_true", help="leave seeded rows in place")
+    args = ap.parse_args()
+
+    os.environ.setdefault("SQL_POOL_SIZE", str(args.threads))
+    rng = random.Random(args.seed)
+    run = uuid.uuid4().hex[:8]
+    buyers = [str(uuid.uuid4()) for _ in range(args.buyers)]
+
+    with function_app._conn() as conn:
+        ids, baskets = seed(conn, run, args.listings, buyers, args.basket, rng)
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.threads) as ex:
+            out = list(ex.map(checkout, buyers))
+        elapsed = time.perf_counter() - started
+
+        results = {b: r for b, r, _ in out}
+        latencies = sorted(t for _, _, t in out)
+        with function_app._conn() as conn:
+            problems, sold = verify(conn, ids, baskets, results)
+
+        report = {
+            "buyers": args.buyers,
+            "threads": args.threads,
+            "orders": sum(1 for r in results.values() if r[0]),
+            "listings_sold": sold,
+            "items_reported_unavailable": sum(len(r[3]) for r in results.values()),
+            "elapsed_s": round(elapsed, 3),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+            "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+            "pool": function_app._sql_pool().stats(),
+            "problems": problems,
+        }
+        print(json.dumps(report, indent=2))
+        return 1 if problems else 0
+    finally:
+        if not args.keep:
+            with function_app._conn() as conn:
+                cleanup(conn, ids, buyers)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
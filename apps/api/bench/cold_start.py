@@ -0,0 +1,167 @@
+"""
+Cold-start benchmark for the Functions worker.
+
+Each sample is a fresh Python process that imports function_app (what the
+worker does on a cold instance), then sends one route its first and second
+request in-process. Reports import time, the modules the import loaded,
+and time to first/second response per route as JSON (median and max over
+--runs processes).
+
+It also guards the lazy imports: if importing function_app loads any of
+LAZY_MODULES (Blob SDK, cryptography, Pillow), or the median import
+exceeds --max-import-ms, the problem is reported and the exit code is 1.
+
+Routes other than ping need SQL_CONN_STR (a local SQL Server with the db/
+migrations applied) and DEV_BUYER_ID; upload-urls also needs Blob, which
+defaults to Azurite.
+
+    python bench/cold_start.py --runs 5
+    python bench/cold_start.py --routes ping,listings --max-import-ms 800
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+AZURITE_CONN_STR = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Must not be imported until a request needs them
+LAZY_MODULES = ("azure.storage.blob", "cryptography", "PIL")
+
+# name -> (method, route, route_params, params, body); {listing} is filled in
+ROUTES = {
+    "ping": ("GET", "ping", {}, {}, None),
+    "listings": ("GET", "listings", {}, {"limit": "12"}, None),
+    "facets": ("GET", "listings/facets", {}, {}, None),
+    "basket": ("GET", "basket", {}, {}, None),
+    "favorites": ("GET", "favorites", {}, {}, None),
+    "deliveries": ("GET", "deliveries", {}, {"limit": "50"}, None),
+    "upload-urls": ("POST", "listings/{listingId}/upload-urls", {"listingId": "{listing}"}, {},
+                    {"files": [{"ext": "jpg"}]}),
+    "metrics": ("GET", "metrics", {}, {}, None),
+}
+
+# Runs in the fresh process; argv[1] is the JSON request spec
+CHILD = r"""
+import sys, json, time, asyncio
+started = time.perf_counter()
+import function_app
+import_s = time.perf_counter() - started
+loaded = sorted(sys.modules)
+
+import azure.functions as func
+spec = json.loads(sys.argv[1])
+handler = None
+for fn in function_app.app.get_functions():
+    trigger = fn.get_trigger()
+    methods = [str(getattr(m, "value", m)).upper() for m in (getattr(trigger, "methods", None) or [])]
+    if getattr(trigger, "route", None) == spec["route"] and spec["method"] in methods:
+        handler = fn.get_user_function()
+
+def call():
+    req = func.HttpRequest(method=spec["method"], url="http://localhost/api/" + spec["route"], headers={},
+                           params=spec["params"], route_params=spec["route_params"],
+                           body=json.dumps(spec["body"]).encode() if spec["body"] is not None else b"")
+    t0 = time.perf_counter()
+    resp = handler(req)
+    if asyncio.iscoroutine(resp):
+        resp = asyncio.run(resp)
+    return time.perf_counter() - t0, resp.status_code
+
+first_s, first_status = call()
+second_s, second_status = call()
+print(json.dumps({"import_s": import_s, "modules": loaded, "first_s": first_s, "second_s": second_s,
+                  "status": [first_status, second_status]}))
+"""
+
+
+def sample(spec):
+    out = subprocess.run([sys.executable, "-c", CHILD, json.dumps(spec)], cwd=API_DIR,
+                         capture_output=True, text=True, timeout=120)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else "child failed")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def any_listing_id():
+    sys.path.insert(0, API_DIR)
+    import function_app
+    with function_app._conn() as c:
+        cur = c.cursor()
+        cur.execute("SELECT TOP 1 listing_id FROM dbo.listing WHERE is_active = 1")
+        row = cur.fetchone()
+    return str(row[0]) if row else "00000000-0000-0000-0000-000000000000"
+
+
+def ms(values, fn):
+    return round(fn(values) * 1000, 1)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--routes", default=",".join(ROUTES), help=f"comma-separated, from {', '.join(ROUTES)}")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--max-import-ms", type=float, help="fail if the median import is slower")
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+    os.environ.setdefault("BLOB_CONN_STR", AZURITE_CONN_STR)
+
+    names = [n.strip() for n in args.routes.split(",") if n.strip()]
+    unknown = [n for n in names if n not in ROUTES]
+    if unknown:
+        raise SystemExit(f"unknown routes: {', '.join(unknown)}")
+    listing = any_listing_id() if "upload-urls" in names else None
+
+    report = {"runs": args.runs, "python": sys.version.split()[0], "routes": {}, "problems": []}
+    imports, lazy_loaded, module_counts = [], set(), []
+    for name in names:
+        method, route, route_params, params, body = ROUTES[name]
+        spec = {"method": method, "route": route, "params": params, "body": body,
+                "route_params": {k: v.replace("{listing}", listing or "") for k, v in route_params.items()}}
+        runs = []
+        for _ in range(args.runs):
+            try:
+                runs.append(sample(spec))
+            except Exception as e:
+                report["problems"].append(f"{name}: {e}")
+                break
+        if not runs:
+            continue
+        for r in runs:
+            imports.append(r["import_s"])
+            module_counts.append(len(r["modules"]))
+            lazy_loaded.update(lazy for lazy in LAZY_MODULES if lazy in r["modules"])
+        first = [r["first_s"] for r in runs]
+        second = [r["second_s"] for r in runs]
+        report["routes"][name] = {
+            "status": runs[-1]["status"],
+            "first_response_ms": {"median": ms(first, statistics.median), "max": ms(first, max)},
+            "second_response_ms": {"median": ms(second, statistics.median), "max": ms(second, max)},
+        }
+
+    if imports:
+        report["import_ms"] = {"median": ms(imports, statistics.median), "max": ms(imports, max)}
+        report["modules_loaded"] = max(module_counts)
+        if args.max_import_ms and report["import_ms"]["median"] > args.max_import_ms:
+            report["problems"].append(f"median import {report['import_ms']['median']} ms "
+                                      f"> {args.max_import_ms} ms")
+    if lazy_loaded:
+        report["problems"].append(f"imported at startup but meant to be lazy: {', '.join(sorted(lazy_loaded))}")
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    return 1 if report["problems"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
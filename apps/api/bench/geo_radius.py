@@ -0,0 +1,145 @@
+"""
+Geo-radius search benchmark.
+
+Seeds a synthetic dataset (default 1,000,000 active listings spread over
+Portugal and France, titles tagged "geo-bench"), then times the API's
+radius query (spatial index on dbo.listing.geo_point, via _listing_page)
+against a haversine computed over every row, for several radii and for
+both sort orders.
+
+Needs SQL_CONN_STR pointing at a scratch database with the db/ migrations
+applied. Seeding 1M rows takes a few minutes; --reuse skips it when the
+rows are already there, --cleanup removes them.
+
+    python bench/geo_radius.py --listings 1000000 --queries 50
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import function_app  # noqa: E402
+
+TAG = "geo-bench"
+BOXES = [(37.0, 42.1, -9.5, -6.2), (42.5, 51.0, -4.8, 8.2)]  # Portugal, France
+CATEGORIES = ["clothing", "furniture", "hygiene", "feeding", "mobility", "safety", "toys", "health"]
+
+HAVERSINE_SQL = """
+  SELECT TOP ({limit}) l.listing_id, l.title
+  FROM dbo.listing l
+  WHERE l.is_active = 1
+    AND l.latitude IS NOT NULL
+    AND 2 * 6371.0088 * ASIN(SQRT(
+          POWER(SIN(RADIANS(CAST(l.latitude AS FLOAT) - ?) / 2), 2)
+          + COS(RADIANS(?)) * COS(RADIANS(CAST(l.latitude AS FLOAT)))
+            * POWER(SIN(RADIANS(CAST(l.longitude AS FLOAT) - ?) / 2), 2))) <= ?
+  ORDER BY l.created_at DESC, l.listing_id DESC
+"""
+
+
+def random_point(rng):
+    lat0, lat1, lng0, lng1 = rng.choice(BOXES)
+    return round(rng.uniform(lat0, lat1), 6), round(rng.uniform(lng0, lng1), 6)
+
+
+def seeded_count(cur):
+    cur.execute("SELECT COUNT_BIG(*) FROM dbo.listing WHERE title LIKE ?", f"{TAG}%")
+    return cur.fetchone()[0]
+
+
+def seed(n, rng, chunk=10_000):
+    done = 0
+    while done < n:
+        rows = []
+        for i in range(min(chunk, n - done)):
+            lat, lng = random_point(rng)
+            rows.append((f"{TAG} {done + i}", rng.choice(CATEGORIES), rng.randint(0, 5000),
+                         lat, lng, lat, lng))
+        with function_app._conn() as c:
+            cur = c.cursor()
+            cur.fast_executemany = True
+            cur.executemany("""
+              INSERT INTO dbo.listing (title, category, price_cents, latitude, longitude, geo_point, is_active)
+              VALUES (?, ?, ?, ?, ?, geography::Point(?, ?, 4326), 1)
+            """, rows)
+        done += len(rows)
+        print(f"seeded {done}/{n}", file=sys.stderr)
+
+
+def timed(fn, repeats):
+    out = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    out.sort()
+    return {
+        "p50_ms": round(out[len(out) // 2] * 1000, 2),
+        "p99_ms": round(out[min(len(out) - 1, int(len(out) * 0.99))] * 1000, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--listings", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--limit", type=int, default=24)
+    ap.add_argument("--radii", default="5,25,100")
+    ap.add_argument("--reuse", action="store_true", help="skip seeding if tagged rows exist")
+    ap.add_argument("--skip-haversine", action="store_true")
+    ap.add_argument("--cleanup", action="store_true", help="delete seeded rows and exit")
+    ap.add_argument("--seed", type=int, default=3)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    with function_app._conn() as c:
+        cur = c.cursor()
+        if args.cleanup:
+            cur.execute("DELETE FROM dbo.listing WHERE title LIKE ?", f"{TAG}%")
+            print(json.dumps({"deleted": cur.rowcount}))
+            return 0
+        existing = seeded_count(cur)
+    if not (args.reuse and existing >= args.listings):
+        seed(args.listings - existing if args.reuse else args.listings, rng)
+
+    origins = [random_point(rng) for _ in range(args.queries)]
+    results = {"listings": args.listings, "queries": args.queries, "limit": args.limit, "radii": {}}
+    for radius in [float(r) for r in args.radii.split(",")]:
+        it = iter(origins * 2)
+        per = {}
+
+        def api_query(sort):
+            lat, lng = next(it)
+            q = {"lat": lat, "lng": lng, "radiusKm": radius}
+            with function_app._conn() as c:
+                where_sql, params = function_app._build_listing_filter(q)
+                function_app._listing_page(c.cursor(), where_sql, params, args.limit,
+                                           origin=(lat, lng, radius), sort=sort)
+
+        per["spatial_recent"] = timed(lambda: api_query("recent"), args.queries)
+        it = iter(origins * 2)
+        per["spatial_distance"] = timed(lambda: api_query("distance"), args.queries)
+
+        if not args.skip_haversine:
+            it = iter(origins * 2)
+
+            def haversine_query():
+                lat, lng = next(it)
+                with function_app._conn() as c:
+                    cur = c.cursor()
+                    cur.execute(HAVERSINE_SQL.format(limit=args.limit), lat, lat, lng, radius)
+                    cur.fetchall()
+
+            # A full scan per query; a handful of samples is enough
+            per["haversine_scan"] = timed(haversine_query, max(3, args.queries // 10))
+        results["radii"][str(radius)] = per
+
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+End-to-end check of the image variant pipeline against Azurite.
+
+Uploads a batch of synthetic camera photos (with EXIF GPS and a rotate-90
+orientation tag) to the listings container, processes the whole batch in
+parallel the way the blob trigger does (_store_variants, plus
+_record_variants when SQL_CONN_STR is set), processes it a second time, and
+verifies that:
+  - every expected (width, format) variant exists and none is wider than the source
+  - no variant carries EXIF, and orientation was applied to the pixels
+  - the second run rewrote the same blobs and rows instead of adding new ones
+
+Start Azurite first (azurite-blob --location /tmp/azurite). BLOB_CONN_STR
+defaults to Azurite's development account. Blobs it creates are removed
+afterwards unless --keep is given.
+
+    python bench/image_variants_check.py --images 12 --threads 4
+"""
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+AZURITE_CONN_STR = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+os.environ.setdefault("BLOB_CONN_STR", AZURITE_CONN_STR)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import function_app  # noqa: E402
+import image_variants  # noqa: E402
+
+ORIENTATION, GPS_IFD = 0x0112, 0x8825
+
+
+def camera_photo(i, width=3000, height=2000):
+    """A landscape JPEG whose EXIF says "rotate 90" and carries a GPS position."""
+    img = Image.new("RGB", (width, height), ((i * 40) % 256, 120, 200))
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    exif[GPS_IFD] = {2: (38.0, 43.0, 0.0), 4: (9.0, 8.0, 0.0)}
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=90, exif=exif)
+    return buf.getvalue()
+
+
+def process_batch(names, data, threads):
+    def one(name):
+        variants = function_app._store_variants(name, data[name])
+        if os.getenv("SQL_CONN_STR"):
+            with function_app._conn() as c:
+                function_app._record_variants(c.cursor(), name, variants)
+        return name, variants
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as ex:
+        out = dict(ex.map(one, names))
+    return out, time.perf_counter() - started
+
+
+def variant_blobs(container, prefix):
+    return sorted(b.name for b in function_app._blob_client()
+                  .get_container_client(container).list_blobs(name_starts_with=prefix))
+
+
+def verify(names, results, container):
+    problems = []
+    source_w, source_h = 2000, 3000   # after applying the rotation
+    expected_widths = image_variants.target_widths(source_w)
+    for name in names:
+        got = {(w, fmt) for w, _, fmt, _, _ in results[name]}
+        want = {(w, fmt) for w in expected_widths for fmt in image_variants.FORMATS}
+        if got != want:
+            problems.append(f"{name}: variants {sorted(got)} != {sorted(want)}")
+        for width, height, fmt, _, _ in results[name]:
+            blob = function_app._blob_client().get_blob_client(
+                container, image_variants.variant_name(name, width, fmt))
+            with Image.open(io.BytesIO(blob.download_blob().readall())) as img:
+                if img.size != (width, height):
+                    problems.append(f"{blob.blob_name}: size {img.size} != {(width, height)}")
+                if abs(height / width - source_h / source_w) > 0.01:
+                    problems.append(f"{blob.blob_name}: orientation not applied ({img.size})")
+                if img.getexif() or "exif" in img.info:
+                    problems.append(f"{blob.blob_name}: EXIF survived")
+    return problems
+
+
+def row_counts(names):
+    if not os.getenv("SQL_CONN_STR"):
+        return None
+    with function_app._conn() as c:
+        cur = c.cursor()
+        cur.execute(f"""
+          SELECT COUNT(*) FROM dbo.listing_image_variant
+          WHERE blob_name IN ({",".join("?" for _ in names)})
+        """, names)
+        return cur.fetchone()[0]
+
+
+def cleanup(names, source, variants, prefix):
+    client = function_app._blob_client()
+    for name in names:
+        client.get_blob_client(source, name).delete_blob()
+    for name in variant_blobs(variants, prefix):
+        client.get_blob_client(variants, name).delete_blob()
+    if os.getenv("SQL_CONN_STR"):
+        with function_app._conn() as c:
+            c.cursor().execute(f"""
+              DELETE FROM dbo.listing_image_variant
+              WHERE blob_name IN ({",".join("?" for _ in names)})
+            """, names)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--images", type=int, default=12)
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--keep", action="store_true", help="leave blobs and rows in place")
+    args = ap.parse_args()
+
+    source, variants = function_app._container_name(), function_app._variant_container()
+    function_app._ensure_container(source)
+    prefix = f"variant-check-{uuid.uuid4().hex[:8]}/"
+    names = [f"{prefix}20250101000000_{i}.jpg" for i in range(args.images)]
+    data = {n: camera_photo(i) for i, n in enumerate(names)}
+    for n in names:
+        function_app._blob_client().get_blob_client(source, n).upload_blob(data[n], overwrite=True)
+
+    try:
+        _, first_s = process_batch(names, data, args.threads)
+        blobs_after_first, rows_after_first = variant_blobs(variants, prefix), row_counts(names)
+        second, second_s = process_batch(names, data, args.threads)
+        problems = verify(names, second, variants)
+        if variant_blobs(variants, prefix) != blobs_after_first:
+            problems.append("second run changed the set of variant blobs")
+        if row_counts(names) != rows_after_first:
+            problems.append("second run changed the number of variant rows")
+
+        report = {
+            "images": args.images,
+            "threads": args.threads,
+            "variant_blobs": len(blobs_after_first),
+            "variant_rows": rows_after_first,
+            "first_run_s": round(first_s, 3),
+            "second_run_s": round(second_s, 3),
+            "source_bytes_avg": sum(map(len, data.values())) // len(data),
+            "variant_bytes": {f"w{w}.{fmt}": size for w, _, fmt, _, size in second[names[0]]},
+            "problems": problems,
+        }
+        print(json.dumps(report, indent=2))
+        return 1 if problems else 0
+    finally:
+        if not args.keep:
+            cleanup(names, source, variants, prefix)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
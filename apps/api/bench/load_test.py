@@ -0,0 +1,487 @@
+"""
+Mixed-workload load test for the HTTP API.
+
+Seeds a synthetic catalogue (--listings 10k | 100k | 1M, titles tagged
+"load-bench"), a handful of saved searches and a backlog of orders with
+deliveries for a dedicated bench buyer, then drives a weighted mix of
+feed browsing, basket add/remove, checkout, saved-search runs and
+delivery updates from --users concurrent clients for --duration seconds.
+
+By default requests go through the registered Functions handlers
+in-process (same code path as the host: routing template, metrics
+wrapper, pool, caches), with SQL_CONN_STR pointing at a local SQL Server
+(the mssql/server container or LocalDB) that has the db/ migrations applied,
+and BLOB_CONN_STR defaulting to Azurite. With --base-url the same mix is
+sent over HTTP to a running `func start`; start that host with
+DEV_BUYER_ID set to the bench buyer printed by --seed-only.
+
+The queries use T-SQL only features (MERGE, OUTPUT, CONTAINSTABLE,
+geography), so there is no SQLite stand-in: run it against SQL Server.
+
+Prints (and with --out writes) a JSON report -- throughput and
+p50/p95/p99 per route plus the git commit it ran on -- so two runs can be
+diffed; --compare BASELINE.json prints the per-route change next to it.
+
+    python bench/load_test.py --listings 100k --users 16 --duration 60 --out run.json
+    python bench/load_test.py --listings 100k --reuse --compare run.json
+    python bench/load_test.py --cleanup
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import subprocess
+import threading
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+
+AZURITE_CONN_STR = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+TAG = "load-bench"
+# Stable across runs so --reuse finds the same orders and saved searches
+BENCH_BUYER = str(uuid.uuid5(uuid.NAMESPACE_URL, "kidtokid:" + TAG))
+
+os.environ.setdefault("BLOB_CONN_STR", AZURITE_CONN_STR)
+os.environ["DEV_BUYER_ID"] = BENCH_BUYER
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import azure.functions as func  # noqa: E402
+import function_app  # noqa: E402
+
+CATEGORIES = ["clothing", "furniture", "hygiene", "feeding", "mobility", "safety", "toys", "health"]
+CITIES = [("Lisbon", 38.72, -9.14), ("Porto", 41.15, -8.61), ("Faro", 37.02, -7.93),
+          ("Paris", 48.86, 2.35), ("Lyon", 45.76, 4.84), ("Bordeaux", 44.84, -0.58)]
+SIZES = ["0-3m", "3-6m", "6-12m", "12-24m", "2-3y", "3-4y", "4-5y", None]
+CONDITIONS = ["new", "like-new", "good", "fair"]
+WORDS = ["poussette", "stroller", "lit", "bed", "body", "jacket", "bottes", "boots", "jouet",
+         "train", "puzzle", "chaise", "siege", "car", "seat", "bebe", "baby", "velo", "bike", "livre"]
+
+DEFAULT_MIX = "browse=50,basket=15,checkout=5,saved=15,deliveries=15"
+
+
+def count_arg(raw: str) -> int:
+    raw = raw.strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(raw[-1:], 1)
+    return int(float(raw[:-1] if scale > 1 else raw) * scale)
+
+
+def pct(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# ---------- seeding ----------
+def seeded_count(cur):
+    cur.execute("SELECT COUNT_BIG(*) FROM dbo.listing WHERE title LIKE ?", f"{TAG}%")
+    return cur.fetchone()[0]
+
+
+def seed_listings(n, rng, chunk=10_000):
+    done = 0
+    while done < n:
+        rows = []
+        for i in range(min(chunk, n - done)):
+            city, lat0, lng0 = rng.choice(CITIES)
+            lat, lng = round(lat0 + rng.uniform(-0.3, 0.3), 6), round(lng0 + rng.uniform(-0.3, 0.3), 6)
+            words = " ".join(rng.sample(WORDS, 3))
+            rows.append((f"{TAG} {done + i} {words}", f"{words} {rng.choice(WORDS)} en bon etat",
+                         rng.choice(CATEGORIES), rng.choice(SIZES), rng.choice(CONDITIONS),
+                         rng.choice([0, rng.randint(100, 20_000)]), city, lat, lng, lat, lng,
+                         rng.randint(0, 365 * 86400)))
+        with function_app._conn() as c:
+            cur = c.cursor()
+            cur.fast_executemany = True
+            cur.executemany("""
+              INSERT INTO dbo.listing (title, description, category, size, [condition], price_cents, city,
+                                       latitude, longitude, geo_point, is_active, created_at)
+              VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, geography::Point(?, ?, 4326), 1,
+                      DATEADD(SECOND, -?, SYSUTCDATETIME()))
+            """, rows)
+        done += len(rows)
+        print(f"seeded {done}/{n} listings", file=sys.stderr)
+
+
+def seed_buyer_state(rng, saved_searches, orders):
+    """Saved searches and pending deliveries owned by the bench buyer (only the missing ones)."""
+    with function_app._conn() as c:
+        cur = c.cursor()
+        cur.execute("SELECT COUNT(*) FROM dbo.saved_search WHERE user_id = ?", BENCH_BUYER)
+        have = cur.fetchone()[0]
+        queries = []
+        for i in range(have, saved_searches):
+            q = {"category": rng.choice(CATEGORIES)}
+            if i % 2:
+                city, lat, lng = rng.choice(CITIES)
+                q.update(lat=lat, lng=lng, radiusKm=rng.choice([5, 25, 50]))
+            if i % 3 == 0:
+                q["q"] = rng.choice(WORDS)
+            queries.append((BENCH_BUYER, f"{TAG} {i}", json.dumps(q)))
+        if queries:
+            cur.executemany("INSERT INTO dbo.saved_search (user_id, name, query_json, is_active) VALUES (?, ?, ?, 1)",
+                            queries)
+
+        cur.execute("SELECT COUNT(*) FROM dbo.[order] WHERE buyer_id = ?", BENCH_BUYER)
+        missing = orders - cur.fetchone()[0]
+        if missing > 0:
+            rows = [(str(uuid.uuid4()), rng.randint(100, 20_000)) for _ in range(missing)]
+            cur.fast_executemany = True
+            cur.executemany("INSERT INTO dbo.[order] (order_id, buyer_id, total_cents) VALUES (?, ?, ?)",
+                            [(oid, BENCH_BUYER, total) for oid, total in rows])
+            cur.executemany("""
+              INSERT INTO dbo.delivery (order_id, status)
+              OUTPUT inserted.delivery_id, inserted.order_id, inserted.deliverer_id, inserted.status
+                INTO dbo.delivery_event (delivery_id, order_id, deliverer_id, status)
+              VALUES (?, 'pending')
+            """, [(oid,) for oid, _ in rows])
+    print(f"bench buyer {BENCH_BUYER}: {saved_searches} saved searches, {orders} orders", file=sys.stderr)
+
+
+def load_targets(sample):
+    """Ids the workload picks from: a sample of active listings, saved searches, deliveries."""
+    with function_app._conn() as c:
+        cur = c.cursor()
+        cur.execute(f"""
+          SELECT TOP ({int(sample)}) listing_id FROM dbo.listing
+          WHERE title LIKE ? AND is_active = 1 ORDER BY NEWID()
+        """, f"{TAG}%")
+        listings = [str(r[0]) for r in cur.fetchall()]
+        cur.execute("SELECT saved_search_id FROM dbo.saved_search WHERE user_id = ?", BENCH_BUYER)
+        searches = [str(r[0]) for r in cur.fetchall()]
+        cur.execute("""
+          SELECT d.delivery_id FROM dbo.delivery d
+          JOIN dbo.[order] o ON o.order_id = d.order_id
+          WHERE o.buyer_id = ?
+        """, BENCH_BUYER)
+        deliveries = [str(r[0]) for r in cur.fetchall()]
+    return listings, searches, deliveries
+
+
+def cleanup():
+    with function_app._conn() as c:
+        cur = c.cursor()
+        cur.execute("SELECT order_id INTO #bench_orders FROM dbo.[order] WHERE buyer_id = ?", BENCH_BUYER)
+        cur.execute("DELETE e FROM dbo.delivery_event e JOIN #bench_orders b ON b.order_id = e.order_id")
+        cur.execute("DELETE d FROM dbo.delivery d JOIN #bench_orders b ON b.order_id = d.order_id")
+        cur.execute("DELETE oi FROM dbo.order_item oi JOIN #bench_orders b ON b.order_id = oi.order_id")
+        cur.execute("DELETE o FROM dbo.[order] o JOIN #bench_orders b ON b.order_id = o.order_id")
+        cur.execute("DROP TABLE #bench_orders")
+        for table in ("basket_item", "favorite", "saved_search_match", "saved_search"):
+            cur.execute(f"DELETE FROM dbo.{table} WHERE user_id = ?", BENCH_BUYER)
+    deleted = 0
+    while True:
+        # Batches keep the log and lock footprint small at 1M rows
+        with function_app._conn() as c:
+            cur = c.cursor()
+            cur.execute("""
+              SELECT TOP (5000) listing_id INTO #bench_listings FROM dbo.listing WHERE title LIKE ?
+            """, f"{TAG}%")
+            for table in ("saved_search_match", "basket_item", "favorite", "order_item", "listing_image"):
+                cur.execute(f"DELETE t FROM dbo.{table} t JOIN #bench_listings b ON b.listing_id = t.listing_id")
+            cur.execute("DELETE l FROM dbo.listing l JOIN #bench_listings b ON b.listing_id = l.listing_id")
+            n = cur.rowcount
+            cur.execute("DROP TABLE #bench_listings")
+        deleted += max(n, 0)
+        if n <= 0:
+            return deleted
+
+
+# ---------- clients ----------
+class InProcessClient:
+    """Calls the registered handlers directly, the way the host would."""
+
+    def __init__(self):
+        self._handlers = {}
+        for fn in function_app.app.get_functions():
+            trigger = fn.get_trigger()
+            if getattr(trigger, "route", None) is None:
+                continue
+            for m in trigger.methods or []:
+                self._handlers[(str(getattr(m, "value", m)).upper(), trigger.route)] = fn.get_user_function()
+
+    def call(self, method, route, route_params=None, params=None, body=None, headers=None):
+        req = func.HttpRequest(
+            method=method,
+            url="http://localhost/api/" + route,
+            headers=headers or {},
+            params=params or {},
+            route_params=route_params or {},
+            body=json.dumps(body).encode("utf-8") if body is not None else b"",
+        )
+        resp = self._handlers[(method, route)](req)
+        if asyncio.iscoroutine(resp):
+            resp = asyncio.run(resp)
+        return resp.status_code, resp.headers, resp.get_body()
+
+
+class HttpClient:
+    """Same calls over HTTP against a running Functions host."""
+
+    def __init__(self, base_url):
+        import requests
+        self._base = base_url.rstrip("/")
+        self._local = threading.local()
+        self._requests = requests
+
+    def call(self, method, route, route_params=None, params=None, body=None, headers=None):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+        path = route.format(**(route_params or {}))
+        url = f"{self._base}/{path}" + (f"?{urlencode(params)}" if params else "")
+        resp = session.request(method, url, json=body, headers=headers, timeout=60)
+        return resp.status_code, resp.headers, resp.content
+
+
+# ---------- workload ----------
+class Recorder:
+    def __init__(self):
+        self.samples = {}   # "METHOD route" -> [(seconds, status)]
+
+    def add(self, key, seconds, status):
+        self.samples.setdefault(key, []).append((seconds, status))
+
+
+class Workload:
+    def __init__(self, client, listings, searches, deliveries, bypass_cache):
+        self.client = client
+        self.listings = listings
+        self.searches = searches
+        self.deliveries = deliveries
+        self.headers = {"X-Cache-Bypass": "1"} if bypass_cache else {}
+
+    def _call(self, rec, method, route, **kwargs):
+        started = time.perf_counter()
+        try:
+            status, headers, body = self.client.call(method, route, **kwargs)
+        except Exception:
+            status, headers, body = 0, {}, b""
+        rec.add(f"{method} {route}", time.perf_counter() - started, status)
+        return status, headers, body
+
+    def browse(self, rng, rec):
+        params = {"limit": 12}
+        shape = rng.random()
+        if shape < 0.3:
+            params["category"] = rng.choice(CATEGORIES)
+        elif shape < 0.45:
+            params["q"] = rng.choice(WORDS)
+        elif shape < 0.6:
+            _, lat, lng = rng.choice(CITIES)
+            params.update(lat=lat, lng=lng, radiusKm=rng.choice([5, 25]), sort=rng.choice(["recent", "distance"]))
+        # Scroll a few pages, as the feed does
+        params["cursor"] = ""
+        for _ in range(rng.choice([1, 1, 2, 3])):
+            status, headers, _ = self._call(rec, "GET", "listings", params=params, headers=self.headers)
+            nxt = headers.get("X-Next-Cursor") if status == 200 else None
+            if not nxt:
+                break
+            params["cursor"] = nxt
+
+    def basket(self, rng, rec):
+        lid = rng.choice(self.listings)
+        self._call(rec, "POST", "basket/{listingId}", route_params={"listingId": lid})
+        self._call(rec, "GET", "basket")
+        if rng.random() < 0.7:
+            self._call(rec, "DELETE", "basket/{listingId}", route_params={"listingId": lid})
+
+    def checkout(self, rng, rec):
+        for lid in rng.sample(self.listings, rng.randint(1, 3)):
+            self._call(rec, "POST", "basket/{listingId}", route_params={"listingId": lid})
+        self._call(rec, "POST", "orders/confirm")
+
+    def saved(self, rng, rec):
+        if rng.random() < 0.2:
+            self._call(rec, "GET", "saved-searches/matches")
+            return
+        sid = rng.choice(self.searches)
+        status, _, body = self._call(rec, "POST", "saved-searches/{sid}/run", route_params={"sid": sid},
+                                     params={"limit": 24})
+        if status == 200 and rng.random() < 0.3:
+            nxt = json.loads(body).get("next_cursor")
+            if nxt:
+                self._call(rec, "POST", "saved-searches/{sid}/run", route_params={"sid": sid},
+                           params={"limit": 24, "cursor": nxt})
+
+    def deliveries(self, rng, rec):
+        shape = rng.random()
+        if shape < 0.4:
+            status = rng.choice(["in_progress", "delivered", "canceled", "failed"])
+            body = {"status": status}
+            if status != "in_progress":
+                body["comment"] = f"{TAG} {status}"
+            self._call(rec, "POST", "deliveries/{deliveryId}/status",
+                       route_params={"deliveryId": rng.choice(self.deliveries)}, body=body)
+        elif shape < 0.8:
+            params = {"limit": 50, "cursor": ""}
+            if rng.random() < 0.5:
+                params["status"] = rng.choice(function_app.DELIVERY_STATUSES)
+            self._call(rec, "GET", "deliveries", params=params)
+        else:
+            self._call(rec, "GET", "deliveries", params={"updated_since": "", "limit": 200})
+
+
+def parse_mix(raw):
+    mix = {}
+    for part in raw.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("browse", "basket", "checkout", "saved", "deliveries"):
+            raise SystemExit(f"unknown workload {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def run(workload, mix, users, duration, warmup, seed):
+    names, weights = list(mix), list(mix.values())
+    stop_at = time.monotonic() + warmup + duration
+    measure_from = time.monotonic() + warmup
+
+    def user(i):
+        rng = random.Random(seed * 1000 + i)
+        rec, discard = Recorder(), Recorder()
+        while time.monotonic() < stop_at:
+            op = rng.choices(names, weights)[0]
+            getattr(workload, op)(rng, rec if time.monotonic() >= measure_from else discard)
+        return rec
+
+    with ThreadPoolExecutor(max_workers=users) as ex:
+        recorders = list(ex.map(user, range(users)))
+    merged = {}
+    for rec in recorders:
+        for key, samples in rec.samples.items():
+            merged.setdefault(key, []).extend(samples)
+    return merged
+
+
+def summarize(samples, duration):
+    lat = sorted(s for s, _ in samples)
+    statuses = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(samples),
+        "errors": sum(1 for _, status in samples if status == 0 or status >= 500),
+        "status": dict(sorted(statuses.items())),
+        "rps": round(len(samples) / duration, 2),
+        "mean_ms": round(sum(lat) * 1000 / len(lat), 2),
+        "p50_ms": round(pct(lat, 0.50) * 1000, 2),
+        "p95_ms": round(pct(lat, 0.95) * 1000, 2),
+        "p99_ms": round(pct(lat, 0.99) * 1000, 2),
+        "max_ms": round(lat[-1] * 1000, 2),
+    }
+
+
+def compare(report, baseline):
+    """Per-route change against a previous report, as text on stderr."""
+    print(f"\nvs {baseline['meta'].get('commit')} ({baseline['meta'].get('started_at')}):", file=sys.stderr)
+    rows = [("route", "rps", "p50_ms", "p95_ms", "p99_ms")]
+    for key in sorted(set(report["routes"]) | set(baseline["routes"])):
+        new, old = report["routes"].get(key), baseline["routes"].get(key)
+        if not new or not old:
+            rows.append((key, "only in " + ("new" if new else "baseline"), "", "", ""))
+            continue
+        cells = [key]
+        for m in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            delta = (new[m] - old[m]) / old[m] * 100 if old[m] else 0.0
+            cells.append(f"{new[m]} ({delta:+.1f}%)")
+        rows.append(tuple(cells))
+    widths = [max(len(str(r[i])) for r in rows) for i in range(5)]
+    for r in rows:
+        print("  ".join(str(c).ljust(w) for c, w in zip(r, widths)), file=sys.stderr)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--listings", type=count_arg, default=count_arg("10k"), help="10k, 100k, 1M, ...")
+    ap.add_argument("--saved-searches", type=int, default=50)
+    ap.add_argument("--orders", type=int, default=2000, help="pre-seeded orders with a pending delivery")
+    ap.add_argument("--reuse", action="store_true", help="only seed what is missing")
+    ap.add_argument("--seed-only", action="store_true")
+    ap.add_argument("--cleanup", action="store_true", help="delete everything the bench created and exit")
+    ap.add_argument("--base-url", help="e.g. http://localhost:7071/api; default is in-process")
+    ap.add_argument("--users", type=int, default=16)
+    ap.add_argument("--duration", type=float, default=60)
+    ap.add_argument("--warmup", type=float, default=10)
+    ap.add_argument("--mix", default=DEFAULT_MIX)
+    ap.add_argument("--sample", type=int, default=20_000, help="listing ids the workload picks from")
+    ap.add_argument("--bypass-cache", action="store_true", help="send X-Cache-Bypass on feed reads")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", help="also write the JSON report here")
+    ap.add_argument("--compare", help="previous report to diff against")
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+    mix = parse_mix(args.mix)
+
+    if args.cleanup:
+        print(json.dumps({"listings_deleted": cleanup()}))
+        return 0
+
+    os.environ.setdefault("SQL_POOL_SIZE", str(max(10, args.users)))
+    with function_app._conn() as c:
+        existing = seeded_count(c.cursor())
+    if not args.reuse and existing:
+        raise SystemExit(f"{existing} {TAG} listings already exist: pass --reuse or --cleanup")
+    if existing < args.listings:
+        seed_listings(args.listings - existing, rng)
+    seed_buyer_state(rng, args.saved_searches, args.orders)
+    if args.seed_only:
+        print(json.dumps({"bench_buyer": BENCH_BUYER, "listings": max(existing, args.listings)}))
+        return 0
+
+    listings, searches, deliveries = load_targets(args.sample)
+    if len(listings) < 3 or not searches or not deliveries:
+        raise SystemExit("nothing to drive: seed listings, saved searches and orders first")
+    client = HttpClient(args.base_url) if args.base_url else InProcessClient()
+    workload = Workload(client, listings, searches, deliveries, args.bypass_cache)
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    samples = run(workload, mix, args.users, args.duration, args.warmup, args.seed)
+    everything = [s for per_route in samples.values() for s in per_route]
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "started_at": started_at,
+            "target": args.base_url or "in-process",
+            "listings": max(existing, args.listings),
+            "users": args.users,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": mix,
+            "bypass_cache": args.bypass_cache,
+            "seed": args.seed,
+        },
+        "total": summarize(everything, args.duration) if everything else {},
+        "routes": {key: summarize(s, args.duration) for key, s in sorted(samples.items())},
+    }
+    if not args.base_url:
+        report["pool"] = function_app._sql_pool().stats()
+        report["listing_cache"] = function_app._listing_cache.stats()
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+    return 1 if report["total"].get("errors") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
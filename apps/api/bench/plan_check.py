@@ -0,0 +1,217 @@
+"""
+Plan regression check: no API query may fall back to a table scan.
+
+Seeds the load-test catalogue if it is missing (--listings, default 10k;
+see bench/load_test.py), then calls every database-backed route through
+the in-process handlers, with feed caches bypassed, over the query shapes
+the app uses: feed by category, keywords, radius, distance, paging and
+withState; facets; basket, favorites and their batch endpoints; checkout;
+saved searches; matches and catch-up; the deliveries feed, sync and status
+updates; the delivery change feed head.
+
+Afterwards it reads the cached plan of every statement executed in the
+database since the start (sys.dm_exec_query_stats; needs VIEW SERVER
+STATE) and fails if any contains
+  - a Table Scan (heap), or
+  - an unordered Clustered Index Scan (a full read of the table)
+on a permanent table. Ordered scans (keyset pages, TOP/MAX on a key),
+nonclustered/filtered index scans (e.g. the facet counts' pass over
+IX_listing_active_created), table variables and temp tables, and the
+objects given with --allow are not flagged.
+
+Run it against a database migrated with db/migrate.py:
+
+    python bench/plan_check.py --listings 100k --out plans.json
+"""
+import os
+import sys
+import json
+import uuid
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from bench import load_test  # noqa: E402
+from bench.load_test import (  # noqa: E402
+    BENCH_BUYER, CATEGORIES, CITIES, WORDS, TAG, InProcessClient, function_app,
+)
+import metrics  # noqa: E402
+
+SHOWPLAN = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+DEFAULT_ALLOW = ()
+
+# Statements executed since @since in this database, with their own plan
+PLANS_SQL = """
+SELECT SUBSTRING(st.text, qs.statement_start_offset / 2 + 1,
+                 (CASE qs.statement_end_offset WHEN -1 THEN DATALENGTH(st.text)
+                  ELSE qs.statement_end_offset END - qs.statement_start_offset) / 2 + 1),
+       qp.query_plan, qs.execution_count
+FROM sys.dm_exec_query_stats qs
+CROSS APPLY sys.dm_exec_sql_text(qs.sql_handle) st
+CROSS APPLY sys.dm_exec_text_query_plan(qs.plan_handle, qs.statement_start_offset, qs.statement_end_offset) qp
+CROSS APPLY (SELECT CAST(value AS INT) AS dbid FROM sys.dm_exec_plan_attributes(qs.plan_handle)
+             WHERE attribute = 'dbid') pa
+WHERE qs.last_execution_time >= ? AND pa.dbid = DB_ID()
+  AND st.text NOT LIKE '%dm_exec_query_stats%'
+"""
+
+
+def drive(client, rng, listings, searches, deliveries):
+    """One pass over every route shape; returns [(route, status)]."""
+    calls = []
+    bypass = {"X-Cache-Bypass": "1"}
+
+    def call(method, route, **kwargs):
+        status, headers, body = client.call(method, route, **kwargs)
+        calls.append((f"{method} {route}", status))
+        return status, headers, body
+
+    _, lat, lng = rng.choice(CITIES)
+
+    # Feed shapes, two pages each
+    for params in ({}, {"category": rng.choice(CATEGORIES)}, {"q": rng.choice(WORDS)},
+                   {"lat": lat, "lng": lng, "radiusKm": 25},
+                   {"lat": lat, "lng": lng, "radiusKm": 25, "sort": "distance"},
+                   {"category": rng.choice(CATEGORIES), "images": "all", "withState": "1"}):
+        params = dict(params, limit=12, cursor="")
+        status, headers, _ = call("GET", "listings", params=params, headers=bypass)
+        if status == 200 and headers.get("X-Next-Cursor"):
+            call("GET", "listings", params=dict(params, cursor=headers["X-Next-Cursor"]), headers=bypass)
+    call("GET", "listings/facets", headers=bypass)
+    call("GET", "listings/facets", params={"category": rng.choice(CATEGORIES)}, headers=bypass)
+
+    # Basket and favorites
+    picks = rng.sample(listings, 6)
+    for lid in picks[:2]:
+        call("POST", "basket/{listingId}", route_params={"listingId": lid})
+        call("POST", "favorites/{listingId}", route_params={"listingId": lid})
+    call("GET", "basket")
+    call("GET", "favorites")
+    call("POST", "basket:batch", body={"add": picks[2:4], "remove": picks[:1]})
+    call("POST", "favorites:batch", body={"add": picks[4:], "remove": picks[:1]})
+    call("DELETE", "basket/{listingId}", route_params={"listingId": picks[1]})
+    call("DELETE", "favorites/{listingId}", route_params={"listingId": picks[1]})
+    call("POST", "orders/confirm")
+
+    # Saved searches
+    status, _, body = call("POST", "saved-searches", body={"name": f"{TAG} plan", "category": rng.choice(CATEGORIES)})
+    call("GET", "saved-searches")
+    for sid in searches[:3]:
+        call("POST", "saved-searches/{sid}/run", route_params={"sid": sid}, params={"limit": 24})
+    if status == 201:
+        sid = json.loads(body)["saved_search_id"]
+        call("POST", "saved-searches/{sid}/toggle", route_params={"sid": sid})
+    call("GET", "saved-searches/matches")
+    call("POST", "saved-searches/matches/catch-up",
+         body={"since": (datetime.now(timezone.utc) - timedelta(hours=1)).replace(tzinfo=None).isoformat()})
+
+    # Deliveries
+    call("GET", "deliveries", params={"limit": 50, "cursor": ""})
+    call("GET", "deliveries", params={"limit": 50, "status": "pending"})
+    call("GET", "deliveries", params={"limit": 50, "deliverer_id": str(uuid.uuid4())})
+    call("GET", "deliveries", params={"updated_since": "", "limit": 200})
+    call("POST", "deliveries/{deliveryId}/status", route_params={"deliveryId": rng.choice(deliveries)},
+         body={"status": "in_progress"})
+    call("GET", "deliveries/changes", params={"since": "0", "wait": "0"})
+    return calls
+
+
+def scans(plan_xml, allow):
+    """[(operator, object)] of the flagged scans in one statement plan."""
+    found = []
+    root = ET.fromstring(plan_xml)
+    for relop in root.iter(SHOWPLAN + "RelOp"):
+        op = relop.get("PhysicalOp")
+        if op not in ("Table Scan", "Clustered Index Scan"):
+            continue
+        scan = relop.find(SHOWPLAN + "TableScan")
+        if scan is None:
+            scan = relop.find(SHOWPLAN + "IndexScan")
+        if scan is None:
+            continue
+        if op == "Clustered Index Scan" and scan.get("Ordered") == "true":
+            continue
+        obj = scan.find(SHOWPLAN + "Object")
+        if obj is None:
+            continue
+        table = (obj.get("Table") or "").strip("[]")
+        schema = (obj.get("Schema") or "").strip("[]")
+        if table.startswith(("@", "#")) or schema == "sys":
+            continue
+        name = f"{schema}.{table}"
+        if name in allow:
+            continue
+        found.append((op, name + (f" ({obj.get('Index').strip('[]')})" if obj.get("Index") else "")))
+    return found
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--listings", type=load_test.count_arg, default=load_test.count_arg("10k"),
+                    help="seed at least this many listings first")
+    ap.add_argument("--allow", action="append", default=list(DEFAULT_ALLOW),
+                    help="schema.object that may be scanned (repeatable)")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", help="also write the JSON report here")
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    with function_app._conn() as c:
+        existing = load_test.seeded_count(c.cursor())
+    if existing < args.listings:
+        load_test.seed_listings(args.listings - existing, rng)
+    load_test.seed_buyer_state(rng, 20, 200)
+    listings, searches, deliveries = load_test.load_targets(200)
+    if len(listings) < 10 or not searches or not deliveries:
+        raise SystemExit("nothing to drive: the seed has no listings, saved searches or orders")
+
+    # Only what the API runs from here on is checked, not the seeding above
+    with function_app._conn() as c:
+        cur = c.cursor()
+        cur.execute("SELECT SYSUTCDATETIME()")
+        since = cur.fetchone()[0]
+    started = datetime.now(timezone.utc)
+    calls = drive(InProcessClient(), rng, listings, searches, deliveries)
+    failed_calls = [f"{route}: {status}" for route, status in calls if status >= 500]
+
+    with function_app._conn() as c:
+        cur = c.cursor()
+        cur.execute(PLANS_SQL, since)
+        rows = cur.fetchall()
+
+    statements, problems = {}, []
+    for text, plan, executions in rows:
+        if not plan:
+            continue
+        fp = metrics.fingerprint(text)
+        entry = statements.setdefault(fp, {"sql": " ".join(text.split())[:300], "executions": 0, "scans": []})
+        entry["executions"] += executions
+        for op, obj in scans(plan, set(args.allow)):
+            if [op, obj] not in entry["scans"]:
+                entry["scans"].append([op, obj])
+    for fp, entry in sorted(statements.items()):
+        for op, obj in entry["scans"]:
+            problems.append(f"{fp}: {op} on {obj}: {entry['sql'][:160]}")
+
+    report = {
+        "started_at": started.isoformat(timespec="seconds"),
+        "bench_buyer": BENCH_BUYER,
+        "listings": max(existing, args.listings),
+        "calls": len(calls),
+        "failed_calls": failed_calls,
+        "statements": len(statements),
+        "problems": problems,
+        "plans": statements,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    print(json.dumps({k: v for k, v in report.items() if k != "plans"}, indent=2))
+    return 1 if problems or failed_calls else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
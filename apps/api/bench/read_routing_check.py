@@ -0,0 +1,122 @@
+"""
+Local check of the read/write split, against two separate databases.
+
+SQL_CONN_STR is the primary and SQL_READ_CONN_STR a second database with
+the same db/ migrations applied -- no replication between them, so each read
+shows which side served it. Calls the handlers in-process and verifies:
+  - GET /listings is served by the replica
+  - GET /basket right after POST /basket/{id} comes from the primary
+    (read-your-writes) and includes the new item
+  - once SQL_READ_YOUR_WRITES_S has passed, GET /basket goes back to the
+    replica (which never saw the write)
+  - with an unreachable replica, reads fall back to the primary
+
+Rows it creates on either database are removed afterwards.
+
+    python bench/read_routing_check.py
+"""
+import os
+import sys
+import json
+import time
+import uuid
+
+import pyodbc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import function_app  # noqa: E402
+from bench.load_test import InProcessClient  # noqa: E402
+
+# After the load_test import, which sets its own bench buyer
+BUYER = str(uuid.uuid4())
+os.environ["DEV_BUYER_ID"] = BUYER
+os.environ["SQL_READ_YOUR_WRITES_S"] = "1"
+
+
+def checkouts(pool):
+    return pool.stats()["checkouts"] if pool is not None else 0
+
+
+def served_by(client, method, route, **kwargs):
+    """(status, body, 'primary' | 'replica') for one call."""
+    primary, replica = checkouts(function_app._pool), checkouts(function_app._read_pool)
+    status, _, body = client.call(method, route, **kwargs)
+    if checkouts(function_app._read_pool) > replica:
+        side = "replica"
+    elif checkouts(function_app._pool) > primary:
+        side = "primary"
+    else:
+        side = "none"
+    return status, body, side
+
+
+def seed(conn_str, listing_id):
+    with pyodbc.connect(conn_str) as c:
+        c.cursor().execute("""
+          INSERT INTO dbo.listing (listing_id, title, category, price_cents, city, is_active)
+          VALUES (?, 'read-routing-check', 'toys', 100, 'Lisbon', 1)
+        """, listing_id)
+        c.commit()
+
+
+def cleanup(conn_str, listing_id):
+    with pyodbc.connect(conn_str) as c:
+        cur = c.cursor()
+        cur.execute("DELETE FROM dbo.basket_item WHERE user_id = ?", BUYER)
+        cur.execute("DELETE FROM dbo.listing WHERE listing_id = ?", listing_id)
+        c.commit()
+
+
+def main():
+    primary_cs, replica_cs = os.getenv("SQL_CONN_STR"), os.getenv("SQL_READ_CONN_STR")
+    if not primary_cs or not replica_cs:
+        raise SystemExit("set SQL_CONN_STR and SQL_READ_CONN_STR (two databases with the db/ migrations applied)")
+
+    listing_id = str(uuid.uuid4())
+    client = InProcessClient()
+    problems, report = [], {}
+    for cs in (primary_cs, replica_cs):
+        seed(cs, listing_id)
+    try:
+        status, _, side = served_by(client, "GET", "listings", params={"limit": "5"})
+        report["listings"] = side
+        if status != 200 or side != "replica":
+            problems.append(f"GET /listings: status {status}, served by {side}")
+
+        status, _, _ = client.call("POST", "basket/{listingId}", route_params={"listingId": listing_id})
+        if status >= 300:
+            problems.append(f"POST /basket: status {status}")
+        status, body, side = served_by(client, "GET", "basket")
+        report["basket_after_write"] = side
+        ids = {i["listing_id"].lower() for i in json.loads(body)} if status == 200 else set()
+        if side != "primary" or listing_id not in ids:
+            problems.append(f"GET /basket after write: served by {side}, new item "
+                            f"{'present' if listing_id in ids else 'missing'}")
+
+        time.sleep(float(os.environ["SQL_READ_YOUR_WRITES_S"]) + 0.2)
+        status, _, side = served_by(client, "GET", "basket")
+        report["basket_later"] = side
+        if side != "replica":
+            problems.append(f"GET /basket after the read-your-writes window: served by {side}")
+
+        # Unreachable replica: the read must still succeed, on the primary
+        function_app._read_pool = None
+        os.environ["SQL_READ_CONN_STR"] = "Driver={ODBC Driver 18 for SQL Server};Server=tcp:127.0.0.1,1;" \
+                                          "Database=none;UID=x;PWD=x;Connection Timeout=2"
+        status, _, side = served_by(client, "GET", "listings", params={"limit": "5", "category": "toys"})
+        report["listings_replica_down"] = side
+        if status != 200 or side != "primary":
+            problems.append(f"GET /listings with replica down: status {status}, served by {side}")
+        if function_app._read_down_until <= time.monotonic():
+            problems.append("replica failure did not mark it down")
+    finally:
+        for cs in (primary_cs, replica_cs):
+            cleanup(cs, listing_id)
+
+    report["problems"] = problems
+    print(json.dumps(report, indent=2))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
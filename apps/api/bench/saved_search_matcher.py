@@ -0,0 +1,153 @@
+"""
+Benchmark for the saved-search alert index (search_alerts.SavedSearchIndex).
+
+Builds an index of synthetic saved searches (default 100k), then feeds it
+listings at a steady rate and reports per-listing match latency. About a
+third of the searches are pickup-radius searches. A naive
+"evaluate every search" matcher is timed on a sample for comparison.
+Pure Python, no database needed.
+
+    python bench/saved_search_matcher.py --searches 100000 --rate 200 --seconds 10
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from search_alerts import SavedSearchIndex, MATCH_FIELDS, search_key, search_geo, distance_km  # noqa: E402
+
+CATEGORIES = ["clothing", "furniture", "hygiene", "feeding", "mobility", "safety", "toys", "health"]
+SIZES = ["0-3m", "3-6m", "6-12m", "12-18m", "18-24m", "24-36m", "3-4y", "4-5y", "5-6y"]
+CONDITIONS = ["new", "like-new", "good", "fair"]
+# A realistic spread of pickup towns, so buckets stay small like they would in production
+CITIES = ["Lisbon", "Porto", "Faro", "Braga", "Coimbra", "Paris", "Lyon", "Marseille",
+          "Bordeaux", "Lille", "Toulouse", "Nantes", "London", "Manchester", "Bristol"] + \
+         [f"town-{i:03d}" for i in range(285)]
+VALUES = {"category": CATEGORIES, "size": SIZES, "condition": CONDITIONS, "city": CITIES}
+# Town centres scattered over western Europe
+_coords = random.Random(0)
+CITY_COORDS = {c: (_coords.uniform(37.0, 54.0), _coords.uniform(-9.5, 8.0)) for c in CITIES}
+
+
+def near(rng, city, jitter_deg=0.2):
+    lat, lng = CITY_COORDS[city]
+    return round(lat + rng.uniform(-jitter_deg, jitter_deg), 6), round(lng + rng.uniform(-jitter_deg, jitter_deg), 6)
+
+
+def random_query(rng):
+    # Most searches pin category and either a city or a pickup radius;
+    # size/condition are optional refinements
+    q = {}
+    if rng.random() < 0.9:
+        q["category"] = rng.choice(CATEGORIES)
+    r = rng.random()
+    if r < 0.5:
+        q["city"] = rng.choice(CITIES)
+    elif r < 0.85:
+        q["lat"], q["lng"] = near(rng, rng.choice(CITIES))
+        q["radiusKm"] = rng.choice([5, 10, 25, 50])
+    if rng.random() < 0.4:
+        q["size"] = rng.choice(SIZES)
+    if rng.random() < 0.3:
+        q["condition"] = rng.choice(CONDITIONS)
+    return q
+
+
+def random_listing(rng):
+    listing = {f: rng.choice(VALUES[f]) for f in MATCH_FIELDS}
+    if rng.random() < 0.3:
+        listing["size"] = None
+    if rng.random() < 0.8:
+        listing["latitude"], listing["longitude"] = near(rng, listing["city"])
+    return listing
+
+
+def naive_match(searches, listing):
+    out = []
+    for sid, uid, q in searches:
+        if not all(str(listing.get(f) or "").lower() == v for f, v in search_key(q)):
+            continue
+        geo = search_geo(q)
+        if geo:
+            if listing.get("latitude") is None:
+                continue
+            if distance_km(geo[0], geo[1], listing["latitude"], listing["longitude"]) > geo[2]:
+                continue
+        out.append((sid, uid))
+    return out
+
+
+def pct(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--searches", type=int, default=100_000)
+    ap.add_argument("--rate", type=float, default=200.0, help="listings per second")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--naive-sample", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+    rng = random.Random(args.seed)
+
+    searches = [(f"s{i}", f"u{i % 20000}", random_query(rng)) for i in range(args.searches)]
+    started = time.perf_counter()
+    index = SavedSearchIndex()
+    for sid, uid, q in searches:
+        index.add(sid, uid, q)
+    build_s = time.perf_counter() - started
+
+    # Steady ingest: one listing every 1/rate seconds
+    interval = 1.0 / args.rate
+    total = int(args.rate * args.seconds)
+    latencies, matched, late = [], 0, 0
+    next_at = time.perf_counter()
+    for _ in range(total):
+        listing = random_listing(rng)
+        now = time.perf_counter()
+        if now < next_at:
+            time.sleep(next_at - now)
+        elif now - next_at > interval:
+            late += 1
+        t0 = time.perf_counter()
+        hits = index.match(listing)
+        latencies.append(time.perf_counter() - t0)
+        matched += len(hits)
+        next_at += interval
+
+    naive = []
+    mismatches = 0
+    for _ in range(args.naive_sample):
+        listing = random_listing(rng)
+        t0 = time.perf_counter()
+        expected = naive_match(searches, listing)
+        naive.append(time.perf_counter() - t0)
+        if sorted(expected) != sorted(index.match(listing)):
+            mismatches += 1
+
+    latencies.sort()
+    naive.sort()
+    print(json.dumps({
+        "searches": args.searches,
+        "index_build_s": round(build_s, 3),
+        "listings": total,
+        "target_rate_per_s": args.rate,
+        "late_ticks": late,
+        "matches": matched,
+        "avg_matches_per_listing": round(matched / total, 2) if total else 0,
+        "match_p50_us": round(pct(latencies, 0.50) * 1e6, 1),
+        "match_p99_us": round(pct(latencies, 0.99) * 1e6, 1),
+        "match_max_us": round(latencies[-1] * 1e6, 1),
+        "naive_p50_ms": round(pct(naive, 0.50) * 1e3, 2),
+        "naive_p99_ms": round(pct(naive, 0.99) * 1e3, 2),
+        "naive_mismatches": mismatches,
+    }, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
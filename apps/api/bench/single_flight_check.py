@@ -0,0 +1,153 @@
+"""
+Check that identical concurrent reads share one SQL execution.
+
+First exercises SingleFlight on its own (no database): N threads released
+together on one key must run the function once, all get its value, share
+its exception, and fall back to their own call when the leader outlasts
+the wait bound.
+
+Then, with SQL_CONN_STR set (db/ migrations applied), fires N parallel
+identical GET /listings?category=... and N identical
+POST /saved-searches/{sid}/run requests through the in-process handlers
+and verifies that each burst ran the listing page query exactly once and
+every caller got the same body. The page query is held for --hold-ms so
+all N requests arrive while it is in flight.
+
+    python bench/single_flight_check.py --requests 32
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from single_flight import SingleFlight  # noqa: E402
+
+
+def burst(n, fn):
+    """Run fn(i) on n threads released at the same moment; returns results or exceptions."""
+    gate = threading.Barrier(n)
+
+    def run(i):
+        gate.wait()
+        try:
+            return fn(i)
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers=n) as pool:
+        return list(pool.map(run, range(n)))
+
+
+def check_single_flight(n, problems):
+    calls = []
+
+    def slow(value, seconds=0.2):
+        def fn():
+            calls.append(1)
+            time.sleep(seconds)
+            return value
+        return fn
+
+    flight = SingleFlight(wait_timeout=5)
+    results = burst(n, lambda i: flight.do("k", slow("page"), "demo"))
+    shared = sum(1 for r in results if r == ("page", True))
+    if len(calls) != 1 or shared != n - 1 or ("page", False) not in results:
+        problems.append(f"single flight: {len(calls)} executions, {shared} shared of {n}")
+    if flight.stats()["keys"].get("demo") != {"leaders": 1, "merged": n - 1, "wait_timeouts": 0}:
+        problems.append(f"single flight stats: {flight.stats()['keys']}")
+
+    def failing():
+        time.sleep(0.2)
+        raise RuntimeError("boom")
+    results = burst(n, lambda i: flight.do("err", failing))
+    if not all(isinstance(r, RuntimeError) for r in results):
+        problems.append("single flight: an exception was not shared by every caller")
+    if flight.stats()["in_flight"]:
+        problems.append("single flight: a finished call is still registered")
+
+    calls.clear()
+    bounded = SingleFlight(wait_timeout=0.05)
+    burst(n, lambda i: bounded.do("k", slow("page", 0.5)))
+    timeouts = bounded.stats()["wait_timeouts"]
+    if len(calls) != n or timeouts != n - 1:
+        problems.append(f"bounded wait: {len(calls)} executions, {timeouts} wait timeouts of {n}")
+
+
+def check_handlers(n, hold_s, problems, report):
+    import pyodbc
+    import function_app
+    from bench.load_test import InProcessClient
+
+    # After the load_test import, which sets its own bench buyer
+    buyer = str(uuid.uuid4())
+    os.environ["DEV_BUYER_ID"] = buyer
+
+    executions = []
+    page = function_app._listing_page
+
+    def counted_page(*args, **kwargs):
+        executions.append(1)
+        time.sleep(hold_s)
+        return page(*args, **kwargs)
+    function_app._listing_page = counted_page
+
+    client = InProcessClient()
+    with pyodbc.connect(os.environ["SQL_CONN_STR"]) as c:
+        cur = c.cursor()
+        cur.execute("""
+          INSERT INTO dbo.saved_search (user_id, name, query_json, is_active)
+          OUTPUT inserted.saved_search_id
+          VALUES (?, 'single-flight-check', '{"category": "toys"}', 1)
+        """, buyer)
+        sid = str(cur.fetchone()[0])
+        c.commit()
+    try:
+        bursts = {
+            "listings": lambda i: client.call("GET", "listings", params={"category": "toys", "limit": "12"}),
+            "saved-search": lambda i: client.call("POST", "saved-searches/{sid}/run", route_params={"sid": sid}),
+        }
+        for name, call in bursts.items():
+            function_app._listing_cache.invalidate()
+            executions.clear()
+            results = burst(n, call)
+            errors = [r for r in results if isinstance(r, Exception)]
+            statuses = sorted({r[0] for r in results if not isinstance(r, Exception)})
+            bodies = {r[2] for r in results if not isinstance(r, Exception)}
+            report[name] = {"requests": n, "sql_executions": len(executions), "statuses": statuses}
+            if errors or statuses != [200]:
+                problems.append(f"{name}: statuses {statuses}, errors {errors[:1]}")
+            if len(executions) != 1:
+                problems.append(f"{name}: {len(executions)} page queries for {n} identical requests")
+            if len(bodies) != 1:
+                problems.append(f"{name}: {len(bodies)} different response bodies")
+        report["single_flight"] = function_app._inflight.stats()
+    finally:
+        function_app._listing_page = page
+        with pyodbc.connect(os.environ["SQL_CONN_STR"]) as c:
+            c.cursor().execute("DELETE FROM dbo.saved_search WHERE saved_search_id = ?", sid)
+            c.commit()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--requests", type=int, default=32, help="parallel identical requests per burst")
+    ap.add_argument("--hold-ms", type=float, default=300, help="extra time the page query stays in flight")
+    args = ap.parse_args()
+
+    problems, report = [], {}
+    check_single_flight(args.requests, problems)
+    if os.getenv("SQL_CONN_STR"):
+        check_handlers(args.requests, args.hold_ms / 1000, problems, report)
+    else:
+        report["handlers"] = "skipped (SQL_CONN_STR not set)"
+    report["problems"] = problems
+    print(json.dumps(report, indent=2))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
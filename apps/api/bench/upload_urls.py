@@ -0,0 +1,67 @@
+"""
+Upload-URL minting benchmark.
+
+Times _mint_upload_urls (what POST /listings/{id}/upload-urls does after
+its listing check) for batches of 1, 10 and 50 files. Signing is local, so
+no storage account is contacted; BLOB_CONN_STR defaults to Azurite's
+well-known development account. The first call, which parses the
+connection string and builds the client, is reported separately.
+
+    python bench/upload_urls.py --repeats 2000
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+
+AZURITE_CONN_STR = (
+    "DefaultEndpointsProtocol=http;AccountName=devstoreaccount1;"
+    "AccountKey=Eby8vdM02xNOcqFlqUwJPLlmEtlCDXJ1OUzFT50uSRZ6IFsuFq2UVErCz4I6tq/K1SZFPTOtr/KBHBeksoGMGw==;"
+    "BlobEndpoint=http://127.0.0.1:10000/devstoreaccount1;"
+)
+os.environ.setdefault("BLOB_CONN_STR", AZURITE_CONN_STR)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import function_app  # noqa: E402
+
+
+def pct(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--batches", default="1,10,50")
+    ap.add_argument("--repeats", type=int, default=2000)
+    args = ap.parse_args()
+
+    container = function_app._container_name()
+    lid = str(uuid.uuid4())
+    files = lambda n: [{"ext": "jpg"} for _ in range(n)]  # noqa: E731
+
+    t0 = time.perf_counter()
+    first = function_app._mint_upload_urls(lid, files(1), container)
+    results = {"cold_first_call_ms": round((time.perf_counter() - t0) * 1000, 3),
+               "sample_upload_url": first[0]["uploadUrl"], "batches": {}}
+
+    for n in [int(b) for b in args.batches.split(",")]:
+        batch = files(n)
+        times = []
+        for _ in range(args.repeats):
+            t0 = time.perf_counter()
+            function_app._mint_upload_urls(lid, batch, container)
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        results["batches"][str(n)] = {
+            "p50_ms": round(pct(times, 0.50) * 1000, 3),
+            "p99_ms": round(pct(times, 0.99) * 1000, 3),
+        }
+
+    print(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
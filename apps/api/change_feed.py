@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+
+class ChangeFeed:
+    """
+    In-process fan-out over an append-only event table.
+
+    One poller thread per worker reads events after its watermark with
+    `fetch(after_id)` -> [(event_id, event), ...] (ascending) and keeps the
+    most recent `buffer_size` of them in memory. Waiting clients register
+    with `watch()` and are woken when a matching event arrives, so one DB
+    read serves every subscriber on the worker. The poller only runs while
+    someone is waiting; `notify()` makes it poll right away (used after a
+    local write).
+    """
+
+    def __init__(self, fetch, head, poll_interval=0.5, buffer_size=2000, name="feed", id_key="event_id"):
+        self._fetch = fetch
+        self._head = head
+        self.poll_interval = float(poll_interval)
+        self.name = name
+        self.id_key = id_key
+        self._buffer = deque(maxlen=max(1, int(buffer_size)))
+        self._cond = threading.Condition()
+        self._waiters = []          # [Waiter]
+        self._watermark = None      # highest event id seen; None until start()
+        self._floor = None          # events after this id are all in the buffer
+        self._thread = None
+        self._poke = False
+
+        self.polls = 0
+        self.poll_errors = 0
+        self.events_seen = 0
+        self.deliveries = 0
+        self.timeouts = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        head = int(self._head() or 0)
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._watermark = self._floor = head
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-poller", daemon=True)
+            self._thread.start()
+
+    def head(self) -> int:
+        """Newest event id this worker has seen."""
+        with self._cond:
+            return self._watermark or 0
+
+    def notify(self):
+        with self._cond:
+            self._poke = True
+            self._cond.notify_all()
+
+    def _matching(self, since, predicate, limit):
+        out = []
+        for event_id, event in self._buffer:
+            if event_id > since and predicate(event):
+                out.append(event)
+                if len(out) >= limit:
+                    break
+        return out
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def watch(self, since: int, predicate, limit: int = 100):
+        """
+        Register interest in events after `since` that satisfy `predicate`.
+        Returns None when such events may already have left the buffer (read
+        them from the table instead); otherwise a Waiter whose future, bound
+        to the running event loop, resolves with the matching events --
+        immediately if some are already buffered. Always unwatch() it.
+        """
+        self.start()
+        waiter = Waiter(since, predicate, limit, asyncio.get_running_loop())
+        with self._cond:
+            if since < self._floor:
+                return None
+            events = self._matching(since, predicate, limit)
+            if events:
+                waiter.events = events
+                waiter.future.set_result(events)
+                self.deliveries += 1
+            else:
+                self._waiters.append(waiter)
+                self._cond.notify_all()
+        return waiter
+
+    def unwatch(self, waiter) -> tuple:
+        """
+        Stop waiting. Returns (events, next_id): the events delivered to the
+        waiter, and the id to resume from -- the last delivered event, or the
+        watermark if nothing matched (every event up to it was checked).
+        """
+        with self._cond:
+            if waiter.events is not None:
+                return waiter.events, waiter.events[-1][self.id_key]
+            self._waiters = [w for w in self._waiters if w is not waiter]
+            self.timeouts += 1
+            return [], max(waiter.since, self._watermark)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._waiters:
+                    self._cond.wait()
+                if not self._poke:
+                    self._cond.wait(self.poll_interval)
+                self._poke = False
+                after = self._watermark
+            try:
+                batch = self._fetch(after)
+                self.polls += 1
+            except Exception:
+                self.poll_errors += 1
+                logging.exception("%s poll failed", self.name)
+                time.sleep(self.poll_interval)
+                continue
+            if batch:
+                self._publish(batch)
+
+    def _publish(self, batch):
+        with self._cond:
+            for event_id, event in batch:
+                if event_id <= self._watermark:
+                    continue
+                if len(self._buffer) == self._buffer.maxlen:
+                    self._floor = self._buffer[0][0]
+                self._buffer.append((event_id, event))
+                self._watermark = event_id
+                self.events_seen += 1
+            still = []
+            for w in self._waiters:
+                events = self._matching(w.since, w.predicate, w.limit)
+                if events:
+                    w.events = events
+                    w.loop.call_soon_threadsafe(_resolve, w.future, events)
+                    self.deliveries += 1
+                else:
+                    still.append(w)
+            self._waiters = still
+
+    def stats(self):
+        with self._cond:
+            return {
+                "name": self.name,
+                "running": self.running,
+                "watermark": self._watermark,
+                "buffer_floor": self._floor,
+                "buffered": len(self._buffer),
+                "waiters": len(self._waiters),
+                "polls": self.polls,
+                "poll_errors": self.poll_errors,
+                "events_seen": self.events_seen,
+                "deliveries": self.deliveries,
+                "timeouts": self.timeouts,
+            }
+
+
+class Waiter:
+    __slots__ = ("since", "predicate", "limit", "loop", "future", "events")
+
+    def __init__(self, since, predicate, limit, loop):
+        self.since = since
+        self.predicate = predicate
+        self.limit = limit
+        self.loop = loop
+        self.future = loop.create_future()
+        self.events = None
+
+
+def _resolve(future, events):
+    if not future.done():
+        future.set_result(events)
@@ -1,25 +1,290 @@
 import os
+import asyncio
 import json
+import re
+import base64
+import hashlib
+import time
 import logging
-from uuid import UUID
+import inspect
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager, ExitStack
+from uuid import UUID, uuid4
 import pyodbc
 import azure.functions as func
-from datetime import datetime, timedelta
-from azure.storage.blob import (
-    BlobServiceClient,
-    generate_blob_sas,
-    BlobSasPermissions,
-)
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from sql_pool import ConnectionPool, PoolTimeout
+from ttl_cache import TTLCache
+from single_flight import SingleFlight
+from search_alerts import SavedSearchIndex
+import image_variants
+from change_feed import ChangeFeed
+import listing_import
+import metrics
 
 # ---------- App ----------
 app = func.FunctionApp(http_auth_level=func.AuthLevel.ANONYMOUS)
 
+# Per-route latency is always recorded; METRICS_SAMPLE_RATE (0-1) sets the
+# share of requests that also get connect/execute/fetch/serialize phases and
+# per-statement timings. Statements slower than SQL_SLOW_MS are logged.
+metrics.configure(
+    sample_rate=float(os.getenv("METRICS_SAMPLE_RATE") or 1.0),
+    slow_ms=float(os.getenv("SQL_SLOW_MS") or 500),
+)
+
+# ASYNC_HANDLERS=1 registers every HTTP route as a coroutine. Blocking
+# pyodbc and Blob calls run on a dedicated executor (ASYNC_IO_THREADS,
+# default 32) instead of the host's request threads, so one worker keeps
+# more requests in flight, and routes with an `aio` variant overlap their
+# independent I/O. Off by default; bench/async_mode.py compares the two.
+_ASYNC_HANDLERS = (os.getenv("ASYNC_HANDLERS") or "").strip().lower() in ("1", "true")
+_io_executor = None
+_io_lock = threading.Lock()
+
+def _io_pool() -> ThreadPoolExecutor:
+    global _io_executor
+    if _io_executor is None:
+        with _io_lock:
+            if _io_executor is None:
+                _io_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("ASYNC_IO_THREADS") or 32),
+                    thread_name_prefix="async-io",
+                )
+    return _io_executor
+
+async def _io(fn, *args):
+    """Await a blocking call on the I/O executor; it still sees the request's metrics context."""
+    ctx = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_io_pool(), functools.partial(ctx.run, fn, *args))
+
+def _as_handler(coro_fn, fn):
+    # The host names the function after the Python callable
+    coro_fn.__name__ = coro_fn.__qualname__ = fn.__name__
+    coro_fn.__doc__ = fn.__doc__
+    return coro_fn
+
+def _route(route: str, methods: list, aio=None, **kwargs):
+    """
+    @app.route plus metrics.instrument, labelled with the route template.
+    With ASYNC_HANDLERS a sync handler is registered as a coroutine: `aio`
+    when given, otherwise the handler itself run on the I/O executor.
+    """
+    def decorator(fn):
+        handler = fn
+        if _ASYNC_HANDLERS and not inspect.iscoroutinefunction(fn):
+            if aio is None:
+                async def offloaded(req: func.HttpRequest) -> func.HttpResponse:
+                    return await _io(fn, req)
+                aio_fn = offloaded
+            else:
+                aio_fn = aio
+            handler = _as_handler(aio_fn, fn)
+        return app.route(route=route, methods=methods, **kwargs)(
+            metrics.instrument(route, ",".join(methods))(handler))
+    return decorator
+
+def _dumps(obj) -> str:
+    """json.dumps counted as the request's "serialize" phase."""
+    with metrics.timed("serialize"):
+        return json.dumps(obj)
+
 # ---------- Helpers ----------
-def _conn():
-    conn_str = os.getenv("SQL_CONN_STR")
-    if not conn_str:
-        raise RuntimeError("Missing SQL_CONN_STR")
-    return pyodbc.connect(conn_str)
+_pool = None
+_pool_lock = threading.Lock()
+
+def _is_disconnect(exc: BaseException) -> bool:
+    # SQLSTATE class 08 = connection exception (link failure, server went away, ...)
+    return isinstance(exc, pyodbc.Error) and bool(exc.args) and str(exc.args[0]).startswith("08")
+
+def _reset_session(conn):
+    # Session options some batches turn on and switch back off at their
+    # end; an error can stop the batch before it gets there
+    conn.cursor().execute("SET XACT_ABORT OFF; SET DEADLOCK_PRIORITY NORMAL; SET LOCK_TIMEOUT -1;")
+
+def _new_pool(conn_str: str, name: str) -> ConnectionPool:
+    return ConnectionPool(
+        lambda: pyodbc.connect(conn_str),
+        max_size=int(os.getenv("SQL_POOL_SIZE") or 10),
+        max_wait=float(os.getenv("SQL_POOL_MAX_WAIT_S") or 5),
+        idle_timeout=float(os.getenv("SQL_POOL_IDLE_TIMEOUT_S") or 300),
+        validate_after=float(os.getenv("SQL_POOL_VALIDATE_AFTER_S") or 30),
+        is_disconnect=_is_disconnect,
+        reset=_reset_session,
+        name=name,
+    )
+
+def _sql_pool() -> ConnectionPool:
+    """
+    Process-wide SQL connection pool, created on first use.
+    Sized per Functions worker via SQL_POOL_* settings.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                conn_str = os.getenv("SQL_CONN_STR")
+                if not conn_str:
+                    raise RuntimeError("Missing SQL_CONN_STR")
+                _pool = _new_pool(conn_str, "sql")
+    return _pool
+
+# Optional read replica (SQL_READ_CONN_STR, e.g. the primary's string plus
+# ApplicationIntent=ReadOnly). Read-only handlers use it unless:
+#  - it failed recently: after a connect/disconnect error reads go to the
+#    primary for SQL_READ_RETRY_S (default 30)
+#  - the scope they read (a buyer, "deliveries", "listings") was written on this
+#    worker in the last SQL_READ_YOUR_WRITES_S (default 5), so a re-read
+#    right after a mutation sees it despite replica lag
+_read_pool = None
+_read_down_until = 0.0
+_recent_writes = {}     # scope -> monotonic time of the last committed write
+
+def _sql_read_pool():
+    """Replica pool, or None when SQL_READ_CONN_STR is not set."""
+    global _read_pool
+    if _read_pool is None and os.getenv("SQL_READ_CONN_STR"):
+        with _pool_lock:
+            if _read_pool is None:
+                _read_pool = _new_pool(os.getenv("SQL_READ_CONN_STR"), "sql-read")
+    return _read_pool
+
+def _replica_failed(exc: BaseException):
+    global _read_down_until
+    retry = float(os.getenv("SQL_READ_RETRY_S") or 30)
+    _read_down_until = time.monotonic() + retry
+    logging.warning("read replica unavailable (%s); using the primary for %.0fs", exc, retry)
+
+def _pick_pool(read_only: bool, scope) -> ConnectionPool:
+    if not read_only or time.monotonic() < _read_down_until:
+        return _sql_pool()
+    if scope is not None:
+        wrote = _recent_writes.get(scope)
+        if wrote is not None and time.monotonic() - wrote < float(os.getenv("SQL_READ_YOUR_WRITES_S") or 5):
+            return _sql_pool()
+    return _sql_read_pool() or _sql_pool()
+
+def _note_write(scope):
+    """Send this worker's reads of `scope` to the primary for the next few seconds."""
+    now = time.monotonic()
+    if len(_recent_writes) > 10_000:
+        window = float(os.getenv("SQL_READ_YOUR_WRITES_S") or 5)
+        for key, at in list(_recent_writes.items()):
+            if now - at >= window:
+                _recent_writes.pop(key, None)
+    _recent_writes[scope] = now
+
+@contextmanager
+def _conn(read_only: bool = False, scope=None):
+    """
+    `with _conn() as c:` checks a pooled connection out for the block.
+    Commits on success, rolls back on error, then returns it to the pool.
+    In a sampled request the connection's cursors are timed per statement.
+
+    read_only=True may use the read replica (see _pick_pool); read
+    handlers go through _read, which retries on the primary if the replica
+    drops mid-query. `scope` names what the block reads or writes --
+    usually the buyer id; a write to a scope sends this worker's reads of
+    it to the primary for a few seconds.
+
+    Read-your-writes is tracked per worker (_recent_writes is process
+    memory): a write served by one instance followed by a read on another
+    can still see the replica's older copy, up to its replication lag.
+    """
+    pool = _pick_pool(read_only, scope)
+    replica = pool is not _sql_pool()
+    ctx = metrics.current()
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        try:
+            c = stack.enter_context(pool.connection())
+        except (PoolTimeout, pyodbc.Error) as e:
+            if not replica:
+                raise
+            _replica_failed(e)
+            replica = False
+            c = stack.enter_context(_sql_pool().connection())
+        try:
+            if ctx is None:
+                yield c
+            else:
+                ctx.add("connect", time.perf_counter() - started)
+                timed = metrics.TimedConnection(c, ctx)
+                try:
+                    yield timed
+                finally:
+                    timed.flush()
+        except BaseException as e:
+            if replica and _is_disconnect(e):
+                _replica_failed(e)
+            raise
+    if not read_only and scope is not None:
+        _note_write(scope)
+
+def _read(fn, scope=None):
+    """
+    fn(conn) on a read connection (see _conn). If the replica drops while
+    fn runs, _conn marks it down and fn runs once more, on the primary, so
+    the request doesn't fail with it. fn must only read.
+    """
+    down_until = _read_down_until
+    try:
+        with _conn(read_only=True, scope=scope) as c:
+            return fn(c)
+    except Exception as e:
+        if not _is_disconnect(e) or _read_down_until == down_until:
+            raise
+    with _conn(read_only=True, scope=scope) as c:
+        return fn(c)
+
+# Listing feed pages, keyed on the normalized query. Write handlers that
+# change listings or their images call _listing_cache.invalidate() after
+# a write scoped "listings"; the reads that refill the cache use that
+# scope too, so they don't cache a lagging replica's copy of the old rows.
+_listing_cache = TTLCache(
+    max_entries=int(os.getenv("LISTING_CACHE_SIZE") or 256),
+    ttl=float(os.getenv("LISTING_CACHE_TTL_S") or 30),
+)
+
+# Identical reads that arrive together (a popular category card, a push
+# notification) share one SQL execution and its serialized JSON. Callers
+# wait at most SINGLE_FLIGHT_WAIT_S (default 5) for the one in flight.
+_inflight = SingleFlight(wait_timeout=float(os.getenv("SINGLE_FLIGHT_WAIT_S") or 5))
+
+def _coalesced(key, label: str, fn):
+    """fn() for the first caller of `key`; concurrent callers with the same key get its value."""
+    return _inflight.do(key, fn, label)[0]
+
+def _cache_bypassed(req: func.HttpRequest) -> bool:
+    # Per-request escape hatch to compare cached vs. uncached latency
+    return (req.headers.get("X-Cache-Bypass") or "").strip().lower() in ("1", "true", "yes")
+
+# HTTP caching. Feed pages are the same for everyone, so a CDN may keep
+# them briefly; per-buyer lists must always be revalidated with the origin.
+_PUBLIC_FEED_CACHE = (f"public, max-age={int(os.getenv('LISTING_HTTP_MAX_AGE_S') or 5)}, "
+                      f"s-maxage={int(os.getenv('LISTING_CDN_MAX_AGE_S') or 30)}")
+_PRIVATE_CACHE = "private, no-cache"
+
+def _etag(*parts) -> str:
+    """Strong ETag from the values that determine a response body."""
+    h = hashlib.blake2b(digest_size=12)
+    for p in parts:
+        h.update(p.hex().encode() if isinstance(p, (bytes, bytearray)) else str(p).encode("utf-8"))
+        h.update(b"\x1f")
+    return f'"{h.hexdigest()}"'
+
+def _etag_matches(req: func.HttpRequest, etag: str) -> bool:
+    # Weak comparison, as If-None-Match calls for
+    raw = req.headers.get("If-None-Match") or ""
+    tags = [t.strip()[2:] if t.strip().startswith("W/") else t.strip() for t in raw.split(",")]
+    return "*" in tags or etag in tags
+
+def _not_modified(etag: str, cache_control: str, headers: dict = None) -> func.HttpResponse:
+    return func.HttpResponse(status_code=304,
+                             headers={**(headers or {}), "ETag": etag, "Cache-Control": cache_control})
 
 def _buyer_id() -> str:
     val = os.getenv("DEV_BUYER_ID")
@@ -27,123 +292,659 @@ def _buyer_id() -> str:
         raise RuntimeError("Missing DEV_BUYER_ID")
     return str(UUID(val))  # validate GUID
 
-def _blob_client() -> BlobServiceClient:
-    conn = os.getenv("BLOB_CONN_STR")
-    if not conn:
-        raise RuntimeError("Missing BLOB_CONN_STR")
-    return BlobServiceClient.from_connection_string(conn)
+# Blob client, SAS signing material and the set of containers known to
+# exist, kept for the life of the worker process
+_blob = None
+_blob_lock = threading.Lock()
+_blob_containers = set()
+
+def _blob_sdk():
+    """
+    azure.storage.blob, imported on first use. It pulls in azure-core and
+    cryptography, which most routes never need, so it stays off the cold
+    start path.
+    """
+    import azure.storage.blob
+    return azure.storage.blob
+
+def _blob_client():
+    """Process-wide BlobServiceClient (azure.storage.blob), created on first use."""
+    global _blob
+    if _blob is None:
+        with _blob_lock:
+            if _blob is None:
+                conn = os.getenv("BLOB_CONN_STR")
+                if not conn:
+                    raise RuntimeError("Missing BLOB_CONN_STR")
+                _blob = _blob_sdk().BlobServiceClient.from_connection_string(conn)
+    return _blob
 
+# BLOB_CONTAINER names the container uploads go to. Set it as an app setting
+# (e.g. "listings"): make_image_variants binds to %BLOB_CONTAINER%, which the
+# host resolves at startup, so the "listings" fallback here does not reach it.
 def _container_name() -> str:
     return os.getenv("BLOB_CONTAINER") or "listings"
 
+def _ensure_container(name: str):
+    """Create the container once per process; later calls are a set lookup."""
+    if name in _blob_containers:
+        return
+    from azure.core.exceptions import ResourceExistsError
+    try:
+        _blob_client().create_container(name)
+    except ResourceExistsError:
+        pass
+    except Exception:
+        # Not remembered, so the next request tries again
+        logging.exception("Could not create blob container %s", name)
+        return
+    _blob_containers.add(name)
+
+_account_info = None
+
 def _storage_account_info():
     """
-    Parse AccountName and AccountKey from connection string for SAS generation.
+    (account_name, account_key, base_url) for SAS generation, parsed once.
+    base_url comes from the client, so a BlobEndpoint such as Azurite's
+    http://127.0.0.1:10000/devstoreaccount1 is honoured.
     """
-    conn = os.getenv("BLOB_CONN_STR") or ""
-    parts = dict(
-        (kv.split("=", 1)[0].strip().lower(), kv.split("=", 1)[1])
-        for kv in conn.split(";")
-        if "=" in kv
-    )
-    account_name = parts.get("accountname")
-    account_key = parts.get("accountkey")
-    if not account_name or not account_key:
-        raise RuntimeError("Could not parse AccountName/AccountKey from BLOB_CONN_STR")
-    return account_name, account_key
+    global _account_info
+    if _account_info is None:
+        conn = os.getenv("BLOB_CONN_STR") or ""
+        parts = dict(
+            (kv.split("=", 1)[0].strip().lower(), kv.split("=", 1)[1])
+            for kv in conn.split(";")
+            if "=" in kv
+        )
+        account_name = parts.get("accountname")
+        account_key = parts.get("accountkey")
+        if not account_name or not account_key:
+            raise RuntimeError("Could not parse AccountName/AccountKey from BLOB_CONN_STR")
+        _account_info = (account_name, account_key, _blob_client().url.rstrip("/"))
+    return _account_info
+
+def _mint_upload_urls(lid: str, files: list, container: str) -> list:
+    """
+    Write-only SAS URLs for a batch of uploads. Signing is a local HMAC, so
+    this makes no network calls; the whole batch shares one timestamp.
+    """
+    account_name, account_key, base_url = _storage_account_info()
+    now = datetime.utcnow()
+    stamp = now.strftime('%Y%m%d%H%M%S')
+    expiry = now + timedelta(minutes=20)
+    blob_sdk = _blob_sdk()
+    permission = blob_sdk.BlobSasPermissions(create=True, write=True)
+    out = []
+    for i, f in enumerate(files):
+        ext = (f.get("ext") or "jpg").lower().strip(".")
+        blob_name = f"{lid}/{stamp}_{i}.{ext}"
+        sas = blob_sdk.generate_blob_sas(
+            account_name=account_name,
+            container_name=container,
+            blob_name=blob_name,
+            account_key=account_key,
+            permission=permission,
+            expiry=expiry,
+        )
+        public_url = f"{base_url}/{container}/{blob_name}"
+        out.append({"blobName": blob_name, "uploadUrl": f"{public_url}?{sas}", "publicUrl": public_url})
+    return out
+
+def _encode_cursor(*values) -> str:
+    """Opaque, URL-safe page token from the sort key of the last row."""
+    raw = json.dumps([str(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def _decode_cursor(token: str, size: int) -> list:
+    """Inverse of _encode_cursor; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+def _page_limit(raw, default: int, maximum: int = 100) -> int:
+    # Clamp and sanitize limit for safe string interpolation in TOP
+    try:
+        limit = int(raw or default)
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
+
+def _id_tvp(ids) -> list:
+    """
+    Table-valued parameter of type dbo.listing_id_list (db/migrations/
+    0014_listing_id_list_type.sql). Ad-hoc batches have no procedure signature to infer the type
+    from, so pyodbc takes its name and schema as the first two items.
+    """
+    return ["listing_id_list", "dbo"] + [(i,) for i in ids]
+
+def _listing_ids(raw, maximum: int = 500) -> list:
+    """Validated, de-duplicated listing ids from a JSON array; raises ValueError."""
+    if raw is None:
+        return []
+    if not isinstance(raw, list) or len(raw) > maximum:
+        raise ValueError(f"expected a list of at most {maximum} listing ids")
+    try:
+        return list(dict.fromkeys(str(UUID(str(x))) for x in raw))
+    except ValueError:
+        raise ValueError("invalid listing id")
 
 # ---------- Health ----------
-@app.route(route="ping", methods=["GET"])
+@_route(route="ping", methods=["GET"])
 def ping(req: func.HttpRequest) -> func.HttpResponse:
     return func.HttpResponse("pong")
 
+# ---------- Warm-up ----------
+def _prewarm_sql_pool() -> int:
+    """Open SQL_POOL_PREWARM (default 1) idle connections ahead of traffic."""
+    started = time.perf_counter()
+    try:
+        opened = _sql_pool().prewarm(int(os.getenv("SQL_POOL_PREWARM") or 1))
+    except Exception:
+        logging.exception("SQL pool prewarm failed")
+        return 0
+    logging.info("Prewarmed %d SQL connections in %.0f ms", opened, (time.perf_counter() - started) * 1000)
+    return opened
+
+# Per-instance warming: Premium/Dedicated plans call this on every new
+# instance, scale-out included, before it gets traffic
+@app.warm_up_trigger("warmup")
+def warmup(warmup) -> None:
+    _prewarm_sql_pool()
+
+# Keep-alive only, not per-instance warming: a timer trigger runs on one
+# instance of the app per tick, so on Consumption (no warm-up trigger)
+# SQL_PREWARM_SCHEDULE (NCRONTAB, e.g. "0 */4 * * * *") keeps that one
+# instance and its pooled connection from idling out, while instances
+# added by scale-out still open their first connection on first request.
+if os.getenv("SQL_PREWARM_SCHEDULE"):
+    @app.timer_trigger(schedule="%SQL_PREWARM_SCHEDULE%", arg_name="timer")
+    def sql_keep_alive(timer: func.TimerRequest) -> None:
+        _prewarm_sql_pool()
+
+@_route(route="diagnostics/sql-pool", methods=["GET"])
+def sql_pool_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Returns: { name, max_size, in_use, idle, created, waits, wait_*_ms, ...,
+               read_replica: { same fields, replica_down_s } | null }
+    """
+    try:
+        stats = _sql_pool().stats()
+        replica = _sql_read_pool()
+        stats["read_replica"] = None if replica is None else {
+            **replica.stats(), "replica_down_s": round(max(0.0, _read_down_until - time.monotonic()), 1)}
+        return func.HttpResponse(json.dumps(stats), mimetype="application/json")
+    except Exception as e:
+        logging.exception(e)
+        return func.HttpResponse(f"Error: {e}", status_code=500)
+
+@_route(route="diagnostics/listing-cache", methods=["GET"])
+def listing_cache_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Returns: { entries, hits, misses, hit_ratio, evictions, expirations, invalidations, ... }
+    """
+    return func.HttpResponse(json.dumps(_listing_cache.stats()), mimetype="application/json")
+
+@_route(route="diagnostics/single-flight", methods=["GET"])
+def single_flight_stats(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Returns: { in_flight, leaders, merged, wait_timeouts,
+               keys: { label: { leaders, merged, wait_timeouts } } }
+    `merged` counts callers served by another caller's query.
+    """
+    return func.HttpResponse(json.dumps(_inflight.stats()), mimetype="application/json")
+
+@_route(route="metrics", methods=["GET"])
+def metrics_endpoint(req: func.HttpRequest) -> func.HttpResponse:
+    """Prometheus text exposition: route/phase/SQL histograms, pool and cache gauges."""
+    return func.HttpResponse(metrics.REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+def _runtime_samples() -> list:
+    out = []
+    # Primary and replica samples of one metric stay adjacent in the exposition
+    pools = [p.stats() for p in (_pool, _read_pool) if p is not None]
+    for key in ("in_use", "idle", "opening", "max_size"):
+        for pool in pools:
+            out.append((f"sql_pool_{key}", "gauge", f"SQL pool {key.replace('_', ' ')}",
+                        {"pool": pool["name"]}, pool[key]))
+    for key in ("checkouts", "waits", "wait_timeouts", "created", "closed", "discarded_broken"):
+        for pool in pools:
+            out.append((f"sql_pool_{key}_total", "counter", f"SQL pool {key.replace('_', ' ')}",
+                        {"pool": pool["name"]}, pool[key]))
+    cache = _listing_cache.stats()
+    out.append(("listing_cache_entries", "gauge", "Listing feed cache entries", {}, cache["entries"]))
+    for key in ("hits", "misses", "evictions", "expirations", "invalidations", "stale_puts"):
+        out.append((f"listing_cache_{key}_total", "counter", f"Listing feed cache {key.replace('_', ' ')}",
+                    {}, cache[key]))
+    flights = _inflight.stats()["keys"]
+    for key in ("leaders", "merged", "wait_timeouts"):
+        for label, counts in flights.items():
+            out.append((f"single_flight_{key}_total", "counter",
+                        f"Coalesced reads: {key.replace('_', ' ')}", {"key": label}, counts[key]))
+    return out
+
+metrics.REGISTRY.add_collector(_runtime_samples)
+
 # ---------- Listings ----------
-@app.route(route="listings", methods=["GET"])
+@_route(route="listings", methods=["GET"])
 def get_listings(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Query: category?, q? (keywords in title/description), limit? (1-100, default 12),
+           cursor?, images? (cover|all), lat?, lng?, radiusKm?,
+           sort? (recent|distance|relevance; relevance is the default with q,
+                  distance needs lat/lng/radiusKm),
+           imageWidth? (px the card image is shown at, default 320), imageFormat? (webp|jpeg),
+           withState? (1 adds is_favorite / in_basket for the current buyer)
+    Returns: [listing] -- or { items, next_cursor } when `cursor` is passed
+    (send an empty `cursor=` for the first page). The next page token is
+    also sent in the X-Next-Cursor header.
+
+    Pages are served from an in-process cache (X-Cache: HIT|MISS); send
+    `X-Cache-Bypass: 1` to go straight to SQL. The cache holds buyer-neutral
+    pages; withState flags are looked up per request, for the whole page at once.
+
+    Responses carry an ETag; a matching If-None-Match on a cached page gets
+    304 without touching SQL. Plain pages are publicly cacheable for
+    LISTING_HTTP_MAX_AGE_S (default 5) / LISTING_CDN_MAX_AGE_S (default 30,
+    shared caches); withState pages are private.
+    """
     logging.info("GET /api/listings")
     try:
         category = (req.params.get("category") or "").strip().lower()
-        # Clamp and sanitize limit for safe string interpolation in TOP
+        limit = _page_limit(req.params.get("limit"), 12)
+        token = req.params.get("cursor") or ""
+        images = "all" if (req.params.get("images") or "").strip().lower() == "all" else "cover"
+        text = _fulltext_condition(req.params.get("q"))
         try:
-            limit = int(req.params.get("limit") or 12)
-        except ValueError:
-            limit = 12
-        limit = max(1, min(limit, 100))
+            geo = _geo_query(req.params)
+            sort = _listing_sort(req.params.get("sort"), text, geo)
+            cursor = _listing_cursor(token, sort)
+            variant = _image_variant_query(req.params)
+        except ValueError as e:
+            return func.HttpResponse(str(e), status_code=400)
+        q = {"category": category}
+        if geo:
+            q.update(lat=geo[0], lng=geo[1], radiusKm=geo[2])
 
-        with _conn() as conn:
-            cur = conn.cursor()
+        bypass = _cache_bypassed(req)
+        key = (category, text, limit, token, images, geo, sort, variant)
+        cached = None if bypass else _listing_cache.get(key)
+        cache_status = "BYPASS" if bypass else ("HIT" if cached is not None else "MISS")
+        if cached is None:
+            def build():
+                generation = _listing_cache.generation
+                where_sql, params = _build_listing_filter(q)
+                data, next_cursor = _read(
+                    lambda conn: _listing_page(conn.cursor(), where_sql, params, limit, cursor, images, geo, sort,
+                                               text, variant),
+                    scope="listings")
+                items_json = _dumps(data)
+                # The page's tag is computed once, when it is built, and cached with it
+                page = (items_json, next_cursor, _etag(items_json, next_cursor))
+                if not bypass:
+                    _listing_cache.put(key, page, generation)
+                return page
 
-            base_sql = f"""
-                SELECT TOP ({limit})
-                       l.listing_id,
-                       l.title,
-                       l.price_cents,
-                       l.city,
-                       CASE WHEN l.price_cents IS NULL OR l.price_cents = 0 THEN 1 ELSE 0 END AS is_free,
-                       (
-                         SELECT TOP 1 li.blob_url
-                         FROM dbo.listing_image li
-                         WHERE li.listing_id = l.listing_id
-                         ORDER BY li.sort_order, li.blob_url
-                       ) AS image_url
-                FROM dbo.listing l
-                WHERE l.is_active = 1
-            """
-            params = []
-
-            if category:
-                base_sql += " AND LOWER(l.category) = ?"
-                params.append(category)
-
-            base_sql += " ORDER BY l.created_at DESC"
-
-            cur.execute(base_sql, params)
-            rows = cur.fetchall()
-            data = [{
-                "listing_id": str(r[0]),
-                "title": r[1],
-                "price_cents": r[2],
-                "city": r[3],
-                "is_free": int(r[4]),
-                "image_url": r[5],
-            } for r in rows]
+            # Bypass measures SQL, so it is never merged into another caller's query
+            label = "listings:" + (category if category in LISTING_CATEGORIES else "other")
+            cached = build() if bypass else _coalesced(("listings",) + key, label, build)
+        items_json, next_cursor, page_tag = cached
+
+        paged = "cursor" in req.params
+        with_state = (req.params.get("withState") or "").strip().lower() in ("1", "true")
+        headers = {"X-Cache": cache_status}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        cache_control = _PRIVATE_CACHE if with_state else _PUBLIC_FEED_CACHE
+        etag = _etag(page_tag, paged)
+        if with_state and items_json != "[]":
+            data = json.loads(items_json)
+            state = _read(lambda conn: _listing_state(conn.cursor(), _buyer_id(), [d["listing_id"] for d in data]),
+                          scope=_buyer_id())
+            for d in data:
+                d["is_favorite"], d["in_basket"] = state.get(d["listing_id"].lower(), (0, 0))
+            items_json = _dumps(data)
+            etag = _etag(page_tag, paged, items_json)
+        if _etag_matches(req, etag):
+            return _not_modified(etag, cache_control, headers)
+
+        if paged:
+            body = '{"items": ' + items_json + ', "next_cursor": ' + json.dumps(next_cursor) + "}"
+        else:
+            body = items_json
+        headers.update({"ETag": etag, "Cache-Control": cache_control})
+        return func.HttpResponse(body, mimetype="application/json", headers=headers)
+    except Exception as e:
+        logging.exception(e)
+        return func.HttpResponse(f"Error: {e}", status_code=500)
+
+FACET_FIELDS = ("category", "size", "condition", "city")
+_FACET_LIMIT = 100
+
+def _facet_groups(bypass: bool) -> list:
+    """
+    [(category, size, condition, city, count)] over active listings: one
+    GROUP BY over the IX_listing_active_created filtered index (it carries
+    all four columns), cached with the feed pages so every filter
+    combination is counted from the same rows until the next listing write.
+    """
+    key = ("facet-groups",)
+    groups = None if bypass else _listing_cache.get(key)
+    if groups is not None:
+        return groups
 
-            return func.HttpResponse(json.dumps(data), mimetype="application/json")
+    def query(c):
+        cur = c.cursor()
+        cur.execute("""
+          SELECT category, size, [condition], city, COUNT_BIG(*)
+          FROM dbo.listing
+          WHERE is_active = 1
+          GROUP BY category, size, [condition], city
+        """)
+        return [tuple(r) for r in cur.fetchall()]
+
+    def load():
+        generation = _listing_cache.generation
+        rows = _read(query, scope="listings")
+        if not bypass:
+            _listing_cache.put(key, rows, generation)
+        return rows
+    return load() if bypass else _coalesced(key, "facets", load)
+
+@_route(route="listings/facets", methods=["GET"])
+def get_listing_facets(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Query: category?, size?, condition?, city? (the current filter)
+    Returns: { total, category: [{ value, count }], size: [...], condition: [...], city: [...] }
+    Counts of active listings. Each facet is counted under the other
+    facets' filters (so picking a category still shows its sibling
+    categories), largest first, at most 100 values per facet.
+
+    Counted from _facet_groups(), and cached alongside feed pages. There is
+    no maintained summary: an indexed view or counter table would make
+    every create, import and checkout in a category lock the same row.
+    """
+    filters = {f: (req.params.get(f) or "").strip() for f in FACET_FIELDS}
+    filters["category"] = filters["category"].lower()
+    try:
+        key = ("facets",) + tuple(filters[f] for f in FACET_FIELDS)
+        cached = None if _cache_bypassed(req) else _listing_cache.get(key)
+
+        def build():
+            generation = _listing_cache.generation
+            wanted = {f: v.casefold() for f, v in filters.items() if v}
+            total, counts = 0, {f: {} for f in FACET_FIELDS}
+            for row in _facet_groups(_cache_bypassed(req)):
+                values, n = dict(zip(FACET_FIELDS, row[:4])), int(row[4])
+                # Filters compare like the column collation: case-insensitively
+                missed = [f for f, v in wanted.items() if (values[f] or "").casefold() != v]
+                if not missed:
+                    total += n
+                for f in FACET_FIELDS:
+                    if values[f] is not None and (not missed or missed == [f]):
+                        counts[f][values[f]] = counts[f].get(values[f], 0) + n
+            data = {"total": total}
+            for f in FACET_FIELDS:
+                ranked = sorted(counts[f].items(), key=lambda x: (-x[1], x[0]))[:_FACET_LIMIT]
+                data[f] = [{"value": v, "count": n} for v, n in ranked]
+            body = _dumps(data)
+            page = (body, _etag(body))
+            if not _cache_bypassed(req):
+                _listing_cache.put(key, page, generation)
+            return page
+
+        if cached is None:
+            cached = build() if _cache_bypassed(req) else _coalesced(key, "facets", build)
+        body, etag = cached
+        if _etag_matches(req, etag):
+            return _not_modified(etag, _PUBLIC_FEED_CACHE)
+        return func.HttpResponse(body, mimetype="application/json",
+                                 headers={"ETag": etag, "Cache-Control": _PUBLIC_FEED_CACHE})
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="listings", methods=["POST"])
+LISTING_CATEGORIES = ("clothing", "furniture", "hygiene", "feeding", "mobility", "safety", "toys", "health")
+_LISTING_FIELDS = ("title", "description", "category", "size", "condition", "price_cents", "city", "country")
+
+def _listing_fields(body: dict) -> tuple:
+    """
+    (data, point) for a new listing from a create/import payload: title and
+    category required, category from LISTING_CATEGORIES, optional integer
+    price_cents and latitude/longitude. Empty strings count as missing.
+    Raises ValueError with a message fit for the client.
+    """
+    data = {k: (None if body.get(k) in ("", None) else body.get(k)) for k in _LISTING_FIELDS}
+    if not data["title"] or not data["category"]:
+        raise ValueError("title and category are required")
+    data["category"] = str(data["category"]).strip().lower()
+    if data["category"] not in LISTING_CATEGORIES:
+        raise ValueError(f"category must be one of {', '.join(LISTING_CATEGORIES)}")
+    if data["price_cents"] is not None:
+        try:
+            data["price_cents"] = int(data["price_cents"])
+        except (TypeError, ValueError):
+            raise ValueError("price_cents must be an integer")
+        if data["price_cents"] < 0:
+            raise ValueError("price_cents can't be negative")
+    point = _geo_query({"lat": body.get("latitude"), "lng": body.get("longitude")})
+    data["latitude"], data["longitude"] = point[:2] if point else (None, None)
+    return data, point
+
+@_route(route="listings", methods=["POST"])
 def create_listing(req: func.HttpRequest) -> func.HttpResponse:
     """
-    Body: { title, description?, category, size?, condition?, price_cents?, city?, country? }
+    Body: { title, description?, category, size?, condition?, price_cents?, city?, country?,
+            latitude?, longitude? }
     Returns: { listing_id }
     """
     try:
         body = req.get_json()
-        fields = ["title","description","category","size","condition","price_cents","city","country"]
-        data = {k: body.get(k) for k in fields}
-        if not data["title"] or not data["category"]:
-            return func.HttpResponse("title and category are required", status_code=400)
+        try:
+            data, point = _listing_fields(body)
+        except ValueError as e:
+            return func.HttpResponse(str(e), status_code=400)
 
-        with _conn() as c:
+        with _conn(scope="listings") as c:
             cur = c.cursor()
-            cur.execute("""
+            _sync_alert_index(cur)  # load/refresh before taking row locks
+            geo_sql = "geography::Point(?, ?, 4326)" if point else "NULL"
+            cur.execute(f"""
               INSERT INTO dbo.listing (seller_id, title, description, category, size, [condition],
-                                       price_cents, city, country, is_active)
+                                       price_cents, city, country, latitude, longitude, geo_point, is_active)
               OUTPUT inserted.listing_id
-              VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+              VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {geo_sql}, 1)
             """, data["title"], data.get("description"), data["category"], data.get("size"),
-                 data.get("condition"), data.get("price_cents"), data.get("city"), data.get("country"))
+                 data.get("condition"), data.get("price_cents"), data.get("city"), data.get("country"),
+                 data["latitude"], data["longitude"], *(point[:2] if point else ()))
             listing_id = str(cur.fetchone()[0])
+            _record_matches(cur, [(listing_id, data)])
             c.commit()
+        _listing_cache.invalidate()
 
         return func.HttpResponse(json.dumps({"listing_id": listing_id}), mimetype="application/json", status_code=201)
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="listings/{listingId}/upload-urls", methods=["POST"])
+# ---------- Bulk import ----------
+_IMPORT_INSERT_SQL = """
+  INSERT INTO dbo.listing (listing_id, seller_id, title, description, category, size, [condition],
+                           price_cents, city, country, latitude, longitude, geo_point, is_active)
+  VALUES (?, NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {geo_sql}, 1)
+"""
+_IMPORT_MAX_ERRORS = 1000
+
+def _import_container() -> str:
+    return os.getenv("BLOB_IMPORT_CONTAINER") or "listing-imports"
+
+def _import_params(listing_id: str, data: dict) -> tuple:
+    return (listing_id, data["title"], data["description"], data["category"], data["size"],
+            data["condition"], data["price_cents"], data["city"], data["country"],
+            data["latitude"], data["longitude"])
+
+def _insert_listings(rows: list) -> list:
+    """
+    Insert (line, listing_id, data, point) rows and match them against saved
+    searches in one transaction. If the chunk fails as a whole, retry row by
+    row so one bad row doesn't sink the others.
+    Returns [(line, error)] for the rows that could not be written.
+    """
+    def write(cur, batch):
+        cur.fast_executemany = True
+        # Uniform statements for executemany: rows with and without a location apart
+        located = [_import_params(lid, d) + tuple(p[:2]) for _, lid, d, p in batch if p]
+        plain = [_import_params(lid, d) for _, lid, d, p in batch if not p]
+        if located:
+            cur.executemany(_IMPORT_INSERT_SQL.format(geo_sql="geography::Point(?, ?, 4326)"), located)
+        if plain:
+            cur.executemany(_IMPORT_INSERT_SQL.format(geo_sql="NULL"), plain)
+        _record_matches(cur, [(lid, d) for _, lid, d, _ in batch])
+
+    try:
+        with _conn(scope="listings") as c:
+            cur = c.cursor()
+            _sync_alert_index(cur)  # load/refresh before taking row locks
+            write(cur, rows)
+        return []
+    except pyodbc.Error as e:
+        if len(rows) == 1:
+            return [(rows[0][0], f"rejected by the database: {e.args[-1] if e.args else e}")]
+        logging.warning("listing import: chunk of %d failed, retrying row by row", len(rows))
+    errors = []
+    for row in rows:
+        errors.extend(_insert_listings([row]))
+    return errors
+
+@_route(route="listings/import", methods=["POST"])
+def import_listings(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Bulk-create listings from CSV (header row; columns as create_listing's
+    body) or NDJSON (one create_listing body per line).
+    Query: format? (csv|ndjson; defaults from Content-Type),
+           blobName? (a file uploaded via listings/import/upload-url; read
+           from Blob in chunks instead of the request body)
+    Rows are validated like POST /listings and written in committed chunks
+    of LISTING_IMPORT_CHUNK (default 500); a bad row is reported, not fatal.
+    Returns: { rows, inserted, failed, errors: [{ line, error }], errors_truncated }
+
+    The Functions host buffers request bodies, so only the blobName form
+    keeps memory flat for large files; a direct body is parsed the same way.
+    """
+    fmt = (req.params.get("format") or "").strip().lower()
+    if not fmt:
+        ctype = (req.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        fmt = listing_import.CONTENT_TYPES.get(ctype, "")
+    if fmt not in listing_import.FORMATS:
+        return func.HttpResponse("format must be csv or ndjson", status_code=400)
+    chunk_size = max(1, int(os.getenv("LISTING_IMPORT_CHUNK") or 500))
+    try:
+        blob_name = req.params.get("blobName")
+        if blob_name:
+            from azure.core.exceptions import ResourceNotFoundError
+            try:
+                source = _blob_client().get_blob_client(_import_container(), blob_name).download_blob()
+            except ResourceNotFoundError:
+                return func.HttpResponse("Import file not found", status_code=404)
+            chunks = source.chunks()
+        else:
+            chunks = [req.get_body()]
+
+        total = inserted = failed = 0
+        errors = []
+
+        def fail(line, error):
+            nonlocal failed
+            failed += 1
+            if len(errors) < _IMPORT_MAX_ERRORS:
+                errors.append({"line": line, "error": error})
+
+        def flush(batch):
+            nonlocal inserted
+            bad = _insert_listings(batch)
+            for line, error in bad:
+                fail(line, error)
+            inserted += len(batch) - len(bad)
+            _listing_cache.invalidate()
+
+        batch = []
+        for line, record, error in listing_import.records(chunks, fmt):
+            total += 1
+            if error:
+                fail(line, error)
+                continue
+            try:
+                data, point = _listing_fields(record)
+            except ValueError as e:
+                fail(line, str(e))
+                continue
+            batch.append((line, str(uuid4()), data, point))
+            if len(batch) >= chunk_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        body = {"rows": total, "inserted": inserted, "failed": failed,
+                "errors": errors, "errors_truncated": failed > len(errors)}
+        return func.HttpResponse(_dumps(body), mimetype="application/json")
+    except Exception as e:
+        logging.exception(e)
+        return func.HttpResponse(f"Error: {e}", status_code=500)
+
+@_route(route="listings/import/upload-url", methods=["POST"])
+def get_import_upload_url(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Body: { format: 'csv'|'ndjson' }
+    Returns: { blobName, uploadUrl } -- PUT the file there, then call
+    POST /listings/import?blobName=...
+    """
+    try:
+        body = req.get_json() if req.get_body() else {}
+        fmt = (body.get("format") or "csv").strip().lower()
+        if fmt not in listing_import.FORMATS:
+            return func.HttpResponse("format must be csv or ndjson", status_code=400)
+        container = _import_container()
+        _ensure_container(container)
+        target = _mint_upload_urls(uuid4().hex, [{"ext": fmt}], container)[0]
+        return func.HttpResponse(_dumps({"blobName": target["blobName"], "uploadUrl": target["uploadUrl"]}),
+                                 mimetype="application/json")
+    except Exception as e:
+        logging.exception(e)
+        return func.HttpResponse(f"Error: {e}", status_code=500)
+
+def _listing_exists(lid: str) -> bool:
+    with _conn() as c:
+        cur = c.cursor()
+        cur.execute("SELECT 1 FROM dbo.listing WHERE listing_id = ?", lid)
+        return cur.fetchone() is not None
+
+async def _get_upload_urls_aio(req: func.HttpRequest) -> func.HttpResponse:
+    # ASYNC_HANDLERS variant: the listing check and the container check
+    # don't depend on each other, so they run together
+    lid = req.route_params["listingId"]
+    try:
+        body = req.get_json() if req.get_body() else {}
+        files = body.get("files") or []
+        if not files:
+            return func.HttpResponse("files required", status_code=400)
+
+        container = _container_name()
+        exists, _ = await asyncio.gather(_io(_listing_exists, lid), _io(_ensure_container, container))
+        if not exists:
+            return func.HttpResponse("Listing not found", status_code=404)
+        out = await _io(_mint_upload_urls, lid, files, container)
+
+        return func.HttpResponse(_dumps(out), mimetype="application/json")
+    except Exception as e:
+        logging.exception(e)
+        return func.HttpResponse(f"Error: {e}", status_code=500)
+
+@_route(route="listings/{listingId}/upload-urls", methods=["POST"], aio=_get_upload_urls_aio)
 def get_upload_urls(req: func.HttpRequest) -> func.HttpResponse:
     """
     Body: { files: [{ext:'jpg'|'png'|'webp'}] }
@@ -157,44 +958,19 @@ def get_upload_urls(req: func.HttpRequest) -> func.HttpResponse:
             return func.HttpResponse("files required", status_code=400)
 
         # ensure listing exists
-        with _conn() as c:
-            cur = c.cursor()
-            cur.execute("SELECT 1 FROM dbo.listing WHERE listing_id = ?", lid)
-            if not cur.fetchone():
-                return func.HttpResponse("Listing not found", status_code=404)
+        if not _listing_exists(lid):
+            return func.HttpResponse("Listing not found", status_code=404)
 
-        # ensure container exists (idempotent)
-        bsc = _blob_client()
         container = _container_name()
-        try:
-            bsc.create_container(container)
-        except Exception:
-            pass  # already exists
-
-        account_name, account_key = _storage_account_info()
-        base_url = f"https://{account_name}.blob.core.windows.net"
-        out = []
-        for i, f in enumerate(files):
-            ext = (f.get("ext") or "jpg").lower().strip(".")
-            blob_name = f"{lid}/{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{i}.{ext}"
-            sas = generate_blob_sas(
-                account_name=account_name,
-                container_name=container,
-                blob_name=blob_name,
-                account_key=account_key,
-                permission=BlobSasPermissions(create=True, write=True),
-                expiry=datetime.utcnow() + timedelta(minutes=20),
-            )
-            upload_url = f"{base_url}/{container}/{blob_name}?{sas}"
-            public_url = f"{base_url}/{container}/{blob_name}"
-            out.append({"blobName": blob_name, "uploadUrl": upload_url, "publicUrl": public_url})
+        _ensure_container(container)
+        out = _mint_upload_urls(lid, files, container)
 
-        return func.HttpResponse(json.dumps(out), mimetype="application/json")
+        return func.HttpResponse(_dumps(out), mimetype="application/json")
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="listings/{listingId}/images", methods=["POST"])
+@_route(route="listings/{listingId}/images", methods=["POST"])
 def commit_images(req: func.HttpRequest) -> func.HttpResponse:
     """
     Body: { images: [{ blobName, publicUrl, sort_order? }] }
@@ -206,31 +982,150 @@ def commit_images(req: func.HttpRequest) -> func.HttpResponse:
         if not images:
             return func.HttpResponse("images required", status_code=400)
 
-        with _conn() as c:
+        with _conn(scope="listings") as c:
             cur = c.cursor()
             cur.execute("SELECT 1 FROM dbo.listing WHERE listing_id = ?", lid)
             if not cur.fetchone():
                 return func.HttpResponse("Listing not found", status_code=404)
 
-            for img in images:
-                cur.execute("""
-                  INSERT INTO dbo.listing_image (listing_id, blob_url, sort_order)
-                  VALUES (?, ?, ?)
-                """, lid, img.get("publicUrl"), int(img.get("sort_order") or 0))
+            cur.fast_executemany = True
+            cur.executemany("""
+              INSERT INTO dbo.listing_image (listing_id, blob_url, blob_name, sort_order)
+              VALUES (?, ?, ?, ?)
+            """, [(lid, img.get("publicUrl"), img.get("blobName"), int(img.get("sort_order") or 0))
+                  for img in images])
+
+            # Keep the denormalized cover in step with the gallery
+            cur.execute("""
+              UPDATE l
+                 SET cover_image_url = ci.blob_url,
+                     cover_blob_name = ci.blob_name
+              FROM dbo.listing l
+              OUTER APPLY (
+                SELECT TOP 1 li.blob_url, li.blob_name
+                FROM dbo.listing_image li
+                WHERE li.listing_id = l.listing_id
+                ORDER BY li.sort_order, li.blob_url
+              ) ci
+              WHERE l.listing_id = ?
+            """, lid)
             c.commit()
+        _listing_cache.invalidate()
 
         return func.HttpResponse(status_code=204)
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
+# ---------- Image variants ----------
+_variant_executor = None
+_variant_lock = threading.Lock()
+
+def _variant_container() -> str:
+    return os.getenv("BLOB_VARIANT_CONTAINER") or "listing-variants"
+
+def _variant_pool() -> ThreadPoolExecutor:
+    global _variant_executor
+    if _variant_executor is None:
+        with _variant_lock:
+            if _variant_executor is None:
+                _variant_executor = ThreadPoolExecutor(
+                    max_workers=int(os.getenv("IMAGE_VARIANT_WORKERS", "4")),
+                    thread_name_prefix="image-variant",
+                )
+    return _variant_executor
+
+def _store_variants(blob_name: str, data: bytes) -> list:
+    """
+    Render every variant of an uploaded photo and upload them to the
+    variants container, in parallel. Names are deterministic and uploads
+    overwrite, so running this twice for the same blob is harmless.
+    Returns [(width, height, fmt, url, bytes)].
+    """
+    container = _variant_container()
+    _ensure_container(container)
+    _, _, base_url = _storage_account_info()
+    rendered = image_variants.render_variants(data, _variant_pool())
+    blob_sdk = _blob_sdk()
+
+    def upload(v):
+        width, height, fmt, body = v
+        name = image_variants.variant_name(blob_name, width, fmt)
+        _blob_client().get_blob_client(container, name).upload_blob(
+            body, overwrite=True,
+            content_settings=blob_sdk.ContentSettings(
+                content_type=image_variants.CONTENT_TYPES[fmt],
+                # Variant names never get new content, so they can be cached forever
+                cache_control="public, max-age=31536000, immutable",
+            ),
+        )
+        return width, height, fmt, f"{base_url}/{container}/{name}", len(body)
+
+    return list(_variant_pool().map(upload, rendered))
+
+def _record_variants(cur, blob_name: str, variants: list):
+    """Upsert variant rows for one source blob in a single statement."""
+    cur.execute("""
+      MERGE dbo.listing_image_variant WITH (HOLDLOCK) AS t
+      USING (
+        SELECT ? AS blob_name, j.width, j.height, j.format, j.blob_url, j.bytes
+        FROM OPENJSON(?) WITH (
+          width INT '$[0]', height INT '$[1]', format VARCHAR(8) '$[2]',
+          blob_url NVARCHAR(500) '$[3]', bytes INT '$[4]'
+        ) j
+      ) AS s
+      ON t.blob_name = s.blob_name AND t.format = s.format AND t.width = s.width
+      WHEN MATCHED THEN
+        UPDATE SET height = s.height, blob_url = s.blob_url, bytes = s.bytes
+      WHEN NOT MATCHED THEN
+        INSERT (blob_name, width, height, format, blob_url, bytes)
+        VALUES (s.blob_name, s.width, s.height, s.format, s.blob_url, s.bytes);
+    """, blob_name, json.dumps([list(v) for v in variants]))
+
+def _process_image(blob_name: str, data: bytes) -> list:
+    variants = _store_variants(blob_name, data)
+    with _conn(scope="listings") as c:
+        _record_variants(c.cursor(), blob_name, variants)
+    _listing_cache.invalidate()
+    return variants
+
+# Fires for every upload to the BLOB_CONTAINER app setting's container, the
+# one _mint_upload_urls signs for; variants go to a separate container so they
+# never re-trigger it. Each uploaded blob is its own invocation, so a batch is
+# processed in parallel.
+@app.blob_trigger(arg_name="blob", path="%BLOB_CONTAINER%/{name}", connection="BLOB_CONN_STR")
+def make_image_variants(blob: func.InputStream):
+    blob_name = blob.name.split("/", 1)[1] if "/" in blob.name else blob.name
+    started = time.perf_counter()
+    try:
+        variants = _process_image(blob_name, blob.read())
+    except image_variants.unusable_errors() as e:
+        # Not an image we can use; retrying will not change that
+        logging.warning("Skipping variants for %s: %s", blob_name, e)
+        return
+    logging.info("Wrote %d variants for %s in %.0f ms", len(variants), blob_name,
+                 (time.perf_counter() - started) * 1000)
+
 # ---------- Basket ----------
-@app.route(route="basket", methods=["GET"])
+@_route(route="basket", methods=["GET"])
 def get_basket(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Returns: [{ listing_id, title, price_cents, city }], with an ETag;
+    If-None-Match gets 304 after one small version lookup.
+    """
     logging.info("GET /api/basket")
     try:
-        with _conn() as conn:
+        def query(conn):
             cur = conn.cursor()
+            cur.execute("""
+                SELECT COUNT(*), MAX(bi.row_version), MAX(l.row_version)
+                FROM dbo.basket_item bi
+                JOIN dbo.listing l ON l.listing_id = bi.listing_id
+                WHERE bi.user_id = ?
+            """, _buyer_id())
+            etag = _etag("basket", *cur.fetchone())
+            if _etag_matches(req, etag):
+                return _not_modified(etag, _PRIVATE_CACHE)
             cur.execute("""
                 SELECT bi.listing_id, l.title, l.price_cents, l.city
                 FROM dbo.basket_item bi
@@ -242,17 +1137,20 @@ def get_basket(req: func.HttpRequest) -> func.HttpResponse:
                 {"listing_id": str(r[0]), "title": r[1], "price_cents": r[2], "city": r[3]}
                 for r in rows
             ]
-            return func.HttpResponse(json.dumps(data), mimetype="application/json")
+            return func.HttpResponse(_dumps(data), mimetype="application/json",
+                                     headers={"ETag": etag, "Cache-Control": _PRIVATE_CACHE})
+
+        return _read(query, scope=_buyer_id())
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="basket/{listingId}", methods=["POST"])
+@_route(route="basket/{listingId}", methods=["POST"])
 def add_to_basket(req: func.HttpRequest) -> func.HttpResponse:
     listing_id = req.route_params.get("listingId")
     logging.info("POST /api/basket/%s", listing_id)
     try:
-        with _conn() as conn:
+        with _conn(scope=_buyer_id()) as conn:
             cur = conn.cursor()
             # Only active items can be added
             cur.execute("SELECT 1 FROM dbo.listing WHERE listing_id = ? AND is_active = 1", listing_id)
@@ -274,12 +1172,12 @@ def add_to_basket(req: func.HttpRequest) -> func.HttpResponse:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="basket/{listingId}", methods=["DELETE"])
+@_route(route="basket/{listingId}", methods=["DELETE"])
 def remove_from_basket(req: func.HttpRequest) -> func.HttpResponse:
     listing_id = req.route_params.get("listingId")
     logging.info("DELETE /api/basket/%s", listing_id)
     try:
-        with _conn() as conn:
+        with _conn(scope=_buyer_id()) as conn:
             cur = conn.cursor()
             cur.execute(
                 "DELETE FROM dbo.basket_item WHERE user_id = ? AND listing_id = ?",
@@ -291,84 +1189,370 @@ def remove_from_basket(req: func.HttpRequest) -> func.HttpResponse:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-# ---------- Orders ----------
-@app.route(route="orders/confirm", methods=["POST"])
-def confirm_order(req: func.HttpRequest) -> func.HttpResponse:
-    logging.info("POST /api/orders/confirm")
-    buyer = _buyer_id()
+# Bulk add/remove for a buyer's basket or favorites: both lists travel as
+# TVPs and everything runs as one batch in the request's transaction.
+# Adds for listings that don't exist (or, for the basket, are no longer
+# active) are skipped and reported back.
+_USER_LIST_BATCH_SQL = """
+SET XACT_ABORT ON;
+DECLARE @user UNIQUEIDENTIFIER = ?;
+DECLARE @add dbo.listing_id_list, @remove dbo.listing_id_list;
+DECLARE @added INT, @removed INT;
+{fill}
+DELETE t FROM dbo.{table} t JOIN @remove r ON r.listing_id = t.listing_id WHERE t.user_id = @user;
+SET @removed = @@ROWCOUNT;
+
+INSERT INTO dbo.{table} (user_id, listing_id)
+SELECT @user, a.listing_id
+FROM @add a
+JOIN dbo.listing l ON l.listing_id = a.listing_id {active}
+WHERE NOT EXISTS (SELECT 1 FROM dbo.{table} t WITH (UPDLOCK, HOLDLOCK)
+                  WHERE t.user_id = @user AND t.listing_id = a.listing_id);
+SET @added = @@ROWCOUNT;
+SET XACT_ABORT OFF;
+
+SELECT @added, @removed;
+SELECT a.listing_id FROM @add a
+WHERE NOT EXISTS (SELECT 1 FROM dbo.listing l WHERE l.listing_id = a.listing_id {active});
+"""
+
+def _user_list_batch(req: func.HttpRequest, table: str, active_only: bool) -> func.HttpResponse:
     try:
-        with _conn() as conn:
-            cur = conn.cursor()
+        body = req.get_json() if req.get_body() else {}
+        try:
+            add, remove = _listing_ids(body.get("add")), _listing_ids(body.get("remove"))
+        except ValueError as e:
+            return func.HttpResponse(str(e), status_code=400)
+        if set(add) & set(remove):
+            return func.HttpResponse("a listing can't be in both add and remove", status_code=400)
+        if not add and not remove:
+            return func.HttpResponse("add or remove required", status_code=400)
 
-            # Gather basket items still active
-            cur.execute("""
-                SELECT l.listing_id, l.price_cents
-                FROM dbo.basket_item bi
-                JOIN dbo.listing l ON l.listing_id = bi.listing_id
-                WHERE bi.user_id = ? AND l.is_active = 1
-            """, buyer)
-            items = cur.fetchall()
-            if not items:
-                return func.HttpResponse("Basket empty or items unavailable", status_code=409)
+        # An empty TVP is still a parameter to send, so only fill the lists that have rows
+        fill, params = [], [_buyer_id()]
+        if add:
+            fill.append("INSERT INTO @add (listing_id) SELECT listing_id FROM ?;")
+            params.append(_id_tvp(add))
+        if remove:
+            fill.append("INSERT INTO @remove (listing_id) SELECT listing_id FROM ?;")
+            params.append(_id_tvp(remove))
+        sql = _USER_LIST_BATCH_SQL.format(fill="\n".join(fill), table=table,
+                                          active="AND l.is_active = 1" if active_only else "")
+        with _conn(scope=_buyer_id()) as c:
+            cur = c.cursor()
+            cur.execute(sql, params)
+            counts, unavailable = _result_sets(cur)
+            c.commit()
+        added, removed = counts[0]
+        return func.HttpResponse(
+            _dumps({"added": added, "removed": removed, "unavailable": [str(r[0]) for r in unavailable]}),
+            mimetype="application/json",
+        )
+    except Exception as e:
+        logging.exception(e)
+        return func.HttpResponse(f"Error: {e}", status_code=500)
 
-            total = sum((r[1] or 0) for r in items)
+@_route(route="basket:batch", methods=["POST"])
+def basket_batch(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Body: { add?: [listing_id], remove?: [listing_id] } (up to 500 each)
+    Returns: { added, removed, unavailable: [listing_id] }
+    `unavailable` lists adds that were skipped because the listing is gone or sold.
+    """
+    logging.info("POST /api/basket:batch")
+    return _user_list_batch(req, "basket_item", active_only=True)
 
-            # Begin transaction
-            cur.execute("BEGIN TRAN")
+# ---------- Orders ----------
+# Whole checkout as one batch: claim the buyer's still-active basket items
+# (a concurrent buyer blocks on the row lock, then sees is_active = 0 and
+# skips the row), write the order, its lines and its delivery set-based from
+# the claimed rows, and clear the basket. Basket items that someone else got
+# first are reported back instead of failing the order.
+_CHECKOUT_SQL = """
+SET XACT_ABORT ON;
+DECLARE @buyer UNIQUEIDENTIFIER = ?;
+DECLARE @order_id UNIQUEIDENTIFIER = NEWID();
+DECLARE @claimed TABLE (listing_id UNIQUEIDENTIFIER PRIMARY KEY, price_cents INT NOT NULL);
+DECLARE @basket TABLE (listing_id UNIQUEIDENTIFIER PRIMARY KEY);
 
-            # Create order
-            cur.execute("""
-                INSERT INTO dbo.[order] (buyer_id, total_cents, status)
-                OUTPUT inserted.order_id
-                VALUES (?, ?, 'confirmed')
-            """, buyer, total)
-            order_id = str(cur.fetchone()[0])
+BEGIN TRAN;
 
-            # create delivery record for this order
-            cur.execute(
-                "INSERT INTO dbo.delivery (order_id, status) VALUES (?, 'pending')",
-                order_id
-            )
+UPDATE l
+   SET is_active = 0
+OUTPUT inserted.listing_id, ISNULL(inserted.price_cents, 0) INTO @claimed
+FROM dbo.basket_item bi
+JOIN dbo.listing l WITH (ROWLOCK) ON l.listing_id = bi.listing_id
+WHERE bi.user_id = @buyer AND l.is_active = 1;
 
-            # Insert order items
-            for listing_id, price in items:
-                cur.execute("""
-                    INSERT INTO dbo.order_item (order_id, listing_id, price_cents)
-                    VALUES (?, ?, ?)
-                """, order_id, listing_id, price or 0)
+IF EXISTS (SELECT 1 FROM @claimed)
+BEGIN
+  INSERT INTO dbo.[order] (order_id, buyer_id, total_cents, status)
+  SELECT @order_id, @buyer, SUM(price_cents), 'confirmed' FROM @claimed;
 
-            # Mark listings inactive & clear basket
-            id_list = [str(i[0]) for i in items]
-            cur.execute(
-                "UPDATE dbo.listing SET is_active = 0 WHERE listing_id IN (" +
-                ",".join("?" for _ in id_list) + ")",
-                id_list
-            )
-            cur.execute("DELETE FROM dbo.basket_item WHERE user_id = ?", buyer)
+  INSERT INTO dbo.order_item (order_id, listing_id, price_cents)
+  SELECT @order_id, listing_id, price_cents FROM @claimed;
 
-            # Commit
-            cur.execute("COMMIT")
-            conn.commit()
+  INSERT INTO dbo.delivery (order_id, status)
+  OUTPUT inserted.delivery_id, inserted.order_id, inserted.deliverer_id, inserted.status
+    INTO dbo.delivery_event (delivery_id, order_id, deliverer_id, status)
+  VALUES (@order_id, 'pending');
 
+  DELETE FROM dbo.basket_item
+  OUTPUT deleted.listing_id INTO @basket
+  WHERE user_id = @buyer;
+END
+ELSE
+  INSERT INTO @basket (listing_id)
+  SELECT listing_id FROM dbo.basket_item WHERE user_id = @buyer;
+
+COMMIT;
+SET XACT_ABORT OFF;
+
+SELECT CASE WHEN EXISTS (SELECT 1 FROM @claimed) THEN @order_id END,
+       (SELECT ISNULL(SUM(price_cents), 0) FROM @claimed),
+       (SELECT COUNT(*) FROM @claimed);
+SELECT b.listing_id
+FROM @basket b
+WHERE NOT EXISTS (SELECT 1 FROM @claimed c WHERE c.listing_id = b.listing_id);
+"""
+
+def _result_sets(cur) -> list:
+    """
+    Every row-returning result of a multi-statement batch. Walking all of
+    them also surfaces errors raised by statements late in the batch.
+    """
+    sets = []
+    while True:
+        if cur.description is not None:
+            sets.append(cur.fetchall())
+        if not cur.nextset():
+            return sets
+
+def _is_deadlock(exc: BaseException) -> bool:
+    return isinstance(exc, pyodbc.Error) and bool(exc.args) and exc.args[0] == "40001"
+
+def _checkout(conn, buyer: str, attempts: int = 3):
+    """
+    Run the checkout batch in its own transaction (one round trip), retrying
+    if SQL Server picks it as a deadlock victim.
+    Returns (order_id or None, total_cents, item_count, unavailable_ids).
+    """
+    # The batch manages BEGIN/COMMIT itself, and turns XACT_ABORT back off
+    # before returning the pooled session; after an error the pool's
+    # _reset_session does it.
+    conn.autocommit = True
+    try:
+        for attempt in range(1, attempts + 1):
+            try:
+                cur = conn.cursor()
+                cur.execute(_CHECKOUT_SQL, buyer)
+                summary, unavailable = _result_sets(cur)
+                order_id, total, count = summary[0]
+                return (str(order_id) if order_id else None, total, count,
+                        [str(r[0]) for r in unavailable])
+            except pyodbc.Error as e:
+                if not _is_deadlock(e) or attempt == attempts:
+                    raise
+                logging.warning("checkout deadlock for buyer %s, retry %d", buyer, attempt)
+    finally:
+        conn.autocommit = False
+
+@_route(route="orders/confirm", methods=["POST"])
+def confirm_order(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Returns: { order_id, total_cents, item_count, unavailable: [listing_id] }
+    `unavailable` lists basket items that were sold to someone else first.
+    409 { error, unavailable } when nothing could be bought: an empty basket,
+    or every item in it was sold first (those are listed in `unavailable`).
+    """
+    logging.info("POST /api/orders/confirm")
+    buyer = _buyer_id()
+    try:
+        with _conn(scope=buyer) as conn:
+            order_id, total, count, unavailable = _checkout(conn, buyer)
+        if not order_id:
             return func.HttpResponse(
-                json.dumps({"order_id": order_id, "total_cents": total}),
+                json.dumps({"error": "Basket empty or items unavailable", "unavailable": unavailable}),
                 mimetype="application/json",
-                status_code=201
+                status_code=409
             )
+        _note_write("deliveries")
+        _note_write("listings")
+        _listing_cache.invalidate()
+        _delivery_feed_poke()
+
+        return func.HttpResponse(
+            json.dumps({"order_id": order_id, "total_cents": total,
+                        "item_count": count, "unavailable": unavailable}),
+            mimetype="application/json",
+            status_code=201
+        )
     except Exception as e:
         logging.exception(e)
-        try:
-            cur.execute("ROLLBACK")
-        except Exception:
-            pass
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
+# ---------- Archival ----------
+# Sold listings (once the sale is ARCHIVE_SOLD_AFTER_DAYS old, default 30)
+# and unsold inactive ones created more than ARCHIVE_INACTIVE_AFTER_DAYS ago
+# (default 90) move to dbo.listing_archive / dbo.listing_image_archive, so
+# the hot tables hold live inventory only. Order lines find them again via
+# dbo.listing_all / dbo.order_item_detail.
+#
+# Each batch is its own short transaction: it locks up to
+# ARCHIVE_BATCH_SIZE candidates (skipping rows another transaction holds),
+# drops their basket/favorite/match rows, copies and deletes. Candidates are
+# found by state, so an interrupted run just leaves the rest for the next
+# one, and a listing already in the archive is not copied twice. Within a
+# run each batch resumes after the last (created_at, listing_id) the
+# previous one took ({after}), so inactive listings that don't qualify yet
+# (sold too recently) are walked past once per run, not once per batch.
+# Needs the indexes of db/migrations/0017.
+_ARCHIVE_BATCH_SQL = """
+SET XACT_ABORT ON;
+SET DEADLOCK_PRIORITY LOW;
+SET LOCK_TIMEOUT 5000;
+DECLARE @sold_before DATETIME2 = DATEADD(DAY, -?, SYSUTCDATETIME());
+DECLARE @stale_before DATETIME2 = DATEADD(DAY, -?, SYSUTCDATETIME());
+DECLARE @batch TABLE (listing_id UNIQUEIDENTIFIER PRIMARY KEY, reason VARCHAR(8) NOT NULL,
+                      created_at DATETIME2 NOT NULL);
+
+BEGIN TRAN;
+
+-- XLOCK also holds off basket/favorite inserts (their FK check) until the move commits
+INSERT INTO @batch (listing_id, reason, created_at)
+SELECT TOP (?) l.listing_id, CASE WHEN s.sold_at IS NULL THEN 'stale' ELSE 'sold' END, l.created_at
+FROM dbo.listing l WITH (XLOCK, ROWLOCK, READPAST)
+OUTER APPLY (
+  SELECT MAX(o.created_at) AS sold_at
+  FROM dbo.order_item oi
+  JOIN dbo.[order] o ON o.order_id = oi.order_id
+  WHERE oi.listing_id = l.listing_id
+) s
+WHERE l.is_active = 0{after}
+  AND (s.sold_at < @sold_before OR (s.sold_at IS NULL AND l.created_at < @stale_before))
+ORDER BY l.created_at, l.listing_id;
+
+DELETE bi FROM dbo.basket_item bi JOIN @batch b ON b.listing_id = bi.listing_id;
+DELETE f FROM dbo.favorite f JOIN @batch b ON b.listing_id = f.listing_id;
+DELETE m FROM dbo.saved_search_match m JOIN @batch b ON b.listing_id = m.listing_id;
+
+INSERT INTO dbo.listing_image_archive (image_id, listing_id, blob_url, blob_name, sort_order)
+SELECT li.image_id, li.listing_id, li.blob_url, li.blob_name, li.sort_order
+FROM dbo.listing_image li
+JOIN @batch b ON b.listing_id = li.listing_id
+WHERE NOT EXISTS (SELECT 1 FROM dbo.listing_image_archive a WHERE a.image_id = li.image_id);
+DELETE li FROM dbo.listing_image li JOIN @batch b ON b.listing_id = li.listing_id;
+
+INSERT INTO dbo.listing_archive (listing_id, seller_id, title, description, category, size, [condition],
+                                 price_cents, city, country, latitude, longitude, geo_point, is_active,
+                                 created_at, cover_image_url, cover_blob_name, archive_reason)
+SELECT l.listing_id, l.seller_id, l.title, l.description, l.category, l.size, l.[condition],
+       l.price_cents, l.city, l.country, l.latitude, l.longitude, l.geo_point, l.is_active,
+       l.created_at, l.cover_image_url, l.cover_blob_name, b.reason
+FROM dbo.listing l
+JOIN @batch b ON b.listing_id = l.listing_id
+WHERE NOT EXISTS (SELECT 1 FROM dbo.listing_archive a WHERE a.listing_id = l.listing_id);
+DELETE l FROM dbo.listing l JOIN @batch b ON b.listing_id = l.listing_id;
+
+COMMIT;
+SET XACT_ABORT OFF;
+SET DEADLOCK_PRIORITY NORMAL;
+SET LOCK_TIMEOUT -1;
+
+SELECT reason, COUNT(*) FROM @batch GROUP BY reason;
+SELECT TOP 1 CONVERT(VARCHAR(27), created_at, 126), listing_id FROM @batch ORDER BY created_at DESC, listing_id DESC;
+"""
+
+_ARCHIVE_AFTER_SQL = """
+  AND (l.created_at > CAST(? AS DATETIME2)
+       OR (l.created_at = CAST(? AS DATETIME2) AND l.listing_id > CAST(? AS UNIQUEIDENTIFIER)))"""
+
+LISTINGS_ARCHIVED = metrics.REGISTRY.counter(
+    "listings_archived_total", "Listings moved to dbo.listing_archive", ("reason",))
+
+def _archive_listings(max_seconds: float) -> dict:
+    """
+    Archive batches until none is full or max_seconds have passed.
+    Returns { sold, stale, batches, stopped } -- `stopped` is set when a
+    batch gave way to live traffic (deadlock victim or lock timeout); the
+    next run carries on from there.
+    """
+    batch_size = int(os.getenv("ARCHIVE_BATCH_SIZE") or 200)
+    sold_days = int(os.getenv("ARCHIVE_SOLD_AFTER_DAYS") or 30)
+    stale_days = int(os.getenv("ARCHIVE_INACTIVE_AFTER_DAYS") or 90)
+    pause = float(os.getenv("ARCHIVE_PAUSE_MS") or 200) / 1000
+    deadline = time.monotonic() + max_seconds
+    result = {"sold": 0, "stale": 0, "batches": 0, "stopped": None}
+    with _conn() as conn:
+        # The batch manages BEGIN/COMMIT itself, one transaction per batch
+        conn.autocommit = True
+        after = None
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    cur = conn.cursor()
+                    cur.execute(_ARCHIVE_BATCH_SQL.format(after=_ARCHIVE_AFTER_SQL if after else ""),
+                                sold_days, stale_days, batch_size, *((after[0], after[0], after[1]) if after else ()))
+                    counts, last = _result_sets(cur)
+                    counts = dict(counts)
+                except pyodbc.Error as e:
+                    # 40001 deadlock victim, HYT00 / 1222 lock timeout
+                    if not (_is_deadlock(e) or "1222" in str(e) or (e.args and e.args[0] == "HYT00")):
+                        raise
+                    result["stopped"] = str(e)
+                    break
+                result["batches"] += 1
+                for reason, n in counts.items():
+                    result[reason] += n
+                    LISTINGS_ARCHIVED.inc(n, reason)
+                if sum(counts.values()) < batch_size:
+                    break
+                after = (last[0][0], str(last[0][1]))
+                time.sleep(pause)
+
+            # Deletes leave the clustered indexes sparse; compact them online
+            # (outside a transaction) after a big run so they stay sized to
+            # the live inventory
+            if result["sold"] + result["stale"] >= int(os.getenv("ARCHIVE_REORGANIZE_AFTER") or 10_000):
+                cur = conn.cursor()
+                cur.execute("ALTER INDEX PK_listing ON dbo.listing REORGANIZE")
+                cur.execute("ALTER INDEX PK_listing_image ON dbo.listing_image REORGANIZE")
+        finally:
+            if result["stopped"]:
+                # The batch that gave way never reached its own SETs
+                _reset_session(conn)
+            conn.autocommit = False
+    return result
+
+# NCRONTAB schedule, e.g. "0 30 3 * * *" (daily 03:30 UTC); unset = no archival.
+# ARCHIVE_MAX_RUN_S (default 300) bounds one run.
+if os.getenv("LISTING_ARCHIVE_SCHEDULE"):
+    @app.timer_trigger(schedule="%LISTING_ARCHIVE_SCHEDULE%", arg_name="timer")
+    def archive_listings(timer: func.TimerRequest) -> None:
+        result = _archive_listings(float(os.getenv("ARCHIVE_MAX_RUN_S") or 300))
+        logging.info("archived %d sold and %d stale listings in %d batches%s",
+                     result["sold"], result["stale"], result["batches"],
+                     f" (stopped early: {result['stopped']})" if result["stopped"] else "")
+
 # ---------- Favorites ----------
-@app.route(route="favorites", methods=["GET"])
+@_route(route="favorites", methods=["GET"])
 def get_favorites(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Returns: [{ listing_id, title, price_cents, city }] (active listings only),
+    with an ETag; If-None-Match gets 304 after one small version lookup.
+    """
     try:
-        with _conn() as c:
+        def query(c):
             cur = c.cursor()
+            cur.execute("""
+              SELECT COUNT(*), MAX(f.row_version), MAX(l.row_version)
+              FROM dbo.favorite f
+              JOIN dbo.listing l ON l.listing_id = f.listing_id
+              WHERE f.user_id = ? AND l.is_active = 1
+            """, _buyer_id())
+            etag = _etag("favorites", *cur.fetchone())
+            if _etag_matches(req, etag):
+                return _not_modified(etag, _PRIVATE_CACHE)
             cur.execute("""
               SELECT f.listing_id, l.title, l.price_cents, l.city
               FROM dbo.favorite f
@@ -378,16 +1562,19 @@ def get_favorites(req: func.HttpRequest) -> func.HttpResponse:
             """, _buyer_id())
             rows = cur.fetchall()
             data = [{"listing_id": str(r[0]), "title": r[1], "price_cents": r[2], "city": r[3]} for r in rows]
-            return func.HttpResponse(json.dumps(data), mimetype="application/json")
+            return func.HttpResponse(_dumps(data), mimetype="application/json",
+                                     headers={"ETag": etag, "Cache-Control": _PRIVATE_CACHE})
+
+        return _read(query, scope=_buyer_id())
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="favorites/{listingId}", methods=["POST"])
+@_route(route="favorites/{listingId}", methods=["POST"])
 def add_favorite(req: func.HttpRequest) -> func.HttpResponse:
     lid = req.route_params["listingId"]
     try:
-        with _conn() as c:
+        with _conn(scope=_buyer_id()) as c:
             cur = c.cursor()
             cur.execute("""
               MERGE dbo.favorite AS t
@@ -401,11 +1588,11 @@ def add_favorite(req: func.HttpRequest) -> func.HttpResponse:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="favorites/{listingId}", methods=["DELETE"])
+@_route(route="favorites/{listingId}", methods=["DELETE"])
 def remove_favorite(req: func.HttpRequest) -> func.HttpResponse:
     lid = req.route_params["listingId"]
     try:
-        with _conn() as c:
+        with _conn(scope=_buyer_id()) as c:
             cur = c.cursor()
             cur.execute("DELETE FROM dbo.favorite WHERE user_id=? AND listing_id=?", _buyer_id(), lid)
             c.commit()
@@ -414,7 +1601,48 @@ def remove_favorite(req: func.HttpRequest) -> func.HttpResponse:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
+@_route(route="favorites:batch", methods=["POST"])
+def favorites_batch(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Body: { add?: [listing_id], remove?: [listing_id] } (up to 500 each)
+    Returns: { added, removed, unavailable: [listing_id] }
+    `unavailable` lists adds that were skipped because the listing does not exist.
+    """
+    return _user_list_batch(req, "favorite", active_only=False)
+
 # ---------- Saved Searches ----------
+def _geo_query(q) -> tuple:
+    """
+    (lat, lng, radius_km) from lat/lng/radiusKm; radius_km may be None.
+    Returns None when no point is given; raises ValueError when malformed.
+    """
+    lat, lng, radius = q.get("lat"), q.get("lng"), q.get("radiusKm")
+    if lat in (None, "") and lng in (None, ""):
+        if radius not in (None, ""):
+            raise ValueError("radiusKm needs lat and lng")
+        return None
+    try:
+        lat, lng = float(lat), float(lng)
+        radius = float(radius) if radius not in (None, "") else None
+    except (TypeError, ValueError):
+        raise ValueError("lat, lng and radiusKm must be numbers")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("lat/lng out of range")
+    if radius is not None and not (0 < radius <= 500):
+        raise ValueError("radiusKm must be between 0 and 500")
+    return lat, lng, radius
+
+def _fulltext_condition(text) -> str:
+    """
+    CONTAINS/CONTAINSTABLE condition for a free-text query: every word must
+    match as a prefix ("poussette bebe" -> "poussette*" AND "bebe*").
+    Only word characters survive, so the result is safe to pass through.
+    Accent folding comes from the catalog (ACCENT_SENSITIVITY = OFF).
+    Returns None if there is nothing to search for.
+    """
+    words = re.findall(r"\w+", str(text or "").lower())[:8]
+    return " AND ".join(f'"{w[:40]}*"' for w in words) or None
+
 def _build_listing_filter(q: dict):
     # Build WHERE clause + params from whitelisted fields
     clauses, params = ["l.is_active = 1"], []
@@ -426,14 +1654,196 @@ def _build_listing_filter(q: dict):
         clauses.append("l.[condition] = ?"); params.append(cond)
     if (city := q.get("city")):
         clauses.append("l.city = ?"); params.append(city)
+    if (geo := _geo_query(q)) and geo[2]:
+        # col.STDistance(point) <= d is the shape the spatial index can seek on
+        clauses.append("l.geo_point.STDistance(geography::Point(?, ?, 4326)) <= ?")
+        params += [geo[0], geo[1], geo[2] * 1000]
     where_sql = " AND ".join(clauses)
     return where_sql, params
 
-@app.route(route="saved-searches", methods=["GET"])
+def _listing_sort(raw, text, geo) -> str:
+    """recent | distance | relevance; relevance is the default when searching by text."""
+    sort = (raw or "").strip().lower() or ("relevance" if text else "recent")
+    if sort not in ("recent", "distance", "relevance"):
+        raise ValueError("sort must be recent, distance or relevance")
+    if sort == "distance" and not (geo and geo[2]):
+        # Without a radius nothing bounds the spatial index seek, and every
+        # located listing would be measured and sorted for each page
+        raise ValueError("sort=distance needs lat, lng and radiusKm")
+    if sort == "relevance" and not text:
+        raise ValueError("sort=relevance needs q")
+    return sort
+
+def _listing_cursor(token: str, sort: str):
+    """Decode a listing page token; it must come from the same sort order."""
+    if not token:
+        return None
+    values = _decode_cursor(token, 3)
+    if values[0] != sort:
+        raise ValueError("Invalid cursor")
+    if sort == "relevance" and not str(values[1]).isdigit():
+        raise ValueError("Invalid cursor")
+    return values[1:]
+
+def _image_variant_query(q) -> tuple:
+    """(width, format) of the card image the client wants; see image_variants.WIDTHS."""
+    try:
+        width = int(q.get("imageWidth") or 320)
+    except (TypeError, ValueError):
+        raise ValueError("imageWidth must be an integer")
+    fmt = (q.get("imageFormat") or "webp").strip().lower()
+    if fmt not in image_variants.FORMATS:
+        raise ValueError("imageFormat must be webp or jpeg")
+    return max(1, min(width, 4096)), fmt
+
+def _listing_page(cur, where_sql: str, params: list, limit: int, cursor=None, images: str = "cover",
+                  origin=None, sort: str = "recent", text=None, variant=(320, "webp")):
+    """
+    One page of listing cards using keyset pagination, so deep pages cost
+    the same as the first one:
+      sort="recent"    -- newest first, keyed on (created_at, listing_id)
+      sort="distance"  -- nearest to `origin` (lat, lng) first, keyed on
+                          (distance, listing_id); `where_sql` must hold the radius filter
+                          of _build_listing_filter, which the spatial index seeks on
+      sort="relevance" -- best full-text rank for `text` first, keyed on (rank, listing_id)
+    `text` is a _fulltext_condition(); with another sort it only filters.
+    image_url is the smallest cover variant at least variant[0] px wide in
+    format variant[1] (the widest one if none is), or the original upload
+    while its variants are not ready.
+    `cursor` is the decoded key of the previous page's last row (see
+    _listing_cursor). With an origin each card gets distance_km.
+    images="all" adds each card's full gallery, fetched for the whole page
+    in one query. Returns (rows, next_cursor or None).
+    """
+    distance_sql = "l.geo_point.STDistance(geography::Point(?, ?, 4326))"
+    select_params = list(origin[:2]) if origin else []
+    join_sql, join_params, rank_sql = "", [], "NULL"
+    params = list(params)
+    if text and sort == "relevance":
+        join_sql = "JOIN CONTAINSTABLE(dbo.listing, (title, description), ?, LANGUAGE 0) ft ON ft.[KEY] = l.listing_id"
+        join_params, rank_sql = [text], "ft.RANK"
+    elif text:
+        where_sql += " AND CONTAINS((l.title, l.description), ?, LANGUAGE 0)"
+        params.append(text)
+
+    if sort == "relevance":
+        order_sql = "ft.RANK DESC, l.listing_id"
+        if cursor:
+            where_sql += """ AND (ft.RANK < CAST(? AS INT)
+                               OR (ft.RANK = CAST(? AS INT) AND l.listing_id > CAST(? AS UNIQUEIDENTIFIER)))"""
+            params += [cursor[0], cursor[0], cursor[1]]
+    elif sort == "distance":
+        where_sql += " AND l.geo_point IS NOT NULL"
+        order_sql = "distance_m, l.listing_id"
+        if cursor:
+            where_sql += f""" AND ({distance_sql} > CAST(? AS FLOAT)
+                               OR ({distance_sql} = CAST(? AS FLOAT)
+                                   AND l.listing_id > CAST(? AS UNIQUEIDENTIFIER)))"""
+            params += [origin[0], origin[1], cursor[0], origin[0], origin[1], cursor[0], cursor[1]]
+    else:
+        order_sql = "l.created_at DESC, l.listing_id DESC"
+        if cursor:
+            where_sql += """ AND (l.created_at < CAST(? AS DATETIME2)
+                               OR (l.created_at = CAST(? AS DATETIME2)
+                                   AND l.listing_id < CAST(? AS UNIQUEIDENTIFIER)))"""
+            params += [cursor[0], cursor[0], cursor[1]]
+
+    # Fetch one extra row to know whether another page exists.
+    # created_key keeps DATETIME2's full precision (Python datetimes stop at µs).
+    sql = f"""
+      SELECT TOP ({limit + 1})
+             l.listing_id,
+             l.title,
+             l.price_cents,
+             l.city,
+             CASE WHEN l.price_cents IS NULL OR l.price_cents = 0 THEN 1 ELSE 0 END AS is_free,
+             COALESCE(cv.blob_url, l.cover_image_url) AS image_url,
+             CONVERT(VARCHAR(27), l.created_at, 126) AS created_key,
+             {distance_sql if origin else "NULL"} AS distance_m,
+             {rank_sql} AS text_rank
+      FROM dbo.listing l
+      {join_sql}
+      OUTER APPLY (
+        SELECT TOP 1 v.blob_url
+        FROM dbo.listing_image_variant v
+        WHERE v.blob_name = l.cover_blob_name AND v.format = ?
+        ORDER BY CASE WHEN v.width >= ? THEN v.width ELSE 100000 - v.width END
+      ) cv
+      WHERE {where_sql}
+      ORDER BY {order_sql}
+    """
+    cur.execute(sql, select_params + join_params + [variant[1], variant[0]] + params)
+    rows = cur.fetchall()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if sort == "relevance":
+            key = int(last[8])
+        elif sort == "distance":
+            key = repr(float(last[7]))
+        else:
+            key = last[6]
+        next_cursor = _encode_cursor(sort, key, last[0])
+    data = []
+    for r in rows:
+        item = {
+            "listing_id": str(r[0]),
+            "title": r[1],
+            "price_cents": r[2],
+            "city": r[3],
+            "is_free": int(r[4]),
+            "image_url": r[5],
+        }
+        if origin:
+            item["distance_km"] = round(r[7] / 1000, 2) if r[7] is not None else None
+        if r[8] is not None:
+            item["rank"] = int(r[8])
+        data.append(item)
+    if images == "all" and data:
+        galleries = _listing_galleries(cur, [d["listing_id"] for d in data])
+        for d in data:
+            d["images"] = galleries.get(d["listing_id"], [])
+    return data, next_cursor
+
+def _listing_galleries(cur, listing_ids: list) -> dict:
+    """All image URLs for a page of listings in one round trip: {listing_id: [url, ...]}."""
+    cur.execute(f"""
+      SELECT li.listing_id, li.blob_url
+      FROM dbo.listing_image li
+      WHERE li.listing_id IN ({",".join("?" for _ in listing_ids)})
+      ORDER BY li.listing_id, li.sort_order, li.blob_url
+    """, listing_ids)
+    out = {}
+    for r in cur.fetchall():
+        out.setdefault(str(r[0]), []).append(r[1])
+    return out
+
+def _listing_state(cur, buyer: str, listing_ids: list) -> dict:
+    """{listing_id: (is_favorite, in_basket)} for one buyer and a page of listings, in one query."""
+    cur.execute("""
+      SELECT t.listing_id,
+             CASE WHEN f.listing_id IS NULL THEN 0 ELSE 1 END,
+             CASE WHEN b.listing_id IS NULL THEN 0 ELSE 1 END
+      FROM ? t
+      LEFT JOIN dbo.favorite f ON f.user_id = ? AND f.listing_id = t.listing_id
+      LEFT JOIN dbo.basket_item b ON b.user_id = ? AND b.listing_id = t.listing_id
+    """, _id_tvp(listing_ids), buyer, buyer)
+    return {str(r[0]).lower(): (r[1], r[2]) for r in cur.fetchall()}
+
+@_route(route="saved-searches", methods=["GET"])
 def list_saved_searches(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Returns: [{ saved_search_id, name, query, is_active, created_at }], with an
+    ETag; If-None-Match gets 304 after one small version lookup.
+    """
     try:
-        with _conn() as c:
+        def query(c):
             cur = c.cursor()
+            cur.execute("SELECT COUNT(*), MAX(row_version) FROM dbo.saved_search WHERE user_id = ?", _buyer_id())
+            etag = _etag("saved-searches", *cur.fetchone())
+            if _etag_matches(req, etag):
+                return _not_modified(etag, _PRIVATE_CACHE)
             cur.execute("""
               SELECT saved_search_id, name, query_json, is_active, created_at
               FROM dbo.saved_search
@@ -448,19 +1858,26 @@ def list_saved_searches(req: func.HttpRequest) -> func.HttpResponse:
                 "is_active": int(r[3]),
                 "created_at": r[4].isoformat(),
             } for r in rows]
-            return func.HttpResponse(json.dumps(data), mimetype="application/json")
+            return func.HttpResponse(_dumps(data), mimetype="application/json",
+                                     headers={"ETag": etag, "Cache-Control": _PRIVATE_CACHE})
+
+        return _read(query, scope=_buyer_id())
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="saved-searches", methods=["POST"])
+@_route(route="saved-searches", methods=["POST"])
 def create_saved_search(req: func.HttpRequest) -> func.HttpResponse:
     try:
         body = req.get_json() if req.get_body() else {}
         name = body.get("name") or "My search"
-        q = {k: body.get(k) for k in ["category","size","condition","city","lat","lng","radiusKm"] if body.get(k) is not None}
+        q = {k: body.get(k) for k in ["q","category","size","condition","city","lat","lng","radiusKm"] if body.get(k) is not None}
+        try:
+            _geo_query(q)
+        except ValueError as e:
+            return func.HttpResponse(str(e), status_code=400)
         q_json = json.dumps(q)
-        with _conn() as c:
+        with _conn(scope=_buyer_id()) as c:
             cur = c.cursor()
             cur.execute("""
               INSERT INTO dbo.saved_search (user_id, name, query_json, is_active)
@@ -469,108 +1886,421 @@ def create_saved_search(req: func.HttpRequest) -> func.HttpResponse:
             """, _buyer_id(), name, q_json)
             sid = str(cur.fetchone()[0])
             c.commit()
-            return func.HttpResponse(json.dumps({"saved_search_id": sid}), mimetype="application/json", status_code=201)
+        _alert_index.add(sid, _buyer_id(), q)
+        return func.HttpResponse(json.dumps({"saved_search_id": sid}), mimetype="application/json", status_code=201)
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="saved-searches/{sid}/run", methods=["POST"])
+@_route(route="saved-searches/{sid}/run", methods=["POST"])
 def run_saved_search(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Query: limit? (1-100, default 24), cursor? (next_cursor of the previous page), images? (cover|all),
+           sort? (recent|distance|relevance; distance needs lat/lng/radiusKm and
+                  relevance q in the saved search), imageWidth?, imageFormat? (as GET /listings)
+    Returns: { results, query, next_cursor }
+    """
     sid = req.route_params["sid"]
     try:
-        with _conn() as c:
+        limit = _page_limit(req.params.get("limit"), 24)
+        images = "all" if (req.params.get("images") or "").strip().lower() == "all" else "cover"
+
+        def lookup(c):
             cur = c.cursor()
             cur.execute("SELECT query_json FROM dbo.saved_search WHERE saved_search_id = ? AND user_id = ?", sid, _buyer_id())
-            row = cur.fetchone()
-            if not row:
-                return func.HttpResponse("Not found", status_code=404)
-            q = json.loads(row[0])
+            return cur.fetchone()
 
+        row = _read(lookup, scope=_buyer_id())
+        if not row:
+            return func.HttpResponse("Not found", status_code=404)
+        q = json.loads(row[0])
+
+        text = _fulltext_condition(q.get("q"))
+        token = req.params.get("cursor") or ""
+        try:
+            geo = _geo_query(q)
+            sort = _listing_sort(req.params.get("sort"), text, geo)
+            cursor = _listing_cursor(token, sort)
+            variant = _image_variant_query(req.params)
             where_sql, params = _build_listing_filter(q)
-            sql = f"""
-              SELECT TOP 24
-                     l.listing_id,
-                     l.title,
-                     l.price_cents,
-                     l.city,
-                     CASE WHEN l.price_cents IS NULL OR l.price_cents=0 THEN 1 ELSE 0 END AS is_free,
-                     (
-                       SELECT TOP 1 li.blob_url
-                       FROM dbo.listing_image li
-                       WHERE li.listing_id = l.listing_id
-                       ORDER BY li.sort_order, li.blob_url
-                     ) AS image_url
-              FROM dbo.listing l
-              WHERE {where_sql}
-              ORDER BY l.created_at DESC
-            """
-            cur.execute(sql, *params)
-            rows = cur.fetchall()
-            data = [{
-                "listing_id": str(r[0]),
-                "title": r[1],
-                "price_cents": r[2],
-                "city": r[3],
-                "is_free": int(r[4]),
-                "image_url": r[5],
-            } for r in rows]
-            return func.HttpResponse(json.dumps({"results": data, "query": q}), mimetype="application/json")
+        except ValueError as e:
+            return func.HttpResponse(str(e), status_code=400)
+
+        def build():
+            data, next_cursor = _read(
+                lambda c: _listing_page(c.cursor(), where_sql, params, limit, cursor, images, geo, sort,
+                                        text, variant))
+            return _dumps(data), next_cursor
+
+        # Many buyers' saved searches run the same filter (e.g. after a push
+        # notification); the page is buyer-neutral, so they share it
+        key = ("saved-search", where_sql, json.dumps(params, default=str), limit, token, images, geo, sort,
+               text, variant)
+        results_json, next_cursor = _coalesced(key, "saved-search", build)
+        body = ('{"results": ' + results_json + ', "query": ' + _dumps(q)
+                + ', "next_cursor": ' + json.dumps(next_cursor) + "}")
+        return func.HttpResponse(body, mimetype="application/json")
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="saved-searches/{sid}/toggle", methods=["POST"])
+@_route(route="saved-searches/{sid}/toggle", methods=["POST"])
 def toggle_saved_search(req: func.HttpRequest) -> func.HttpResponse:
     sid = req.route_params["sid"]
     try:
-        with _conn() as c:
+        with _conn(scope=_buyer_id()) as c:
             cur = c.cursor()
             cur.execute("""
               UPDATE dbo.saved_search
                  SET is_active = CASE WHEN is_active=1 THEN 0 ELSE 1 END
+              OUTPUT inserted.is_active, inserted.query_json
                WHERE saved_search_id=? AND user_id=?
             """, sid, _buyer_id())
-            if cur.rowcount == 0:
+            row = cur.fetchone()
+            if not row:
                 return func.HttpResponse("Not found", status_code=404)
             c.commit()
-            return func.HttpResponse(status_code=204)
+        if row[0]:
+            _alert_index.add(sid, _buyer_id(), json.loads(row[1]))
+        else:
+            _alert_index.remove(sid)
+        return func.HttpResponse(status_code=204)
+    except Exception as e:
+        logging.exception(e)
+        return func.HttpResponse(f"Error: {e}", status_code=500)
+
+# ---------- Saved-search alerts ----------
+# Active saved searches live in an in-process inverted index, so each new
+# listing is matched in constant time instead of re-running every search.
+# Local creates/toggles update it directly; searches changed on other
+# workers are picked up by the periodic sync below.
+_alert_index = SavedSearchIndex()
+_alert_sync = {"full_at": None, "checked_at": 0.0, "watermark": None}
+_alert_sync_lock = threading.Lock()
+
+# Rows stamped below MIN_ACTIVE_ROWVERSION() are committed; anything at or
+# above it may still be in flight, so it is left for the next sync
+_ALERT_SYNC_SQL = """
+DECLARE @hi BINARY(8) = MIN_ACTIVE_ROWVERSION();
+SELECT saved_search_id, user_id, query_json, is_active
+FROM dbo.saved_search
+WHERE {where} AND row_version < @hi;
+SELECT @hi;
+"""
+
+def _sync_alert_index(cur) -> SavedSearchIndex:
+    """
+    Reload the whole index every SAVED_SEARCH_FULL_SYNC_S (default 600s);
+    in between, at most every SAVED_SEARCH_SYNC_S (default 30s), apply the
+    searches created, edited or switched on/off since the last sync (by
+    row_version, up to the oldest still-open write). Either way the next
+    index is built on the side and swapped in whole, so concurrent matches
+    never see it half-updated.
+    """
+    global _alert_index
+    now = time.monotonic()
+    full_every = float(os.getenv("SAVED_SEARCH_FULL_SYNC_S") or 600)
+    sync_every = float(os.getenv("SAVED_SEARCH_SYNC_S") or 30)
+    with _alert_sync_lock:
+        full = _alert_sync["full_at"] is None or now - _alert_sync["full_at"] >= full_every
+        if not full and now - _alert_sync["checked_at"] < sync_every:
+            return _alert_index
+
+        if full:
+            cur.execute(_ALERT_SYNC_SQL.format(where="is_active = 1"))
+            index = SavedSearchIndex()
+        else:
+            cur.execute(_ALERT_SYNC_SQL.format(where="row_version >= CAST(? AS BINARY(8))"),
+                        _alert_sync["watermark"])
+            index = _alert_index.copy()
+        rows, ((watermark,),) = _result_sets(cur)
+        for sid, uid, q_json, active in rows:
+            if not active:
+                index.remove(str(sid))
+                continue
+            try:
+                index.add(str(sid), str(uid), json.loads(q_json))
+            except ValueError:
+                logging.warning("saved search %s has unreadable query_json", sid)
+
+        _alert_index = index
+        if full:
+            _alert_sync["full_at"] = now
+        _alert_sync["checked_at"] = now
+        _alert_sync["watermark"] = watermark
+        return _alert_index
+
+def _record_matches(cur, listings: list) -> int:
+    """
+    Match (listing_id, fields) pairs against the saved-search index and
+    store new hits in dbo.saved_search_match, all in one statement.
+    Already-recorded pairs are skipped, so re-running a window is safe.
+    Searches switched off since the index last synced are dropped here,
+    against the table, so they stop alerting at once.
+    Returns the number of new matches written.
+    """
+    index = _sync_alert_index(cur)
+    hits = [
+        {"s": sid, "l": str(lid), "u": uid}
+        for lid, fields in listings
+        for sid, uid in index.match(fields)
+    ]
+    if not hits:
+        return 0
+    cur.execute("""
+      INSERT INTO dbo.saved_search_match (saved_search_id, listing_id, user_id)
+      SELECT j.saved_search_id, j.listing_id, j.user_id
+      FROM OPENJSON(?) WITH (
+             saved_search_id UNIQUEIDENTIFIER '$.s',
+             listing_id      UNIQUEIDENTIFIER '$.l',
+             user_id         UNIQUEIDENTIFIER '$.u'
+           ) j
+      JOIN dbo.saved_search s ON s.saved_search_id = j.saved_search_id AND s.is_active = 1
+      WHERE NOT EXISTS (
+        SELECT 1 FROM dbo.saved_search_match m
+        WHERE m.saved_search_id = j.saved_search_id AND m.listing_id = j.listing_id
+      )
+    """, json.dumps(hits))
+    return max(cur.rowcount, 0)
+
+@_route(route="saved-searches/matches", methods=["GET"])
+def list_saved_search_matches(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Query: limit? (1-100, default 50)
+    Returns: [{ saved_search_id, listing_id, title, price_cents, city, image_url, matched_at }]
+    """
+    try:
+        limit = _page_limit(req.params.get("limit"), 50)
+        def query(c):
+            cur = c.cursor()
+            cur.execute(f"""
+              SELECT TOP ({limit}) m.saved_search_id, m.listing_id, l.title, l.price_cents, l.city,
+                     l.cover_image_url, m.matched_at
+              FROM dbo.saved_search_match m
+              JOIN dbo.saved_search s ON s.saved_search_id = m.saved_search_id
+              JOIN dbo.listing l ON l.listing_id = m.listing_id
+              WHERE m.user_id = ? AND s.is_active = 1 AND l.is_active = 1
+              ORDER BY m.matched_at DESC
+            """, _buyer_id())
+            rows = cur.fetchall()
+            data = [{
+                "saved_search_id": str(r[0]),
+                "listing_id": str(r[1]),
+                "title": r[2],
+                "price_cents": r[3],
+                "city": r[4],
+                "image_url": r[5],
+                "matched_at": r[6].isoformat(),
+            } for r in rows]
+            return func.HttpResponse(_dumps(data), mimetype="application/json")
+
+        return _read(query, scope=_buyer_id())
+    except Exception as e:
+        logging.exception(e)
+        return func.HttpResponse(f"Error: {e}", status_code=500)
+
+@_route(route="saved-searches/matches/catch-up", methods=["POST"])
+def catch_up_saved_search_matches(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Re-match listings created in [since, until) against active saved
+    searches, e.g. after downtime. Idempotent.
+    Body: { since: ISO datetime, until?: ISO datetime (default now), batch?: int }
+    Returns: { listings_scanned, matches }
+    """
+    try:
+        body = req.get_json() if req.get_body() else {}
+        try:
+            since = datetime.fromisoformat(str(body.get("since")))
+            until = datetime.fromisoformat(str(body["until"])) if body.get("until") else datetime.utcnow()
+        except ValueError:
+            return func.HttpResponse("since/until must be ISO datetimes", status_code=400)
+        try:
+            batch = max(1, min(int(body.get("batch") or 500), 5000))
+        except (TypeError, ValueError):
+            return func.HttpResponse("batch must be an integer", status_code=400)
+
+        scanned = matches = 0
+        after = (since.isoformat(), None)
+        while True:
+            # One short transaction per batch, resuming after the last row seen
+            with _conn() as c:
+                cur = c.cursor()
+                where = "l.is_active = 1 AND l.created_at >= CAST(? AS DATETIME2) AND l.created_at < CAST(? AS DATETIME2)"
+                params = [since.isoformat(), until.isoformat()]
+                if after[1]:
+                    where += """ AND (l.created_at > CAST(? AS DATETIME2)
+                                  OR (l.created_at = CAST(? AS DATETIME2) AND l.listing_id > CAST(? AS UNIQUEIDENTIFIER)))"""
+                    params += [after[0], after[0], after[1]]
+                cur.execute(f"""
+                  SELECT TOP ({batch}) l.listing_id, l.category, l.size, l.[condition], l.city,
+                         CONVERT(VARCHAR(27), l.created_at, 126), l.latitude, l.longitude,
+                         l.title, l.description
+                  FROM dbo.listing l
+                  WHERE {where}
+                  ORDER BY l.created_at, l.listing_id
+                """, params)
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                matches += _record_matches(cur, [
+                    (r[0], {"category": r[1], "size": r[2], "condition": r[3], "city": r[4],
+                            "latitude": r[6], "longitude": r[7], "title": r[8], "description": r[9]})
+                    for r in rows
+                ])
+            scanned += len(rows)
+            after = (rows[-1][5], str(rows[-1][0]))
+            if len(rows) < batch:
+                break
+
+        return func.HttpResponse(json.dumps({"listings_scanned": scanned, "matches": matches}),
+                                 mimetype="application/json")
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
 # ---------- Deliveries ----------
-@app.route(route="deliveries", methods=["GET"])
+DELIVERY_STATUSES = ("pending", "in_progress", "delivered", "canceled", "failed")
+
+def _delivery_sync_key(raw: str):
+    """
+    (row_version, updated_at) to resume a sync from: a sync_token from a
+    previous response gives (row_version, None); a plain ISO timestamp, or a
+    token from before syncs tracked row_version, gives (0, updated_at).
+    Empty means from the start.
+    """
+    if not raw:
+        return None
+    for size in (2, 3):
+        try:
+            values = _decode_cursor(raw, size)
+        except ValueError:
+            continue
+        if values[0] == "changed" and values[1].isdigit():
+            return int(values[1]), None
+        if values[0] == "updated":
+            return 0, values[1]
+        raise ValueError("Invalid updated_since")
+    try:
+        stamp = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("updated_since must be a sync_token or an ISO timestamp")
+    if stamp.tzinfo is not None:
+        stamp = stamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return 0, stamp.isoformat()
+
+@_route(route="deliveries", methods=["GET"])
 def list_deliveries(req: func.HttpRequest) -> func.HttpResponse:
     """
-    For MVP: return all deliveries with basic order info.
-    (Later: filter by deliverer_id = current deliverer)
+    Query: status? (comma-separated), deliverer_id?, limit? (1-200, default 50),
+           cursor?, updated_since?
+    Browsing (newest first): returns [delivery] -- or { items, next_cursor }
+    when `cursor` is passed (empty for the first page); the next page token is
+    also sent in X-Next-Cursor.
+
+    Syncing: pass updated_since (empty for a full sync, then the sync_token of
+    the previous response, or an ISO timestamp) to get only deliveries changed
+    since, in commit-safe order: { items, sync_token, has_more }. Keep
+    calling with the new sync_token while has_more. The token is a
+    row_version and reads stop below MIN_ACTIVE_ROWVERSION(), so a change
+    still being written holds the sync back until it commits instead of
+    landing behind a token already handed out.
+    A status filter would hide rows that moved out of it, so it can't be
+    combined with updated_since.
     """
     try:
-        with _conn() as c:
+        limit = _page_limit(req.params.get("limit"), 50, maximum=200)
+        syncing = "updated_since" in req.params
+        token = req.params.get("cursor") or ""
+        clauses, params = [], []
+        try:
+            statuses = [x.strip() for x in (req.params.get("status") or "").split(",") if x.strip()]
+            if any(x not in DELIVERY_STATUSES for x in statuses):
+                raise ValueError("Invalid status")
+            if statuses and syncing:
+                raise ValueError("status can't be combined with updated_since")
+            if statuses:
+                clauses.append(f"d.status IN ({','.join('?' for _ in statuses)})")
+                params += statuses
+            if req.params.get("deliverer_id"):
+                clauses.append("d.deliverer_id = ?")
+                params.append(str(UUID(req.params["deliverer_id"])))
+            if syncing:
+                since = _delivery_sync_key(req.params.get("updated_since") or "")
+            elif token:
+                values = _decode_cursor(token, 3)
+                if values[0] != "created":
+                    raise ValueError("Invalid cursor")
+        except ValueError as e:
+            return func.HttpResponse(str(e), status_code=400)
+
+        if syncing:
+            clauses.append("d.row_version > CAST(CAST(? AS BIGINT) AS BINARY(8))")
+            clauses.append("d.row_version < MIN_ACTIVE_ROWVERSION()")
+            params.append(since[0] if since else 0)
+            if since and since[1]:
+                clauses.append("d.updated_at >= CAST(? AS DATETIME2)")
+                params.append(since[1])
+            order_sql = "d.row_version"
+        else:
+            if token:
+                clauses.append("""(d.created_at < CAST(? AS DATETIME2)
+                                   OR (d.created_at = CAST(? AS DATETIME2)
+                                       AND d.delivery_id < CAST(? AS UNIQUEIDENTIFIER)))""")
+                params += [values[1], values[1], values[2]]
+            order_sql = "d.created_at DESC, d.delivery_id DESC"
+
+        def query(c):
             cur = c.cursor()
-            cur.execute("""
-              SELECT d.delivery_id, d.order_id, d.status, d.required_comment, d.created_at, d.updated_at,
-                     o.total_cents
+            cur.execute(f"""
+              SELECT TOP ({limit + 1})
+                     d.delivery_id, d.order_id, d.status, d.required_comment, d.created_at, d.updated_at,
+                     o.total_cents, d.deliverer_id,
+                     CONVERT(VARCHAR(27), d.created_at, 126) AS created_key,
+                     CAST(d.row_version AS BIGINT) AS changed_key
               FROM dbo.delivery d
               JOIN dbo.[order] o ON o.order_id = d.order_id
-              ORDER BY d.created_at DESC
-            """)
-            rows = cur.fetchall()
-            data = [{
-                "delivery_id": str(r[0]),
-                "order_id": str(r[1]),
-                "status": r[2],
-                "required_comment": r[3],
-                "created_at": r[4].isoformat(),
-                "updated_at": r[5].isoformat(),
-                "total_cents": r[6],
-            } for r in rows]
-            return func.HttpResponse(json.dumps(data), mimetype="application/json")
+              WHERE {" AND ".join(clauses) or "1=1"}
+              ORDER BY {order_sql}
+            """, params)
+            return cur.fetchall()
+
+        if syncing:
+            # MIN_ACTIVE_ROWVERSION() only covers open transactions on the
+            # server it runs on, so the sync bound is taken on the primary
+            with _conn() as c:
+                rows = query(c)
+        else:
+            rows = _read(query, scope="deliveries")
+        more = len(rows) > limit
+        rows = rows[:limit]
+        data = [{
+            "delivery_id": str(r[0]),
+            "order_id": str(r[1]),
+            "status": r[2],
+            "required_comment": r[3],
+            "created_at": r[4].isoformat(),
+            "updated_at": r[5].isoformat(),
+            "total_cents": r[6],
+            "deliverer_id": str(r[7]) if r[7] else None,
+        } for r in rows]
+
+        if syncing:
+            if rows:
+                sync_token = _encode_cursor("changed", rows[-1][9])
+            else:
+                sync_token = req.params.get("updated_since") or ""
+            body = {"items": data, "sync_token": sync_token, "has_more": more}
+            return func.HttpResponse(_dumps(body), mimetype="application/json")
+
+        next_cursor = _encode_cursor("created", rows[-1][8], rows[-1][0]) if more else None
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        body = {"items": data, "next_cursor": next_cursor} if "cursor" in req.params else data
+        return func.HttpResponse(_dumps(body), mimetype="application/json", headers=headers)
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
 
-@app.route(route="deliveries/{deliveryId}/status", methods=["POST"])
+@_route(route="deliveries/{deliveryId}/status", methods=["POST"])
 def update_delivery_status(req: func.HttpRequest) -> func.HttpResponse:
     """
     Body: { "status": "in_progress|delivered|canceled|failed", "comment": "required when final" }
@@ -590,19 +2320,165 @@ def update_delivery_status(req: func.HttpRequest) -> func.HttpResponse:
         if status in final_statuses and not comment:
             return func.HttpResponse("Comment is required for this status", status_code=400)
 
-        with _conn() as c:
+        with _conn(scope="deliveries") as c:
             cur = c.cursor()
             cur.execute("SELECT 1 FROM dbo.delivery WHERE delivery_id = ?", did)
             if not cur.fetchone():
                 return func.HttpResponse("Not found", status_code=404)
 
+            # The transition and its change-feed event commit together
             cur.execute("""
               UPDATE dbo.delivery
                  SET status = ?, required_comment = CASE WHEN ?<>'' THEN ? ELSE required_comment END
+              OUTPUT inserted.delivery_id, inserted.order_id, inserted.deliverer_id, inserted.status,
+                     NULLIF(?, '')
+                INTO dbo.delivery_event (delivery_id, order_id, deliverer_id, status, comment)
                WHERE delivery_id = ?
-            """, status, comment, comment, did)
+            """, status, comment, comment, comment, did)
             c.commit()
-            return func.HttpResponse(status_code=204)
+        _delivery_feed_poke()
+        return func.HttpResponse(status_code=204)
+    except Exception as e:
+        logging.exception(e)
+        return func.HttpResponse(f"Error: {e}", status_code=500)
+
+# ---------- Delivery change feed ----------
+_delivery_feed = None
+_delivery_feed_lock = threading.Lock()
+
+_DELIVERY_EVENT_SQL = """
+DECLARE @hi BINARY(8) = MIN_ACTIVE_ROWVERSION();
+SELECT TOP ({limit}) e.event_id, e.delivery_id, e.order_id, e.deliverer_id, e.status, e.comment, e.created_at,
+       CAST(e.row_version AS BIGINT)
+FROM dbo.delivery_event e
+WHERE e.row_version > CAST(CAST(? AS BIGINT) AS BINARY(8)) AND e.row_version < @hi {filters}
+ORDER BY e.row_version;
+SELECT CAST(@hi AS BIGINT) - 1;
+"""
+
+def _delivery_event(r) -> dict:
+    return {
+        "event_id": r[0],
+        "delivery_id": str(r[1]),
+        "order_id": str(r[2]),
+        "deliverer_id": str(r[3]) if r[3] else None,
+        "status": r[4],
+        "comment": r[5],
+        "created_at": r[6].isoformat(),
+        "seq": r[7],
+    }
+
+def _delivery_events_after(after_seq: int, order_id=None, deliverer_id=None, limit=500) -> tuple:
+    """
+    (events after `after_seq` in commit-safe order, seq to resume from). seq
+    is the event's row_version, and reads stop below MIN_ACTIVE_ROWVERSION():
+    an event written by a still-open transaction holds back everything after
+    it, however long it stays open, instead of being skipped once a later
+    one commits. With less than a full page every event up to that bound
+    was scanned, matching or not, so the resume seq moves up to it.
+    """
+    filters, params = [], [after_seq]
+    if order_id:
+        filters.append("AND e.order_id = ?")
+        params.append(order_id)
+    if deliverer_id:
+        filters.append("AND e.deliverer_id = ?")
+        params.append(deliverer_id)
+    with _conn() as c:
+        cur = c.cursor()
+        cur.execute(_DELIVERY_EVENT_SQL.format(limit=int(limit), filters=" ".join(filters)), params)
+        rows, ((committed,),) = _result_sets(cur)
+    events = [_delivery_event(r) for r in rows]
+    if len(events) == limit:
+        return events, events[-1]["seq"]
+    return events, max(after_seq, int(committed))
+
+def _delivery_event_head() -> int:
+    """Seq below which every event has committed: "now" for a new subscriber."""
+    with _conn() as c:
+        cur = c.cursor()
+        cur.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT) - 1")
+        return int(cur.fetchone()[0])
+
+def _delivery_feed_hub() -> ChangeFeed:
+    global _delivery_feed
+    if _delivery_feed is None:
+        with _delivery_feed_lock:
+            if _delivery_feed is None:
+                _delivery_feed = ChangeFeed(
+                    fetch=lambda after: [(e["seq"], e) for e in _delivery_events_after(after)[0]],
+                    head=_delivery_event_head,
+                    poll_interval=float(os.getenv("DELIVERY_FEED_POLL_S", "0.5")),
+                    buffer_size=int(os.getenv("DELIVERY_FEED_BUFFER", "2000")),
+                    name="delivery-feed",
+                    id_key="seq",
+                )
+    return _delivery_feed
+
+def _delivery_feed_poke():
+    """After a local write: let this worker's poller pick it up without waiting a full interval."""
+    if _delivery_feed is not None:
+        _delivery_feed.notify()
+
+@_route(route="deliveries/changes", methods=["GET"])
+async def delivery_changes(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Long-poll feed of delivery status changes (new deliveries and every
+    update_delivery_status transition).
+    Query: since? (token from the previous response; omit to start from now),
+           order_id?, deliverer_id?, wait? (seconds to hold the request open
+           when nothing is new, 0-25, default 20)
+    Returns: { events: [{ event_id, delivery_id, order_id, deliverer_id, status,
+               comment, created_at, seq }], next } -- pass `next` as `since` to
+               continue. Events come in seq (row_version) order, which only
+               moves past a write once it has committed.
+
+    Waiting clients share this worker's single poller of dbo.delivery_event
+    and its in-memory buffer; only a client further behind than the buffer
+    reads the table itself.
+    """
+    try:
+        order_id = str(UUID(req.params["order_id"])) if req.params.get("order_id") else None
+        deliverer_id = str(UUID(req.params["deliverer_id"])) if req.params.get("deliverer_id") else None
+        since = int(req.params["since"]) if req.params.get("since") else None
+        wait = max(0.0, min(float(req.params.get("wait") or 20), 25.0))
+    except ValueError:
+        return func.HttpResponse("Invalid since, wait, order_id or deliverer_id", status_code=400)
+    try:
+        hub = _delivery_feed_hub()
+        loop = asyncio.get_running_loop()
+        if not hub.running:
+            await loop.run_in_executor(None, hub.start)
+        if since is None:
+            # The poller may have been idle, so ask the table where "now" is
+            head = await loop.run_in_executor(None, _delivery_event_head)
+            body = {"events": [], "next": str(max(head, hub.head()))}
+            return func.HttpResponse(_dumps(body), mimetype="application/json")
+
+        def wanted(e):
+            return ((not order_id or e["order_id"] == order_id)
+                    and (not deliverer_id or e["deliverer_id"] == deliverer_id))
+
+        waiter = hub.watch(since, wanted)
+        if waiter is None:
+            # Further behind than the buffer: catch up from the table
+            events, nxt = await loop.run_in_executor(
+                None, lambda: _delivery_events_after(since, order_id, deliverer_id, limit=100))
+        else:
+            try:
+                if wait:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), wait)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                events, nxt = hub.unwatch(waiter)
+        body = {"events": events, "next": str(nxt)}
+        return func.HttpResponse(_dumps(body), mimetype="application/json")
     except Exception as e:
         logging.exception(e)
         return func.HttpResponse(f"Error: {e}", status_code=500)
+
+@_route(route="diagnostics/delivery-feed", methods=["GET"])
+def delivery_feed_stats(req: func.HttpRequest) -> func.HttpResponse:
+    stats = _delivery_feed.stats() if _delivery_feed is not None else {"running": False}
+    return func.HttpResponse(json.dumps(stats), mimetype="application/json")
@@ -0,0 +1,85 @@
+import io
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+
+# Fixed output widths (px) and formats; cards pick the smallest that fits
+WIDTHS = (160, 320, 640, 1280)
+FORMATS = ("webp", "jpeg")
+CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+QUALITY = 80
+
+# Refuse anything larger than ~50 MP rather than decode it
+MAX_PIXELS = 50_000_000
+
+
+def _pil():
+    """Pillow, imported on first use: only the blob trigger renders images."""
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+    return Image, ImageOps
+
+
+def unusable_errors() -> tuple:
+    """Exceptions for uploads that can never produce variants (not an image, or too large)."""
+    Image, _ = _pil()
+    from PIL import UnidentifiedImageError
+    return (UnidentifiedImageError, Image.DecompressionBombError)
+
+
+def variant_name(blob_name: str, width: int, fmt: str) -> str:
+    """
+    Deterministic name of one variant ("<lid>/<stamp>_0.jpg" ->
+    "<lid>/<stamp>_0/w320.webp"), so reprocessing overwrites, never duplicates.
+    """
+    stem, _ = posixpath.splitext(blob_name)
+    return f"{stem}/w{width}.{EXTENSIONS[fmt]}"
+
+
+def target_widths(source_width: int) -> list:
+    """WIDTHS not wider than the source; a tiny source still gets one variant at its own width."""
+    return [w for w in WIDTHS if w <= source_width] or [source_width]
+
+
+def _encode(img, fmt: str):
+    buf = io.BytesIO()
+    # No exif= argument, so nothing from the camera (GPS included) is written back
+    if fmt == "webp":
+        img.save(buf, "WEBP", quality=QUALITY, method=4)
+    else:
+        img.save(buf, "JPEG", quality=QUALITY, optimize=True, progressive=True)
+    return img.width, img.height, fmt, buf.getvalue()
+
+
+def _resized(img) -> list:
+    """One image per target width, widest first, each scaled down from the previous one."""
+    out = []
+    for width in sorted(target_widths(img.width), reverse=True):
+        prev = out[-1] if out else img
+        if width == prev.width:
+            out.append(prev)
+            continue
+        height = max(1, round(img.height * width / img.width))
+        out.append(prev.resize((width, height), _pil()[0].LANCZOS, reducing_gap=3.0))
+    return out
+
+
+def render_variants(data: bytes, executor: ThreadPoolExecutor = None) -> list:
+    """
+    Decode an uploaded photo and encode every (width, format) variant.
+    JPEGs are decoded at the smallest DCT scale that still covers the
+    widest variant, and each width is resized once and encoded in every
+    format. Camera orientation is applied to the pixels first, since the
+    EXIF that carried it is dropped. Pillow releases the GIL while
+    encoding, so an executor encodes the variants in parallel.
+    Returns [(width, height, fmt, bytes)]; raises on undecodable input.
+    """
+    Image, ImageOps = _pil()
+    with Image.open(io.BytesIO(data)) as src:
+        src.draft("RGB", (WIDTHS[-1], WIDTHS[-1]))
+        img = ImageOps.exif_transpose(src)
+        img = img.convert("RGB") if img.mode != "RGB" else img.copy()
+    jobs = [(v, fmt) for v in _resized(img) for fmt in FORMATS]
+    if executor is None:
+        return [_encode(v, fmt) for v, fmt in jobs]
+    return list(executor.map(lambda job: _encode(*job), jobs))
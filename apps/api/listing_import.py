@@ -0,0 +1,93 @@
+import io
+import csv
+import json
+
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {"text/csv": "csv", "application/x-ndjson": "ndjson", "application/jsonl": "ndjson"}
+
+# Longest line (NDJSON) or field (CSV) accepted before the row is
+# rejected. CSV fields are checked here rather than through
+# csv.field_size_limit(), which is process-wide; the csv module's own
+# 128 KiB default still bounds what one field can buffer.
+MAX_LINE = 64 * 1024
+
+
+class ChunkStream(io.RawIOBase):
+    """Read-only file object over an iterator of byte chunks, so parsers pull data as they go."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buf):
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(buf), len(self._pending))
+        buf[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+def text_lines(chunks):
+    """Decoded lines of a UTF-8 (optionally BOM-prefixed) byte stream."""
+    return io.TextIOWrapper(io.BufferedReader(ChunkStream(chunks), 1 << 16),
+                            encoding="utf-8-sig", errors="replace", newline="")
+
+
+def records(chunks, fmt: str):
+    """
+    Yield (line, record, error) for each data row of a CSV (header row
+    first) or NDJSON stream, one row in memory at a time. `record` is a
+    dict of raw values, or None with `error` set when the row is unreadable.
+    """
+    if fmt not in FORMATS:
+        raise ValueError("format must be csv or ndjson")
+    text = text_lines(chunks)
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                yield reader.line_num, None, f"unreadable CSV row: {e}"
+                continue
+            if None in row:
+                yield reader.line_num, None, "more fields than the header"
+                continue
+            if any(v is not None and len(v) > MAX_LINE for v in row.values()):
+                yield reader.line_num, None, "field too long"
+                continue
+            yield reader.line_num, {k.strip(): v for k, v in row.items() if k}, None
+        return
+
+    line_no = 0
+    while True:
+        line = text.readline(MAX_LINE + 1)
+        if not line:
+            return
+        line_no += 1
+        if len(line) > MAX_LINE and not line.endswith("\n"):
+            # Skip the rest of the oversized line
+            while line and not line.endswith("\n"):
+                line = text.readline(MAX_LINE + 1)
+            yield line_no, None, "line too long"
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "each line must be a JSON object"
+            continue
+        yield line_no, record, None
@@ -0,0 +1,402 @@
+import re
+import time
+import zlib
+import random
+import inspect
+import logging
+import functools
+import threading
+import contextvars
+from bisect import bisect_left
+
+# Seconds; covers sub-millisecond cache hits up to slow checkouts
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 1000, 10000)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra="") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    def __init__(self, name, help, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}      # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            if i < len(self.buckets):
+                s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(k, list(v)) for k, v in self._series.items()]
+        for labels, s in sorted(series):
+            cumulative = 0
+            for bound, n in zip(self.buckets, s):
+                cumulative += n
+                le = 'le="%s"' % _num(bound)
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {s[-1]}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_num(s[-2])}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {s[-1]}"
+
+
+class Counter:
+    def __init__(self, name, help, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, v in values:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_num(v)}"
+
+
+class Registry:
+    """
+    Metrics plus collectors -- callables returning
+    [(name, type, help, {label: value}, value)] at scrape time, for state
+    that already lives elsewhere (pool and cache stats).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        m = Histogram(*args, **kwargs)
+        self._metrics.append(m)
+        return m
+
+    def counter(self, *args, **kwargs) -> Counter:
+        m = Counter(*args, **kwargs)
+        self._metrics.append(m)
+        return m
+
+    def add_collector(self, fn):
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        seen = set()
+        for fn in self._collectors:
+            try:
+                samples = fn()
+            except Exception:
+                logging.exception("metrics collector failed")
+                continue
+            for name, kind, help, labels, value in samples:
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# HELP {name} {help}")
+                    lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP handler latency", ("route", "method", "status"))
+PHASE_SECONDS = REGISTRY.histogram(
+    "http_request_phase_seconds",
+    "Time per request spent acquiring a connection, executing SQL, fetching rows, "
+    "serializing the response and in the rest of the handler (sampled requests only)",
+    ("route", "phase"))
+SQL_SECONDS = REGISTRY.histogram(
+    "sql_statement_duration_seconds", "SQL execute + fetch time per statement (sampled requests only)",
+    ("route", "statement"))
+SQL_ROWS = REGISTRY.histogram(
+    "sql_statement_rows", "Rows fetched per statement (sampled requests only)",
+    ("route", "statement"), buckets=ROW_BUCKETS)
+SLOW_QUERIES = REGISTRY.counter(
+    "sql_slow_statements_total", "Statements slower than SQL_SLOW_MS", ("route", "statement"))
+
+_STATEMENTS = {}            # sql text -> fingerprint
+_STATEMENT_TEXT = {}        # fingerprint -> normalized text (for sql_statement_info)
+_MAX_STATEMENTS = 512
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Short, stable id for a statement's shape: whitespace collapsed and
+    numeric literals (TOP (25), ...) replaced, so one query built with
+    different limits is one series.
+    """
+    fp = _STATEMENTS.get(sql)
+    if fp is None:
+        text = re.sub(r"\b\d+\b", "?", " ".join(sql.split()))
+        fp = format(zlib.crc32(text.encode("utf-8")), "08x")
+        if len(_STATEMENTS) < _MAX_STATEMENTS:
+            _STATEMENTS[sql] = fp
+            _STATEMENT_TEXT.setdefault(fp, text)
+    return fp
+
+
+def _statement_info():
+    return [("sql_statement_info", "gauge", "Normalized text of each statement fingerprint",
+             {"statement": fp, "sql": text[:200]}, 1) for fp, text in list(_STATEMENT_TEXT.items())]
+
+
+REGISTRY.add_collector(_statement_info)
+
+
+class RequestContext:
+    __slots__ = ("route", "sampled", "phases", "slow_s")
+
+    def __init__(self, route, sampled, slow_s):
+        self.route = route
+        self.sampled = sampled
+        self.phases = {}
+        self.slow_s = slow_s
+
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+_current = contextvars.ContextVar("metrics_request", default=None)
+
+
+def current():
+    """The sampled request being handled on this thread/task, or None."""
+    ctx = _current.get()
+    return ctx if ctx is not None and ctx.sampled else None
+
+
+_sample_rate = 1.0
+_slow_s = 0.5
+
+
+def configure(sample_rate=1.0, slow_ms=500):
+    """
+    sample_rate: share of requests (0-1) that also get phase and per-SQL
+    timings; 0 leaves only per-route latency. slow_ms: statements at least
+    this slow are logged and counted.
+    """
+    global _sample_rate, _slow_s
+    _sample_rate = max(0.0, min(1.0, float(sample_rate)))
+    _slow_s = float(slow_ms) / 1000
+
+
+def _finish(ctx, route, method, status, elapsed):
+    REQUEST_SECONDS.observe(elapsed, route, method, str(status))
+    if ctx.sampled:
+        accounted = 0.0
+        for phase, seconds in ctx.phases.items():
+            PHASE_SECONDS.observe(seconds, route, phase)
+            accounted += seconds
+        PHASE_SECONDS.observe(max(0.0, elapsed - accounted), route, "handler")
+
+
+def instrument(route: str, method: str):
+    """
+    Wrap an HTTP handler (sync or async): per-route latency always; for a
+    METRICS_SAMPLE_RATE share of requests also the per-phase and per-SQL
+    timings collected by TimedConnection/TimedCursor and timed().
+    """
+    def decorator(fn):
+        def begin():
+            sampled = _sample_rate >= 1.0 or random.random() < _sample_rate
+            ctx = RequestContext(route, sampled, _slow_s)
+            return ctx, _current.set(ctx), time.perf_counter()
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                ctx, token, started = begin()
+                status = 500
+                try:
+                    resp = await fn(*args, **kwargs)
+                    status = getattr(resp, "status_code", 200)
+                    return resp
+                finally:
+                    _current.reset(token)
+                    _finish(ctx, route, method, status, time.perf_counter() - started)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                ctx, token, started = begin()
+                status = 500
+                try:
+                    resp = fn(*args, **kwargs)
+                    status = getattr(resp, "status_code", 200)
+                    return resp
+                finally:
+                    _current.reset(token)
+                    _finish(ctx, route, method, status, time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class timed:
+    """`with metrics.timed("serialize"):` adds the block to the current request's phase."""
+    __slots__ = ("phase", "ctx", "started")
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.ctx = current()
+        if self.ctx is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.ctx is not None:
+            self.ctx.add(self.phase, time.perf_counter() - self.started)
+        return False
+
+
+class TimedConnection:
+    """
+    Connection proxy whose cursors are TimedCursors; everything else passes
+    through. Call flush() when the connection is handed back.
+    """
+    __slots__ = ("_conn", "_ctx", "_cursors")
+
+    def __init__(self, conn, ctx):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_ctx", ctx)
+        object.__setattr__(self, "_cursors", [])
+
+    def cursor(self):
+        cur = TimedCursor(self._conn.cursor(), self._ctx)
+        self._cursors.append(cur)
+        return cur
+
+    def flush(self):
+        for cur in self._cursors:
+            cur._flush()
+        self._cursors.clear()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+
+class TimedCursor:
+    """
+    Cursor proxy timing execute and fetch calls. A statement's numbers are
+    recorded when the next statement starts, the cursor is closed or the
+    connection is flushed, so one execute plus its fetches count as one
+    observation.
+    """
+    __slots__ = ("_cur", "_ctx", "_sql", "_spent", "_rows")
+
+    def __init__(self, cur, ctx):
+        object.__setattr__(self, "_cur", cur)
+        object.__setattr__(self, "_ctx", ctx)
+        object.__setattr__(self, "_sql", None)
+        object.__setattr__(self, "_spent", 0.0)
+        object.__setattr__(self, "_rows", 0)
+
+    def _flush(self):
+        sql = self._sql
+        if sql is None:
+            return
+        fp = fingerprint(sql)
+        route = self._ctx.route
+        SQL_SECONDS.observe(self._spent, route, fp)
+        SQL_ROWS.observe(self._rows, route, fp)
+        if self._spent >= self._ctx.slow_s:
+            SLOW_QUERIES.inc(1, route, fp)
+            logging.warning("slow sql %s on %s: %.0f ms, %d rows: %s",
+                            fp, route, self._spent * 1000, self._rows, " ".join(sql.split())[:500])
+        object.__setattr__(self, "_sql", None)
+
+    def _run(self, phase, method, *args):
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            spent = time.perf_counter() - started
+            self._ctx.add(phase, spent)
+            object.__setattr__(self, "_spent", self._spent + spent)
+
+    def execute(self, sql, *params):
+        self._flush()
+        object.__setattr__(self, "_sql", sql)
+        object.__setattr__(self, "_spent", 0.0)
+        object.__setattr__(self, "_rows", 0)
+        self._run("execute", self._cur.execute, sql, *params)
+        return self
+
+    def executemany(self, sql, seq):
+        self._flush()
+        object.__setattr__(self, "_sql", sql)
+        object.__setattr__(self, "_spent", 0.0)
+        object.__setattr__(self, "_rows", 0)
+        return self._run("execute", self._cur.executemany, sql, seq)
+
+    def _count(self, rows):
+        object.__setattr__(self, "_rows", self._rows + len(rows))
+        return rows
+
+    def fetchall(self):
+        return self._count(self._run("fetch", self._cur.fetchall))
+
+    def fetchmany(self, size=None):
+        if size is None:
+            return self._count(self._run("fetch", self._cur.fetchmany))
+        return self._count(self._run("fetch", self._cur.fetchmany, size))
+
+    def fetchone(self):
+        row = self._run("fetch", self._cur.fetchone)
+        if row is not None:
+            object.__setattr__(self, "_rows", self._rows + 1)
+        return row
+
+    def nextset(self):
+        return self._run("fetch", self._cur.nextset)
+
+    def close(self):
+        self._flush()
+        return self._cur.close()
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cur, name, value)
@@ -0,0 +1,200 @@
+import re
+import math
+import threading
+import unicodedata
+
+# Listing attributes a saved search can pin to an exact value
+MATCH_FIELDS = ("category", "size", "condition", "city")
+
+# Radius searches are also bucketed by the 1-degree grid cells their circle
+# touches; circles spanning more cells than this are only post-filtered.
+CELL_DEG = 1.0
+MAX_CELLS = 36
+EARTH_RADIUS_KM = 6371.0088
+
+
+def distance_km(lat1, lng1, lat2, lng2) -> float:
+    """Great-circle (haversine) distance."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _cell(lat, lng) -> tuple:
+    n_lng = int(round(360 / CELL_DEG))
+    return (math.floor((lat + 90) / CELL_DEG), math.floor((lng + 180) / CELL_DEG) % n_lng)
+
+
+def _cells_around(lat, lng, radius_km):
+    """Grid cells intersecting the circle's bounding box, or None if too many."""
+    dlat = radius_km / 111.32
+    cos_lat = math.cos(math.radians(lat))
+    if lat + dlat >= 90 or lat - dlat <= -90 or cos_lat < 1e-6:
+        return None
+    dlng = radius_km / (111.32 * cos_lat)
+    if dlng >= 180:
+        return None
+    lo_lat, lo_lng = _cell(lat - dlat, lng - dlng)
+    hi_lat, _ = _cell(lat + dlat, lng + dlng)
+    n_lng = int(round(360 / CELL_DEG))
+    span_lng = math.floor((lng + dlng + 180) / CELL_DEG) - math.floor((lng - dlng + 180) / CELL_DEG) + 1
+    if (hi_lat - lo_lat + 1) * span_lng > MAX_CELLS:
+        return None
+    return [(la, (lo_lng + k) % n_lng) for la in range(lo_lat, hi_lat + 1) for k in range(span_lng)]
+
+
+def search_geo(query: dict):
+    """(lat, lng, radius_km) of a radius search, or None."""
+    try:
+        lat, lng, radius = float(query["lat"]), float(query["lng"]), float(query["radiusKm"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or radius <= 0:
+        return None
+    return lat, lng, radius
+
+
+def _fold(text) -> str:
+    """Lowercase and strip accents, like the accent-insensitive full-text catalog."""
+    text = unicodedata.normalize("NFKD", str(text or "").lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def search_words(query: dict) -> tuple:
+    """Keywords of a text search; each must prefix a word of the listing's title or description."""
+    return tuple(w[:40] for w in re.findall(r"\w+", _fold(query.get("q")))[:8])
+
+
+def _norm(value):
+    if value is None:
+        return None
+    value = str(value).strip().lower()
+    return value or None
+
+
+def search_key(query: dict) -> tuple:
+    """
+    Index key of a saved search: the (field, value) pairs it constrains,
+    in MATCH_FIELDS order. A search with no constraints has key ().
+    """
+    return tuple((f, v) for f in MATCH_FIELDS if (v := _norm(query.get(f))) is not None)
+
+
+class SavedSearchIndex:
+    """
+    Inverted index over active saved searches.
+
+    Searches are bucketed by the exact set of (field, value) pairs they
+    require. A listing can only satisfy searches whose constrained fields are
+    a subset of MATCH_FIELDS, so matching is at most 2**len(MATCH_FIELDS)
+    dict lookups (only field combinations actually in use are probed) plus
+    the size of the result -- independent of how many searches exist.
+
+    Radius searches (lat/lng/radiusKm) are additionally keyed by the grid
+    cells their circle touches, so only searches near the listing are
+    candidates; candidates are then checked with the exact distance.
+    Keyword searches (q) are post-filtered on the listing's title and
+    description the same way the full-text query matches (word prefixes).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._buckets = {}    # key -> {saved_search_id: user_id}
+        self._by_id = {}      # saved_search_id -> [key, ...]
+        self._shapes = {}     # tuple of constrained fields -> number of keys
+        self._geo = {}        # saved_search_id -> (lat, lng, radius_km)
+        self._words = {}      # saved_search_id -> keywords
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def add(self, saved_search_id: str, user_id: str, query: dict):
+        sid = str(saved_search_id).lower()
+        key = search_key(query)
+        geo = search_geo(query)
+        words = search_words(query)
+        cells = _cells_around(*geo) if geo else None
+        keys = [key + (("cell", c),) for c in cells] if cells else [key]
+        with self._lock:
+            self._remove_locked(sid)
+            for k in keys:
+                self._buckets.setdefault(k, {})[sid] = str(user_id)
+                shape = tuple(f for f, _ in k)
+                self._shapes[shape] = self._shapes.get(shape, 0) + 1
+            self._by_id[sid] = keys
+            if geo:
+                self._geo[sid] = geo
+            if words:
+                self._words[sid] = words
+
+    def copy(self):
+        """An independent index with the same searches, to update off to the side and swap in."""
+        other = SavedSearchIndex()
+        with self._lock:
+            other._buckets = {k: dict(v) for k, v in self._buckets.items()}
+            other._by_id = {k: list(v) for k, v in self._by_id.items()}
+            other._shapes = dict(self._shapes)
+            other._geo = dict(self._geo)
+            other._words = dict(self._words)
+        return other
+
+    def remove(self, saved_search_id: str):
+        with self._lock:
+            self._remove_locked(str(saved_search_id).lower())
+
+    def _remove_locked(self, sid):
+        keys = self._by_id.pop(sid, None)
+        if keys is None:
+            return
+        self._geo.pop(sid, None)
+        self._words.pop(sid, None)
+        for key in keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.pop(sid, None)
+                if not bucket:
+                    del self._buckets[key]
+            shape = tuple(f for f, _ in key)
+            left = self._shapes.get(shape, 0) - 1
+            if left > 0:
+                self._shapes[shape] = left
+            else:
+                self._shapes.pop(shape, None)
+
+    def match(self, listing: dict) -> list:
+        """[(saved_search_id, user_id)] of every search the listing satisfies."""
+        values = {f: _norm(listing.get(f)) for f in MATCH_FIELDS}
+        point = None
+        try:
+            point = (float(listing["latitude"]), float(listing["longitude"]))
+            values["cell"] = _cell(*point)
+        except (KeyError, TypeError, ValueError):
+            values["cell"] = None
+        listing_words = None
+        out = []
+        with self._lock:
+            for shape in self._shapes:
+                key = []
+                for f in shape:
+                    v = values[f]
+                    if v is None:
+                        break
+                    key.append((f, v))
+                else:
+                    bucket = self._buckets.get(tuple(key))
+                    if not bucket:
+                        continue
+                    for sid, uid in bucket.items():
+                        geo = self._geo.get(sid)
+                        if geo is not None and (point is None or distance_km(geo[0], geo[1], *point) > geo[2]):
+                            continue
+                        words = self._words.get(sid)
+                        if words is not None:
+                            if listing_words is None:
+                                listing_words = set(re.findall(r"\w+", _fold(
+                                    f"{listing.get('title') or ''} {listing.get('description') or ''}")))
+                            if not all(any(lw.startswith(w) for lw in listing_words) for w in words):
+                                continue
+                        out.append((sid, uid))
+        return out
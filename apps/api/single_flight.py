@@ -0,0 +1,92 @@
+import threading
+
+# Label that counts every key past max_labels
+OTHER = "_other"
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key (the
+    leader) runs fn(); callers arriving while it is in flight wait for it
+    and get the same result, or the same exception. Nothing outlives the
+    call -- this is not a cache.
+
+    Followers wait at most `wait_timeout` seconds, then run fn() themselves
+    so one slow leader can't stall everyone behind it.
+
+    Counts are kept per `label` (a low-cardinality name for the key, e.g.
+    the route and category); past `max_labels` distinct labels new ones are
+    counted under OTHER.
+    """
+
+    def __init__(self, wait_timeout=5.0, max_labels=64):
+        self.wait_timeout = float(wait_timeout)
+        self.max_labels = max(1, int(max_labels))
+        self._calls = {}             # key -> _Call in flight
+        self._lock = threading.Lock()
+        self._labels = {}            # label -> [leaders, merged, wait_timeouts]
+
+    def _count(self, label, field):
+        # Caller holds self._lock
+        counts = self._labels.get(label)
+        if counts is None:
+            if len(self._labels) >= self.max_labels:
+                label = OTHER
+            counts = self._labels.setdefault(label, [0, 0, 0])
+        counts[field] += 1
+
+    def do(self, key, fn, label=None):
+        """Returns (value, shared); `shared` is True for a follower that got the leader's value."""
+        label = OTHER if label is None else str(label)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._count(label, 0)
+
+        if not leader:
+            if call.done.wait(self.wait_timeout):
+                with self._lock:
+                    self._count(label, 1)
+                if call.error is not None:
+                    raise call.error
+                return call.value, True
+            with self._lock:
+                self._count(label, 2)
+            return fn(), False
+
+        try:
+            call.value = fn()
+            return call.value, False
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            labels = {label: {"leaders": c[0], "merged": c[1], "wait_timeouts": c[2]}
+                      for label, c in self._labels.items()}
+            in_flight = len(self._calls)
+        return {
+            "in_flight": in_flight,
+            "wait_timeout_s": self.wait_timeout,
+            "leaders": sum(c["leaders"] for c in labels.values()),
+            "merged": sum(c["merged"] for c in labels.values()),
+            "wait_timeouts": sum(c["wait_timeouts"] for c in labels.values()),
+            "keys": labels,
+        }
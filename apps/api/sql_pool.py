@@ -0,0 +1,252 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+
+class PoolTimeout(RuntimeError):
+    """Raised when no connection becomes available within max_wait seconds."""
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of DB-API connections.
+
+    - at most `max_size` connections exist at once (in use + idle)
+    - idle connections older than `idle_timeout` seconds are closed
+    - a connection idle for more than `validate_after` seconds is pinged
+      with `SELECT 1` before being handed out (0 = always validate)
+    - connections that raised a disconnect error are discarded, not reused
+    - a connection returned after an error is passed to `reset` (if given)
+      to undo session options a failed batch left set; if that fails too
+      the connection is discarded
+    - callers wait at most `max_wait` seconds for a free slot
+    """
+
+    def __init__(self, connect, max_size=10, max_wait=5.0, idle_timeout=300.0,
+                 validate_after=30.0, is_disconnect=None, reset=None, name="sql"):
+        self._connect = connect
+        self._is_disconnect = is_disconnect or (lambda exc: False)
+        self._reset = reset
+        self.name = name
+        self.max_size = max(1, int(max_size))
+        self.max_wait = float(max_wait)
+        self.idle_timeout = float(idle_timeout)
+        self.validate_after = float(validate_after)
+
+        self._lock = threading.Condition()
+        self._idle = []          # [(conn, returned_at)], most recently used last
+        self._in_use = 0
+        self._opening = 0
+
+        self._created = 0
+        self._closed = 0
+        self._broken = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # ---------- checkout / checkin ----------
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of the `with` block.
+        Commits on clean exit and rolls back on error, like pyodbc's own
+        `with connect(...)`, then returns the connection to the pool.
+        """
+        conn = self._acquire()
+        try:
+            yield conn
+        except BaseException as exc:
+            self._release(conn, broken=self._recover(conn, exc))
+            raise
+        else:
+            try:
+                conn.commit()
+            except Exception as exc:
+                self._release(conn, broken=self._recover(conn, exc))
+                raise
+            self._release(conn)
+
+    def _acquire(self):
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        waited = False
+        while True:
+            stale = []
+            conn = None
+            with self._lock:
+                while True:
+                    stale.extend(self._evict_idle_locked())
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._in_use + self._opening < self.max_size:
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        self._record_wait_locked(time.monotonic() - started)
+                        self._close_all(stale)
+                        raise PoolTimeout(
+                            f"{self.name} pool exhausted: {self.max_size} connections in use "
+                            f"after waiting {self.max_wait:.1f}s"
+                        )
+                    waited = True
+                    self._lock.wait(remaining)
+                if waited:
+                    self._record_wait_locked(time.monotonic() - started)
+            self._close_all(stale)
+
+            if conn is None:
+                return self._open()
+            if self._validate(conn, returned_at):
+                with self._lock:
+                    self._checkouts += 1
+                return conn
+            # Dead connection: drop it and try again (a free slot now exists)
+            self._discard(conn)
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except BaseException:
+            with self._lock:
+                self._opening -= 1
+                self._lock.notify()
+            raise
+        with self._lock:
+            self._opening -= 1
+            self._in_use += 1
+            self._created += 1
+            self._checkouts += 1
+        return conn
+
+    def _validate(self, conn, returned_at):
+        if time.monotonic() - returned_at < self.validate_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchall()
+            cur.close()
+            return True
+        except Exception:
+            logging.warning("%s pool: discarding connection that failed validation", self.name)
+            return False
+
+    def _rollback(self, conn):
+        """Roll back any open transaction; returns True if the connection is unusable."""
+        try:
+            conn.rollback()
+            return False
+        except Exception:
+            return True
+
+    def _recover(self, conn, exc):
+        """Roll back and reset after an error; returns True if the connection is unusable."""
+        if self._rollback(conn) or self._is_disconnect(exc):
+            return True
+        if self._reset is None:
+            return False
+        try:
+            self._reset(conn)
+            return False
+        except Exception:
+            logging.warning("%s pool: discarding connection that failed its session reset", self.name)
+            return True
+
+    def _release(self, conn, broken=False):
+        if broken:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._in_use -= 1
+            self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def _discard(self, conn):
+        with self._lock:
+            self._in_use -= 1
+            self._broken += 1
+            self._lock.notify()
+        self._close_all([conn])
+
+    # ---------- maintenance ----------
+    def _evict_idle_locked(self):
+        if not self._idle or self.idle_timeout <= 0:
+            return []
+        cutoff = time.monotonic() - self.idle_timeout
+        # _idle is ordered by return time, oldest first
+        keep_from = 0
+        while keep_from < len(self._idle) and self._idle[keep_from][1] < cutoff:
+            keep_from += 1
+        stale = [c for c, _ in self._idle[:keep_from]]
+        del self._idle[:keep_from]
+        return stale
+
+    def _close_all(self, conns):
+        for c in conns:
+            try:
+                c.close()
+            except Exception:
+                pass
+        if conns:
+            with self._lock:
+                self._closed += len(conns)
+
+    def _record_wait_locked(self, seconds):
+        self._waits += 1
+        self._wait_total += seconds
+        self._wait_max = max(self._wait_max, seconds)
+
+    def prewarm(self, count=1):
+        """
+        Top the pool up to `count` idle connections ahead of traffic; safe to
+        call repeatedly (e.g. from a timer). Returns how many were opened.
+        """
+        opened = []
+        try:
+            for _ in range(max(0, count)):
+                with self._lock:
+                    if len(self._idle) + len(opened) >= count:
+                        break
+                    if self._in_use + self._opening + len(self._idle) >= self.max_size:
+                        break
+                    self._opening += 1
+                opened.append(self._open())
+        finally:
+            for c in opened:
+                self._release(c)
+        return len(opened)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = [c for c, _ in self._idle], []
+        self._close_all(idle)
+
+    def stats(self):
+        with self._lock:
+            stale = self._evict_idle_locked()
+            data = {
+                "name": self.name,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "opening": self._opening,
+                "created": self._created,
+                "closed": self._closed,
+                "discarded_broken": self._broken,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_timeouts": self._timeouts,
+                "wait_total_ms": round(self._wait_total * 1000, 3),
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+                "wait_avg_ms": round(self._wait_total * 1000 / self._waits, 3) if self._waits else 0.0,
+            }
+        self._close_all(stale)
+        return data
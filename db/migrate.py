@@ -0,0 +1,206 @@
+"""
+Apply the db/migrations/NNNN_name.sql scripts in order, once each.
+
+Applied versions are recorded in dbo.schema_version (version, name,
+checksum, applied_at, duration_ms) in the target database. Each run
+applies only the scripts numbered above what is recorded, batch by batch
+(split on GO lines), in autocommit mode: some DDL (full-text catalogs
+and indexes) can't run in a transaction. A version is
+recorded only after all its batches succeed, and every script guards its
+changes (IF OBJECT_ID ... IS NULL, IF NOT EXISTS ... sys.indexes), so a
+run that stops halfway just reruns the failed script next time.
+
+A recorded script whose file has changed since is reported and stops the
+run; new changes go in a new migration. --accept-changed re-records the
+current checksums instead.
+
+A database set up from the old hand-run scripts already has those
+changes: `--baseline 17` records 0001-0017 as applied without running
+them.
+
+Connects with SQL_MIGRATE_CONN_STR, or SQL_CONN_STR, then creates the
+--database if it is missing and switches to it; scripts never name a
+database, so the same migrations build any number of databases on one
+server (e.g. the primary and replica of bench/read_routing_check.py).
+A batch with a USE statement is refused.
+
+    python db/migrate.py --status
+    python db/migrate.py
+    python db/migrate.py --baseline 17
+"""
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+
+import pyodbc
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+FILE_RE = re.compile(r"^(\d{4})_([a-z0-9_]+)\.sql$")
+GO_RE = re.compile(r"^\s*GO\s*;?\s*$", re.IGNORECASE | re.MULTILINE)
+USE_RE = re.compile(r"^\s*USE\s", re.IGNORECASE | re.MULTILINE)
+
+
+class Migration:
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, "rb") as f:
+            raw = f.read().replace(b"\r\n", b"\n")
+        self.checksum = hashlib.sha256(raw).hexdigest()
+        try:
+            self.text = raw.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            # The oldest scripts were saved as Windows-1252
+            self.text = raw.decode("cp1252")
+
+    def batches(self):
+        batches = [b for b in GO_RE.split(self.text) if b.strip()]
+        for i, batch in enumerate(batches, 1):
+            if USE_RE.search(batch):
+                # The runner selects the target; a USE would send the
+                # schema to another database than the one recorded
+                raise SystemExit(f"{self.version:04d}_{self.name}: batch {i} switches database with USE")
+        return batches
+
+
+def load_migrations():
+    found = []
+    for entry in sorted(os.listdir(MIGRATIONS_DIR)):
+        if not entry.endswith(".sql"):
+            continue
+        m = FILE_RE.match(entry)
+        if not m:
+            raise SystemExit(f"{entry}: migration files are named NNNN_lower_snake_name.sql")
+        found.append(Migration(int(m.group(1)), m.group(2), os.path.join(MIGRATIONS_DIR, entry)))
+    versions = [m.version for m in found]
+    if len(set(versions)) != len(versions):
+        raise SystemExit("two migrations share a version number")
+    return found
+
+
+def connect(database):
+    conn_str = os.getenv("SQL_MIGRATE_CONN_STR") or os.getenv("SQL_CONN_STR")
+    if not conn_str:
+        raise SystemExit("Missing SQL_MIGRATE_CONN_STR / SQL_CONN_STR")
+    conn = pyodbc.connect(conn_str, autocommit=True)
+    cur = conn.cursor()
+    cur.execute("SELECT DB_ID(?)", database)
+    if cur.fetchone()[0] is None:
+        cur.execute(f"CREATE DATABASE [{database}]")
+    cur.execute(f"USE [{database}]")
+    cur.execute("""
+      IF OBJECT_ID('dbo.schema_version','U') IS NULL
+        CREATE TABLE dbo.schema_version (
+          version     INT NOT NULL CONSTRAINT PK_schema_version PRIMARY KEY,
+          name        NVARCHAR(200) NOT NULL,
+          checksum    CHAR(64) NOT NULL,
+          applied_at  DATETIME2 NOT NULL CONSTRAINT DF_schema_version_applied DEFAULT SYSUTCDATETIME(),
+          duration_ms INT NOT NULL
+        );
+    """)
+    return conn
+
+
+def applied_versions(cur):
+    cur.execute("SELECT version, name, checksum FROM dbo.schema_version")
+    return {r[0]: (r[1], r[2]) for r in cur.fetchall()}
+
+
+def drain(cur):
+    # Scripts end with check SELECTs; walking every result also surfaces
+    # errors raised late in a batch
+    while True:
+        if cur.description is not None:
+            cur.fetchall()
+        if not cur.nextset():
+            return
+
+
+def apply(conn, migration):
+    cur = conn.cursor()
+    started = time.perf_counter()
+    for i, batch in enumerate(migration.batches(), 1):
+        try:
+            cur.execute(batch)
+            drain(cur)
+        except pyodbc.Error as e:
+            raise SystemExit(f"{migration.version:04d}_{migration.name}: batch {i} failed: {e}")
+    cur.execute("INSERT INTO dbo.schema_version (version, name, checksum, duration_ms) VALUES (?, ?, ?, ?)",
+                migration.version, migration.name, migration.checksum,
+                int((time.perf_counter() - started) * 1000))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--database", default="KidToKid")
+    ap.add_argument("--status", action="store_true", help="list applied, changed and pending migrations and exit")
+    ap.add_argument("--target", type=int, help="stop after this version")
+    ap.add_argument("--baseline", type=int, metavar="VERSION",
+                    help="record migrations up to VERSION as applied without running them")
+    ap.add_argument("--accept-changed", action="store_true",
+                    help="re-record the checksum of applied migrations whose file changed")
+    args = ap.parse_args()
+
+    migrations = load_migrations()
+    conn = connect(args.database)
+    cur = conn.cursor()
+    applied = applied_versions(cur)
+
+    changed = [m for m in migrations if m.version in applied and applied[m.version][1] != m.checksum]
+    missing = sorted(v for v in applied if v not in {m.version for m in migrations})
+    pending = [m for m in migrations if m.version not in applied
+               and (args.target is None or m.version <= args.target)]
+
+    if args.status:
+        print(json.dumps({
+            "database": args.database,
+            "applied": sorted(applied),
+            "changed": [f"{m.version:04d}_{m.name}" for m in changed],
+            "missing_files": missing,
+            "pending": [f"{m.version:04d}_{m.name}" for m in pending],
+        }, indent=2))
+        return 1 if changed or missing else 0
+
+    if changed:
+        if not args.accept_changed:
+            names = ", ".join(f"{m.version:04d}_{m.name}" for m in changed)
+            raise SystemExit(f"applied migrations changed on disk: {names} "
+                             "(add a new migration, or pass --accept-changed)")
+        for m in changed:
+            cur.execute("UPDATE dbo.schema_version SET checksum = ? WHERE version = ?", m.checksum, m.version)
+            print(f"re-recorded {m.version:04d}_{m.name}", file=sys.stderr)
+
+    if args.baseline is not None:
+        for m in pending:
+            if m.version <= args.baseline:
+                cur.execute("INSERT INTO dbo.schema_version (version, name, checksum, duration_ms) "
+                            "VALUES (?, ?, ?, 0)", m.version, m.name, m.checksum)
+                print(f"baselined {m.version:04d}_{m.name}", file=sys.stderr)
+        pending = [m for m in pending if m.version > args.baseline]
+
+    latest = max(applied, default=0)
+    late = [m for m in pending if m.version < latest]
+    if late:
+        # Numbered below something already applied (e.g. merged from a branch);
+        # scripts are idempotent, so applying them out of order is allowed
+        print(f"applying out of order: {', '.join(f'{m.version:04d}_{m.name}' for m in late)}",
+              file=sys.stderr)
+
+    for m in pending:
+        started = time.perf_counter()
+        apply(conn, m)
+        print(f"applied {m.version:04d}_{m.name} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    cur = conn.cursor()
+    cur.execute("SELECT ISNULL(MAX(version), 0) FROM dbo.schema_version")
+    print(json.dumps({"database": args.database, "version": cur.fetchone()[0], "applied_now": len(pending)}))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,4 @@
--- 1) Create DB (if not exists)
-IF DB_ID('KidToKid') IS NULL
-BEGIN
-  CREATE DATABASE KidToKid;
-END
-GO
-USE KidToKid;
-GO
-
--- 2) Core table: listing
+-- 1) Core table: listing
 IF OBJECT_ID('dbo.listing','U') IS NULL
 BEGIN
   CREATE TABLE dbo.listing (
@@ -30,7 +21,7 @@ BEGIN
 END
 GO
 
--- 3) Optional images table (safe to add now)
+-- 2) Optional images table (safe to add now)
 IF OBJECT_ID('dbo.listing_image','U') IS NULL
 BEGIN
   CREATE TABLE dbo.listing_image (
@@ -44,7 +35,8 @@ BEGIN
 END
 GO
 
--- 4) Seed a few listings
+-- 3) Seed a few listings (fresh database only)
+IF NOT EXISTS (SELECT 1 FROM dbo.listing)
 INSERT INTO dbo.listing (title, category, size, [condition], price_cents, city, country)
 VALUES
 (N'Winter Jacket 34y', N'clothes', N'3-4y', N'good', 1500, N'Lisbon', N'Portugal'),
@@ -53,7 +45,7 @@ VALUES
 (N'Boots 2436m',       N'clothes', N'24-36m', N'fair',  500,   N'Faro',   N'Portugal');
 GO
 
--- 5) Check
+-- 4) Check
 SELECT TOP 10 listing_id, title, price_cents, city, is_active, created_at
 FROM dbo.listing
 ORDER BY created_at DESC;
@@ -1,6 +1,3 @@
-USE KidToKid;
-GO
-
 -- Buyer table (dev-only, simple)
 IF OBJECT_ID('dbo.app_user','U') IS NULL
 BEGIN
@@ -1,6 +1,3 @@
-USE KidToKid;
-GO
-
 -- Favorites (many-to-many: user ↔ listing)
 IF OBJECT_ID('dbo.favorite','U') IS NULL
 BEGIN
@@ -1,6 +1,3 @@
-USE KidToKid;
-GO
-
 -- Deliveries
 IF OBJECT_ID('dbo.delivery','U') IS NULL
 BEGIN
@@ -0,0 +1,16 @@
+-- Keyset pagination for GET /listings and saved-search runs:
+-- ORDER BY created_at DESC, listing_id DESC over active listings only.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_listing_active_created' AND object_id = OBJECT_ID('dbo.listing'))
+  CREATE NONCLUSTERED INDEX IX_listing_active_created
+    ON dbo.listing (created_at DESC, listing_id DESC)
+    INCLUDE (title, price_cents, city, category, size, [condition])
+    WHERE is_active = 1;
+GO
+
+-- Same feed scoped to one category (Categories page)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_listing_active_category_created' AND object_id = OBJECT_ID('dbo.listing'))
+  CREATE NONCLUSTERED INDEX IX_listing_active_category_created
+    ON dbo.listing (category, created_at DESC, listing_id DESC)
+    INCLUDE (title, price_cents, city, size, [condition])
+    WHERE is_active = 1;
+GO
@@ -0,0 +1,52 @@
+-- Denormalized cover image: the first image by (sort_order, blob_url),
+-- maintained by POST /listings/{id}/images so feed reads need no per-row lookup.
+IF COL_LENGTH('dbo.listing', 'cover_image_url') IS NULL
+  ALTER TABLE dbo.listing ADD cover_image_url NVARCHAR(500) NULL;
+GO
+
+-- Gallery / cover lookups by listing
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_listing_image_listing' AND object_id = OBJECT_ID('dbo.listing_image'))
+  CREATE NONCLUSTERED INDEX IX_listing_image_listing
+    ON dbo.listing_image (listing_id, sort_order)
+    INCLUDE (blob_url);
+GO
+
+-- Backfill
+UPDATE l
+   SET cover_image_url = ci.blob_url
+FROM dbo.listing l
+CROSS APPLY (
+  SELECT TOP 1 li.blob_url
+  FROM dbo.listing_image li
+  WHERE li.listing_id = l.listing_id
+  ORDER BY li.sort_order, li.blob_url
+) ci
+WHERE l.cover_image_url IS NULL;
+GO
+
+-- Make the feed indexes covering again now that cards read cover_image_url
+IF NOT EXISTS (
+  SELECT 1 FROM sys.index_columns ic
+  JOIN sys.indexes i ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+  WHERE i.name = 'IX_listing_active_created' AND i.object_id = OBJECT_ID('dbo.listing')
+    AND ic.column_id = COLUMNPROPERTY(OBJECT_ID('dbo.listing'), 'cover_image_url', 'ColumnId')
+)
+  CREATE NONCLUSTERED INDEX IX_listing_active_created
+    ON dbo.listing (created_at DESC, listing_id DESC)
+    INCLUDE (title, price_cents, city, category, size, [condition], cover_image_url)
+    WHERE is_active = 1
+    WITH (DROP_EXISTING = ON);
+GO
+
+IF NOT EXISTS (
+  SELECT 1 FROM sys.index_columns ic
+  JOIN sys.indexes i ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+  WHERE i.name = 'IX_listing_active_category_created' AND i.object_id = OBJECT_ID('dbo.listing')
+    AND ic.column_id = COLUMNPROPERTY(OBJECT_ID('dbo.listing'), 'cover_image_url', 'ColumnId')
+)
+  CREATE NONCLUSTERED INDEX IX_listing_active_category_created
+    ON dbo.listing (category, created_at DESC, listing_id DESC)
+    INCLUDE (title, price_cents, city, size, [condition], cover_image_url)
+    WHERE is_active = 1
+    WITH (DROP_EXISTING = ON);
+GO
@@ -0,0 +1,27 @@
+-- New listings matched against active saved searches (one row per search x listing)
+IF OBJECT_ID('dbo.saved_search_match','U') IS NULL
+BEGIN
+  CREATE TABLE dbo.saved_search_match (
+    saved_search_id UNIQUEIDENTIFIER NOT NULL,
+    listing_id      UNIQUEIDENTIFIER NOT NULL,
+    user_id         UNIQUEIDENTIFIER NOT NULL,   -- owner of the saved search
+    matched_at      DATETIME2 NOT NULL DEFAULT SYSUTCDATETIME(),
+    CONSTRAINT PK_saved_search_match PRIMARY KEY (saved_search_id, listing_id)
+  );
+END
+GO
+
+-- Per-user notification feed, newest first
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_saved_search_match_user' AND object_id = OBJECT_ID('dbo.saved_search_match'))
+  CREATE NONCLUSTERED INDEX IX_saved_search_match_user
+    ON dbo.saved_search_match (user_id, matched_at DESC)
+    INCLUDE (listing_id);
+GO
+
+-- Index (re)loads read only active searches
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_saved_search_active_created' AND object_id = OBJECT_ID('dbo.saved_search'))
+  CREATE NONCLUSTERED INDEX IX_saved_search_active_created
+    ON dbo.saved_search (created_at)
+    INCLUDE (user_id, query_json)
+    WHERE is_active = 1;
+GO
@@ -0,0 +1,21 @@
+-- Pickup location as a geography point (SRID 4326), derived from latitude/longitude.
+-- POST /listings writes both; radius filters and distance sort use this column.
+IF COL_LENGTH('dbo.listing', 'geo_point') IS NULL
+  ALTER TABLE dbo.listing ADD geo_point GEOGRAPHY NULL;
+GO
+
+-- Backfill rows that already have coordinates
+UPDATE dbo.listing
+   SET geo_point = geography::Point(latitude, longitude, 4326)
+WHERE geo_point IS NULL
+  AND latitude IS NOT NULL
+  AND longitude IS NOT NULL;
+GO
+
+-- Spatial index so "within R km" is a seek over nearby grid cells, not a
+-- distance computation for every row
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'SIX_listing_geo_point' AND object_id = OBJECT_ID('dbo.listing'))
+  CREATE SPATIAL INDEX SIX_listing_geo_point
+    ON dbo.listing (geo_point)
+    USING GEOGRAPHY_AUTO_GRID;
+GO
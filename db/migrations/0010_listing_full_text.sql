@@ -0,0 +1,21 @@
+-- Keyword search (GET /listings?q=) over title and description.
+-- Accent-insensitive so "bebe" finds "bébé"; needs Full-Text Search installed.
+IF NOT EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = 'ftc_listing')
+  CREATE FULLTEXT CATALOG ftc_listing WITH ACCENT_SENSITIVITY = OFF;
+GO
+
+-- LANGUAGE 0 (neutral) word breaker: listings are written in Portuguese,
+-- French and English, so split on word boundaries without language-specific
+-- stemming. No stoplist, so short words like "lit" or "bed" stay searchable.
+-- CHANGE_TRACKING AUTO keeps the index current as listings are written.
+IF NOT EXISTS (SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('dbo.listing'))
+  CREATE FULLTEXT INDEX ON dbo.listing (title LANGUAGE 0, description LANGUAGE 0)
+    KEY INDEX PK_listing ON ftc_listing
+    WITH CHANGE_TRACKING = AUTO, STOPLIST = OFF;
+GO
+
+-- Smoke test: prefix match with ranking
+SELECT TOP 10 l.listing_id, l.title, ft.RANK
+FROM CONTAINSTABLE(dbo.listing, (title, description), '"pouss*"', LANGUAGE 0) ft
+JOIN dbo.listing l ON l.listing_id = ft.[KEY]
+ORDER BY ft.RANK DESC;
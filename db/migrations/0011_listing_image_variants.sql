@@ -0,0 +1,78 @@
+-- Blob name of each uploaded photo (POST /listings/{id}/images stores the
+-- blobName from upload-urls); variants are keyed by it.
+IF COL_LENGTH('dbo.listing_image', 'blob_name') IS NULL
+  ALTER TABLE dbo.listing_image ADD blob_name NVARCHAR(400) NULL;
+GO
+
+-- Backfill from the public URL: https://<account>.blob.core.windows.net/<container>/<blob name>
+UPDATE dbo.listing_image
+   SET blob_name = SUBSTRING(blob_url,
+                             CHARINDEX('/', blob_url, CHARINDEX('/', blob_url, CHARINDEX('//', blob_url) + 2) + 1) + 1,
+                             400)
+WHERE blob_name IS NULL
+  AND blob_url LIKE 'https://%.blob.core.windows.net/%/%';
+GO
+
+-- Resized, EXIF-free copies written by the make_image_variants blob trigger.
+-- One row per (source blob, format, width); the trigger upserts, so
+-- reprocessing a blob is idempotent. Rows can arrive before the image is
+-- committed to a listing, hence the blob-name key rather than image_id.
+IF OBJECT_ID('dbo.listing_image_variant', 'U') IS NULL
+BEGIN
+  CREATE TABLE dbo.listing_image_variant (
+    blob_name  NVARCHAR(400) NOT NULL,
+    format     VARCHAR(8)    NOT NULL,
+    width      INT           NOT NULL,
+    height     INT           NOT NULL,
+    blob_url   NVARCHAR(500) NOT NULL,
+    bytes      INT           NOT NULL,
+    created_at DATETIME2     NOT NULL CONSTRAINT DF_listing_image_variant_created DEFAULT SYSUTCDATETIME(),
+    CONSTRAINT PK_listing_image_variant PRIMARY KEY (blob_name, format, width)
+  );
+END
+GO
+
+-- Cover blob name next to cover_image_url, so feed cards find the cover's
+-- variants with one PK seek each
+IF COL_LENGTH('dbo.listing', 'cover_blob_name') IS NULL
+  ALTER TABLE dbo.listing ADD cover_blob_name NVARCHAR(400) NULL;
+GO
+
+UPDATE l
+   SET cover_blob_name = ci.blob_name
+FROM dbo.listing l
+CROSS APPLY (
+  SELECT TOP 1 li.blob_name
+  FROM dbo.listing_image li
+  WHERE li.listing_id = l.listing_id
+  ORDER BY li.sort_order, li.blob_url
+) ci
+WHERE l.cover_blob_name IS NULL;
+GO
+
+-- Keep the feed indexes covering
+IF NOT EXISTS (
+  SELECT 1 FROM sys.index_columns ic
+  JOIN sys.indexes i ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+  WHERE i.name = 'IX_listing_active_created' AND i.object_id = OBJECT_ID('dbo.listing')
+    AND ic.column_id = COLUMNPROPERTY(OBJECT_ID('dbo.listing'), 'cover_blob_name', 'ColumnId')
+)
+  CREATE NONCLUSTERED INDEX IX_listing_active_created
+    ON dbo.listing (created_at DESC, listing_id DESC)
+    INCLUDE (title, price_cents, city, category, size, [condition], cover_image_url, cover_blob_name)
+    WHERE is_active = 1
+    WITH (DROP_EXISTING = ON);
+GO
+
+IF NOT EXISTS (
+  SELECT 1 FROM sys.index_columns ic
+  JOIN sys.indexes i ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+  WHERE i.name = 'IX_listing_active_category_created' AND i.object_id = OBJECT_ID('dbo.listing')
+    AND ic.column_id = COLUMNPROPERTY(OBJECT_ID('dbo.listing'), 'cover_blob_name', 'ColumnId')
+)
+  CREATE NONCLUSTERED INDEX IX_listing_active_category_created
+    ON dbo.listing (category, created_at DESC, listing_id DESC)
+    INCLUDE (title, price_cents, city, size, [condition], cover_image_url, cover_blob_name)
+    WHERE is_active = 1
+    WITH (DROP_EXISTING = ON);
+GO
@@ -0,0 +1,33 @@
+-- GET /deliveries browses newest first, optionally by status or deliverer,
+-- with keyset pagination on (created_at, delivery_id)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_created' AND object_id = OBJECT_ID('dbo.delivery'))
+  CREATE NONCLUSTERED INDEX IX_delivery_created
+    ON dbo.delivery (created_at DESC, delivery_id DESC)
+    INCLUDE (order_id, deliverer_id, status, updated_at);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_status_created' AND object_id = OBJECT_ID('dbo.delivery'))
+  CREATE NONCLUSTERED INDEX IX_delivery_status_created
+    ON dbo.delivery (status, created_at DESC, delivery_id DESC)
+    INCLUDE (order_id, deliverer_id, updated_at);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_deliverer_created' AND object_id = OBJECT_ID('dbo.delivery'))
+  CREATE NONCLUSTERED INDEX IX_delivery_deliverer_created
+    ON dbo.delivery (deliverer_id, created_at DESC, delivery_id DESC)
+    INCLUDE (order_id, status, updated_at);
+GO
+
+-- Incremental sync (updated_since) walks changes in (updated_at, delivery_id)
+-- order; updated_at is maintained by tr_delivery_updated
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_updated' AND object_id = OBJECT_ID('dbo.delivery'))
+  CREATE NONCLUSTERED INDEX IX_delivery_updated
+    ON dbo.delivery (updated_at, delivery_id)
+    INCLUDE (order_id, deliverer_id, status, created_at);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_deliverer_updated' AND object_id = OBJECT_ID('dbo.delivery'))
+  CREATE NONCLUSTERED INDEX IX_delivery_deliverer_updated
+    ON dbo.delivery (deliverer_id, updated_at, delivery_id)
+    INCLUDE (order_id, status, created_at);
+GO
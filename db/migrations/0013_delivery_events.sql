@@ -0,0 +1,37 @@
+-- Append-only log of delivery status changes, read by GET /deliveries/changes.
+-- Written in the same statement as the change itself (OUTPUT ... INTO from
+-- checkout and update_delivery_status), so an event exists iff the change
+-- committed. event_id is the feed's version token. No foreign keys: OUTPUT
+-- INTO can't target a table that has them, and the log outlives its rows.
+IF OBJECT_ID('dbo.delivery_event', 'U') IS NULL
+BEGIN
+  CREATE TABLE dbo.delivery_event (
+    event_id     BIGINT IDENTITY(1,1) NOT NULL CONSTRAINT PK_delivery_event PRIMARY KEY,
+    delivery_id  UNIQUEIDENTIFIER NOT NULL,
+    order_id     UNIQUEIDENTIFIER NOT NULL,
+    deliverer_id UNIQUEIDENTIFIER NULL,
+    status       NVARCHAR(20)  NOT NULL,
+    comment      NVARCHAR(500) NULL,
+    created_at   DATETIME2     NOT NULL CONSTRAINT DF_delivery_event_created DEFAULT SYSUTCDATETIME()
+  );
+END
+GO
+
+-- Catch-up reads for one order or one deliverer
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_event_order' AND object_id = OBJECT_ID('dbo.delivery_event'))
+  CREATE NONCLUSTERED INDEX IX_delivery_event_order
+    ON dbo.delivery_event (order_id, event_id);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_event_deliverer' AND object_id = OBJECT_ID('dbo.delivery_event'))
+  CREATE NONCLUSTERED INDEX IX_delivery_event_deliverer
+    ON dbo.delivery_event (deliverer_id, event_id);
+GO
+
+-- Seed the log with the current state of existing deliveries
+IF NOT EXISTS (SELECT 1 FROM dbo.delivery_event)
+  INSERT INTO dbo.delivery_event (delivery_id, order_id, deliverer_id, status, comment, created_at)
+  SELECT delivery_id, order_id, deliverer_id, status, required_comment, updated_at
+  FROM dbo.delivery
+  ORDER BY updated_at;
+GO
@@ -0,0 +1,7 @@
+-- Table type for passing a set of listing ids as one table-valued parameter:
+-- basket:batch / favorites:batch and the withState lookup on GET /listings.
+IF TYPE_ID('dbo.listing_id_list') IS NULL
+  CREATE TYPE dbo.listing_id_list AS TABLE (
+    listing_id UNIQUEIDENTIFIER NOT NULL PRIMARY KEY
+  );
+GO
@@ -0,0 +1,27 @@
+-- ROWVERSION columns: every insert/update stamps the row with a database-wide
+-- increasing value. GET /basket, /favorites and /saved-searches build their
+-- ETag from COUNT(*) + MAX(row_version) over the buyer's rows (and the joined
+-- listings), so an unchanged list is answered with 304 without reading it.
+-- Adding the column to dbo.listing rewrites the table; run off-peak.
+IF COL_LENGTH('dbo.listing', 'row_version') IS NULL
+  ALTER TABLE dbo.listing ADD row_version ROWVERSION;
+GO
+
+IF COL_LENGTH('dbo.basket_item', 'row_version') IS NULL
+  ALTER TABLE dbo.basket_item ADD row_version ROWVERSION;
+GO
+
+IF COL_LENGTH('dbo.favorite', 'row_version') IS NULL
+  ALTER TABLE dbo.favorite ADD row_version ROWVERSION;
+GO
+
+IF COL_LENGTH('dbo.saved_search', 'row_version') IS NULL
+  ALTER TABLE dbo.saved_search ADD row_version ROWVERSION;
+GO
+
+-- Saved searches per buyer (list + version lookup)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_saved_search_user' AND object_id = OBJECT_ID('dbo.saved_search'))
+  CREATE NONCLUSTERED INDEX IX_saved_search_user
+    ON dbo.saved_search (user_id, created_at DESC)
+    INCLUDE (row_version, is_active);
+GO
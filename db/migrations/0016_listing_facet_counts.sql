@@ -0,0 +1,31 @@
+-- Active-listing counts per (category, size, condition, city), read by
+-- GET /listings/facets. As an indexed view it is maintained by SQL Server in
+-- the same transaction as every listing insert/update (create, import,
+-- checkout, ...), so facet reads sum a few thousand summary rows instead of
+-- grouping dbo.listing. Writers need the default ANSI SET options (ODBC
+-- connections have them).
+SET ANSI_NULLS ON;
+SET QUOTED_IDENTIFIER ON;
+GO
+
+IF OBJECT_ID('dbo.listing_facet_count', 'V') IS NULL
+EXEC('CREATE VIEW dbo.listing_facet_count
+WITH SCHEMABINDING
+AS
+SELECT category, size, [condition], city, COUNT_BIG(*) AS n
+FROM dbo.listing
+WHERE is_active = 1
+GROUP BY category, size, [condition], city');
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'CIX_listing_facet_count' AND object_id = OBJECT_ID('dbo.listing_facet_count'))
+  CREATE UNIQUE CLUSTERED INDEX CIX_listing_facet_count
+    ON dbo.listing_facet_count (category, size, [condition], city);
+GO
+
+-- Smoke test
+SELECT category, SUM(n) AS listings
+FROM dbo.listing_facet_count WITH (NOEXPAND)
+GROUP BY category
+ORDER BY listings DESC;
+GO
@@ -0,0 +1,113 @@
+-- Cold storage for sold and long-inactive listings, filled in small batches
+-- by the archive_listings timer. Same columns as the hot tables (minus
+-- row_version) plus when and why the row was moved.
+IF OBJECT_ID('dbo.listing_archive','U') IS NULL
+BEGIN
+  CREATE TABLE dbo.listing_archive (
+    listing_id      UNIQUEIDENTIFIER NOT NULL CONSTRAINT PK_listing_archive PRIMARY KEY,
+    seller_id       UNIQUEIDENTIFIER NULL,
+    title           NVARCHAR(200) NOT NULL,
+    description     NVARCHAR(MAX) NULL,
+    category        NVARCHAR(50) NULL,
+    size            NVARCHAR(30) NULL,
+    condition       NVARCHAR(20) NULL,
+    price_cents     INT NULL,
+    city            NVARCHAR(80) NULL,
+    country         NVARCHAR(80) NULL,
+    latitude        DECIMAL(9,6) NULL,
+    longitude       DECIMAL(9,6) NULL,
+    geo_point       GEOGRAPHY NULL,
+    is_active       BIT NOT NULL,
+    created_at      DATETIME2 NOT NULL,
+    cover_image_url NVARCHAR(500) NULL,
+    cover_blob_name NVARCHAR(400) NULL,
+    archive_reason  VARCHAR(8) NOT NULL,            -- sold | stale
+    archived_at     DATETIME2 NOT NULL CONSTRAINT DF_listing_archive_archived DEFAULT SYSUTCDATETIME()
+  );
+END
+GO
+
+IF OBJECT_ID('dbo.listing_image_archive','U') IS NULL
+BEGIN
+  CREATE TABLE dbo.listing_image_archive (
+    image_id    UNIQUEIDENTIFIER NOT NULL CONSTRAINT PK_listing_image_archive PRIMARY KEY,
+    listing_id  UNIQUEIDENTIFIER NOT NULL,
+    blob_url    NVARCHAR(500) NOT NULL,
+    blob_name   NVARCHAR(400) NULL,
+    sort_order  INT NOT NULL,
+    archived_at DATETIME2 NOT NULL CONSTRAINT DF_listing_image_archive_archived DEFAULT SYSUTCDATETIME()
+  );
+END
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_listing_image_archive_listing' AND object_id = OBJECT_ID('dbo.listing_image_archive'))
+  CREATE NONCLUSTERED INDEX IX_listing_image_archive_listing
+    ON dbo.listing_image_archive (listing_id, sort_order);
+GO
+
+-- Sold listings leave dbo.listing, so order lines can no longer reference
+-- it; they resolve through dbo.listing_all instead
+DECLARE @fk SYSNAME = (
+  SELECT name FROM sys.foreign_keys
+  WHERE parent_object_id = OBJECT_ID('dbo.order_item') AND referenced_object_id = OBJECT_ID('dbo.listing'));
+IF @fk IS NOT NULL
+  EXEC('ALTER TABLE dbo.order_item DROP CONSTRAINT ' + @fk);
+GO
+
+-- Archive candidates without touching live rows: inactive listings by age,
+-- and "was this sold, and when" per listing
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_listing_inactive_created' AND object_id = OBJECT_ID('dbo.listing'))
+  CREATE NONCLUSTERED INDEX IX_listing_inactive_created
+    ON dbo.listing (created_at)
+    WHERE is_active = 0;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_order_item_listing' AND object_id = OBJECT_ID('dbo.order_item'))
+  CREATE NONCLUSTERED INDEX IX_order_item_listing
+    ON dbo.order_item (listing_id)
+    INCLUDE (price_cents);
+GO
+
+-- Rows pointing at one listing: each archive batch removes them, and
+-- deleting a listing checks the foreign keys against them
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_favorite_listing' AND object_id = OBJECT_ID('dbo.favorite'))
+  CREATE NONCLUSTERED INDEX IX_favorite_listing
+    ON dbo.favorite (listing_id);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_basket_item_listing' AND object_id = OBJECT_ID('dbo.basket_item'))
+  CREATE NONCLUSTERED INDEX IX_basket_item_listing
+    ON dbo.basket_item (listing_id);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_saved_search_match_listing' AND object_id = OBJECT_ID('dbo.saved_search_match'))
+  CREATE NONCLUSTERED INDEX IX_saved_search_match_listing
+    ON dbo.saved_search_match (listing_id);
+GO
+
+-- Every listing, hot or archived
+CREATE OR ALTER VIEW dbo.listing_all AS
+SELECT listing_id, seller_id, title, description, category, size, condition, price_cents,
+       city, country, latitude, longitude, is_active, created_at, cover_image_url,
+       CAST(0 AS BIT) AS is_archived
+FROM dbo.listing
+UNION ALL
+SELECT listing_id, seller_id, title, description, category, size, condition, price_cents,
+       city, country, latitude, longitude, is_active, created_at, cover_image_url,
+       CAST(1 AS BIT) AS is_archived
+FROM dbo.listing_archive;
+GO
+
+-- Order history: each order line with its listing wherever it lives now
+CREATE OR ALTER VIEW dbo.order_item_detail AS
+SELECT oi.order_id, o.buyer_id, o.created_at AS ordered_at, oi.listing_id, oi.price_cents,
+       l.title, l.category, l.size, l.condition, l.city, l.cover_image_url, l.is_archived
+FROM dbo.order_item oi
+JOIN dbo.[order] o ON o.order_id = oi.order_id
+LEFT JOIN dbo.listing_all l ON l.listing_id = oi.listing_id;
+GO
+
+-- Check
+SELECT archive_reason, COUNT(*) AS listings, MAX(archived_at) AS last_archived
+FROM dbo.listing_archive
+GROUP BY archive_reason;
@@ -0,0 +1,32 @@
+-- Access paths of the API queries not yet covered by an index. The feed's
+-- (is_active, category, created_at) and listing_image (listing_id,
+-- sort_order) paths already have filtered/covering indexes (0006, 0007,
+-- 0011), and the by-listing indexes the archival batch deletes through come
+-- with it (0017); bench/plan_check.py fails when a query falls back to a scan.
+
+-- GET /favorites: one buyer's favorites, newest first, plus its version lookup
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_favorite_user_created' AND object_id = OBJECT_ID('dbo.favorite'))
+  CREATE NONCLUSTERED INDEX IX_favorite_user_created
+    ON dbo.favorite (user_id, created_at DESC)
+    INCLUDE (row_version);
+GO
+
+-- Order history (dbo.order_item_detail) by buyer, newest first
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_order_buyer_created' AND object_id = OBJECT_ID('dbo.[order]'))
+  CREATE NONCLUSTERED INDEX IX_order_buyer_created
+    ON dbo.[order] (buyer_id, created_at DESC)
+    INCLUDE (total_cents, status);
+GO
+
+-- POST /listings/{id}/images recomputes the cover from blob_url and blob_name
+IF NOT EXISTS (
+  SELECT 1 FROM sys.index_columns ic
+  JOIN sys.indexes i ON i.object_id = ic.object_id AND i.index_id = ic.index_id
+  WHERE i.name = 'IX_listing_image_listing' AND i.object_id = OBJECT_ID('dbo.listing_image')
+    AND ic.column_id = COLUMNPROPERTY(OBJECT_ID('dbo.listing_image'), 'blob_name', 'ColumnId')
+)
+  CREATE NONCLUSTERED INDEX IX_listing_image_listing
+    ON dbo.listing_image (listing_id, sort_order)
+    INCLUDE (blob_url, blob_name)
+    WITH (DROP_EXISTING = ON);
+GO
@@ -0,0 +1,12 @@
+-- GET /listings/facets now counts from one GROUP BY over the
+-- IX_listing_active_created filtered index, cached per worker. The indexed
+-- view from 0016 was maintained inside every listing write, so concurrent
+-- checkouts and imports in one (category, size, condition, city) all
+-- locked the same aggregate row.
+IF OBJECT_ID('dbo.listing_facet_count', 'V') IS NOT NULL
+  DROP VIEW dbo.listing_facet_count;
+GO
+
+-- Check
+SELECT OBJECT_ID('dbo.listing_facet_count', 'V') AS facet_view_left;
+GO
@@ -0,0 +1,7 @@
+-- The saved-search alert index syncs incrementally by row_version
+-- (row_version >= last watermark AND < MIN_ACTIVE_ROWVERSION()), which
+-- also catches searches switched off or edited, not just new ones.
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_saved_search_row_version' AND object_id = OBJECT_ID('dbo.saved_search'))
+  CREATE NONCLUSTERED INDEX IX_saved_search_row_version
+    ON dbo.saved_search (row_version);
+GO
@@ -0,0 +1,32 @@
+-- GET /deliveries/changes resumes from a delivery_event row_version rather
+-- than event_id: an identity value is taken at insert but becomes visible at
+-- commit, so a long transaction could land behind a token already handed
+-- out. Reads stop below MIN_ACTIVE_ROWVERSION(), so every event under the
+-- token has committed. Adding the column rewrites the table; run off-peak.
+IF COL_LENGTH('dbo.delivery_event', 'row_version') IS NULL
+  ALTER TABLE dbo.delivery_event ADD row_version ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_event_row_version' AND object_id = OBJECT_ID('dbo.delivery_event'))
+  CREATE NONCLUSTERED INDEX IX_delivery_event_row_version
+    ON dbo.delivery_event (row_version);
+GO
+
+-- Catch-up reads for one order or one deliverer, now in row_version order
+IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_event_order' AND object_id = OBJECT_ID('dbo.delivery_event'))
+  DROP INDEX IX_delivery_event_order ON dbo.delivery_event;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_event_order_rv' AND object_id = OBJECT_ID('dbo.delivery_event'))
+  CREATE NONCLUSTERED INDEX IX_delivery_event_order_rv
+    ON dbo.delivery_event (order_id, row_version);
+GO
+
+IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_event_deliverer' AND object_id = OBJECT_ID('dbo.delivery_event'))
+  DROP INDEX IX_delivery_event_deliverer ON dbo.delivery_event;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_event_deliverer_rv' AND object_id = OBJECT_ID('dbo.delivery_event'))
+  CREATE NONCLUSTERED INDEX IX_delivery_event_deliverer_rv
+    ON dbo.delivery_event (deliverer_id, row_version);
+GO
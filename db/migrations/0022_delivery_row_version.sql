@@ -0,0 +1,19 @@
+-- GET /deliveries?updated_since= syncs by row_version instead of
+-- (updated_at, delivery_id): updated_at is stamped when the write starts,
+-- not when it commits, so a slow transaction could land behind a sync_token
+-- already handed out. Reads stop below MIN_ACTIVE_ROWVERSION(), so every
+-- change under the token has committed. Adding the column rewrites the
+-- table; run off-peak. IX_delivery_updated is kept for timestamp syncs.
+IF COL_LENGTH('dbo.delivery', 'row_version') IS NULL
+  ALTER TABLE dbo.delivery ADD row_version ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_row_version' AND object_id = OBJECT_ID('dbo.delivery'))
+  CREATE NONCLUSTERED INDEX IX_delivery_row_version
+    ON dbo.delivery (row_version);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_delivery_deliverer_row_version' AND object_id = OBJECT_ID('dbo.delivery'))
+  CREATE NONCLUSTERED INDEX IX_delivery_deliverer_row_version
+    ON dbo.delivery (deliverer_id, row_version);
+GO
@@ -27,12 +27,19 @@ export async function api<T>(path: string, init?: RequestInit): Promise<T> {
   return text as unknown as T;
 }
 
+export type BatchChanges = { add?: string[]; remove?: string[] };
+export type BatchResult = { added: number; removed: number; unavailable: string[] };
+
 export const basket = {
   add: (id: string) => api<void>(`/basket/${id}`, { method: 'POST' }),
   remove: (id: string) => api<void>(`/basket/${id}`, { method: 'DELETE' }),
+  batch: (changes: BatchChanges) =>
+    api<BatchResult>('/basket:batch', { method: 'POST', body: JSON.stringify(changes) }),
 };
 
 export const favorites = {
   add: (id: string) => api<void>(`/favorites/${id}`, { method: 'POST' }),
   remove: (id: string) => api<void>(`/favorites/${id}`, { method: 'DELETE' }),
+  batch: (changes: BatchChanges) =>
+    api<BatchResult>('/favorites:batch', { method: 'POST', body: JSON.stringify(changes) }),
 };
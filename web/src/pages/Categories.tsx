@@ -13,6 +13,21 @@ type ListingSummary = {
   image_url?: string | null;
 };
 
+type ListingPage = {
+  items: ListingSummary[];
+  next_cursor: string | null;
+};
+
+type FacetCount = { value: string; count: number };
+
+type Facets = {
+  total: number;
+  category: FacetCount[];
+};
+
+// Cards are at most ~360 CSS px wide; the API returns the smallest image variant that covers this
+const CARD_IMAGE_WIDTH = Math.round(360 * Math.min(window.devicePixelRatio || 1, 2));
+
 type CategoryCard = {
   key: string;
   label: string;
@@ -38,7 +53,10 @@ export default function Categories() {
   const [selected, setSelected] = useState<CategoryCard | null>(null);
   const [items, setItems] = useState<ListingSummary[]>([]);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [error, setError] = useState<string | null>(null);
+  const [counts, setCounts] = useState<Record<string, number>>({});
 
   const totalValue = useMemo(
     () =>
@@ -50,8 +68,9 @@ export default function Categories() {
     setLoading(true);
     setError(null);
     try {
-      const data = await api<ListingSummary[]>(`/listings?category=${catKey}`);
-      setItems(data);
+      const page = await api<ListingPage>(`/listings?category=${catKey}&imageWidth=${CARD_IMAGE_WIDTH}&cursor=`);
+      setItems(page.items);
+      setNextCursor(page.next_cursor);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load listings');
     } finally {
@@ -59,6 +78,29 @@ export default function Categories() {
     }
   };
 
+  const loadMore = async () => {
+    if (!selected || !nextCursor) return;
+    setLoadingMore(true);
+    setError(null);
+    try {
+      const page = await api<ListingPage>(
+        `/listings?category=${selected.key}&imageWidth=${CARD_IMAGE_WIDTH}&cursor=${encodeURIComponent(nextCursor)}`,
+      );
+      setItems((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err) {
+      setError(err instanceof Error ? err.message : 'Failed to load listings');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  useEffect(() => {
+    api<Facets>('/listings/facets')
+      .then((facets) => setCounts(Object.fromEntries(facets.category.map((f) => [f.value, f.count]))))
+      .catch(() => setCounts({}));
+  }, []);
+
   useEffect(() => {
     if (!selected) return;
     loadItems(selected.key);
@@ -93,6 +135,11 @@ export default function Categories() {
                 <div className="space-y-1">
                   <h3 className="font-display text-xl text-dusk">{card.label}</h3>
                   <p className="text-sm text-dusk/70">{card.description}</p>
+                  {card.key in counts && (
+                    <p className="text-xs font-semibold text-dusk/60">
+                      {counts[card.key]} {counts[card.key] === 1 ? 'item' : 'items'}
+                    </p>
+                  )}
                 </div>
               </motion.button>
             );
@@ -203,6 +250,17 @@ export default function Categories() {
               </motion.div>
             )}
           </AnimatePresence>
+
+          {!loading && nextCursor && (
+            <button
+              type="button"
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="self-center rounded-full border border-white/10 bg-white/5 px-6 py-2 text-sm text-white/70 transition hover:text-white disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading…' : 'Load more'}
+            </button>
+          )}
         </div>
       )}
     </div>
@@ -1,4 +1,4 @@
-import { useEffect, useMemo, useState, type ComponentType, type ReactNode } from 'react';
+import { useEffect, useMemo, useRef, useState, type ComponentType, type ReactNode } from 'react';
 import { AnimatePresence, motion } from 'framer-motion';
 import { api } from '../lib/api';
 import { Clock, MapPin, PackageCheck, RefreshCw, Truck } from 'lucide-react';
@@ -11,6 +11,24 @@ type Delivery = {
   total_cents: number;
   created_at: string;
   updated_at: string;
+  deliverer_id?: string | null;
+};
+
+type DeliveryChanges = {
+  events: {
+    event_id: number;
+    delivery_id: string;
+    status: string;
+    comment: string | null;
+    created_at: string;
+  }[];
+  next: string;
+};
+
+type DeliverySync = {
+  items: Delivery[];
+  sync_token: string;
+  has_more: boolean;
 };
 
 const statusStyles: Record<string, { label: string; bg: string; text: string }> = {
@@ -28,12 +46,29 @@ export default function DeliveriesPage() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
+  // Deliveries by id; after the first full sync only changed rows are fetched
+  const byId = useRef(new Map<string, Delivery>());
+  const syncToken = useRef('');
+
+  const sync = async () => {
+    let more = true;
+    while (more) {
+      const page = await api<DeliverySync>(
+        `/deliveries?limit=200&updated_since=${encodeURIComponent(syncToken.current)}`,
+      );
+      page.items.forEach((item) => byId.current.set(item.delivery_id, item));
+      syncToken.current = page.sync_token;
+      more = page.has_more;
+    }
+    setItems(
+      Array.from(byId.current.values()).sort((a, b) => b.created_at.localeCompare(a.created_at)),
+    );
+  };
+
   const load = async () => {
-    setLoading(true);
     setError(null);
     try {
-      const data = await api<Delivery[]>('/deliveries');
-      setItems(data);
+      await sync();
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load deliveries');
     } finally {
@@ -41,8 +76,54 @@ export default function DeliveriesPage() {
     }
   };
 
+  // Events carry the new status, so known deliveries are updated in place;
+  // only a delivery we have never seen needs a sync
+  const applyChanges = (events: DeliveryChanges['events']) => {
+    if (events.length === 0) return;
+    let unknown = false;
+    events.forEach((event) => {
+      const current = byId.current.get(event.delivery_id);
+      if (!current) {
+        unknown = true;
+        return;
+      }
+      byId.current.set(event.delivery_id, {
+        ...current,
+        status: event.status,
+        required_comment: event.comment ?? current.required_comment,
+        updated_at: event.created_at,
+      });
+    });
+    if (unknown) {
+      load();
+    } else {
+      setItems(
+        Array.from(byId.current.values()).sort((a, b) => b.created_at.localeCompare(a.created_at)),
+      );
+    }
+  };
+
   useEffect(() => {
     load();
+    // Long-poll the change feed instead of re-polling the whole list
+    let stopped = false;
+    (async () => {
+      let since = '';
+      while (!stopped) {
+        try {
+          const res = await api<DeliveryChanges>(
+            `/deliveries/changes?wait=20${since ? `&since=${since}` : ''}`,
+          );
+          if (since && !stopped) applyChanges(res.events);
+          since = res.next;
+        } catch {
+          await new Promise((resolve) => setTimeout(resolve, 5000));
+        }
+      }
+    })();
+    return () => {
+      stopped = true;
+    };
   }, []);
 
   const setStatus = async (id: string, status: string) => {
@@ -56,6 +137,16 @@ export default function DeliveriesPage() {
       method: 'POST',
       body: JSON.stringify({ status, comment }),
     });
+    // Show our own change right away; the sync picks it up (and anyone else's) shortly after
+    const current = byId.current.get(id);
+    if (current) {
+      byId.current.set(id, {
+        ...current,
+        status,
+        required_comment: comment || current.required_comment,
+        updated_at: new Date().toISOString(),
+      });
+    }
     load();
   };
 